@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""At-rest compression of trial data files.
+
+Completed trials' data files may be compressed in place to save space.  A compressed file is 
+named for the original file with the codec's suffix appended, e.g. ``profile.0.0.0.gz``.  Readers
+use :any:`open_file` to stream a file's data whether or not it is compressed and :any:`find_file`
+to locate a file that may have been compressed.  Tools that can only read uncompressed files are 
+given copies written by :any:`decompress_copy` so the trial data stays compressed.
+
+The codec and level are chosen by a compression policy string, ``<codec>[:<level>]``, e.g. 
+``gzip:6`` or ``bz2``.  Files are compressed to a temporary file that is renamed when complete, 
+so an interrupted compression never leaves a partial file in place of the original.
+"""
+
+import os
+import bz2
+import gzip
+import shutil
+from taucmdr import logger, util
+from taucmdr.error import ConfigurationError
+
+
+LOGGER = logger.get_logger(__name__)
+
+CODECS = {'gzip': '.gz', 'bz2': '.bz2'}
+"""dict: File name suffix for each compression codec."""
+
+DEFAULT_LEVEL = 6
+"""int: Compression level used when a policy does not specify one."""
+
+_BLOCK_SIZE = 1 << 20
+
+
+def parse_policy(value):
+    """Parse a compression policy string.
+    
+    Args:
+        value (str): ``<codec>[:<level>]`` where `codec` is a key of :any:`CODECS` and `level` is 1 
+                     (fastest) to 9 (smallest), or 'none' or None for no compression.
+                     
+    Returns:
+        tuple: (codec, level) or None if files should not be compressed.
+        
+    Raises:
+        ConfigurationError: Invalid policy.
+    """
+    if not value or value.lower() == 'none':
+        return None
+    codec, _, level = value.lower().partition(':')
+    if codec not in CODECS:
+        raise ConfigurationError("Invalid compression codec '%s'" % codec,
+                                 "Valid codecs are: %s" % ', '.join(sorted(CODECS)))
+    try:
+        level = int(level) if level else DEFAULT_LEVEL
+        if not 1 <= level <= 9:
+            raise ValueError
+    except ValueError:
+        raise ConfigurationError("Invalid compression level '%s'" % level, "Levels are 1 (fastest) to 9 (smallest).")
+    return codec, level
+
+
+def compressed_suffix(path):
+    """Get the compression suffix of a file name.
+    
+    Returns:
+        str: The codec suffix, e.g. '.gz', or '' if the name does not have one.
+    """
+    for suffix in CODECS.itervalues():
+        if path.endswith(suffix):
+            return suffix
+    return ''
+
+
+def strip_suffix(path):
+    """Get the name a file had before it was compressed."""
+    suffix = compressed_suffix(path)
+    return path[:-len(suffix)] if suffix else path
+
+
+def find_file(path):
+    """Find a file that may have been compressed.
+    
+    Args:
+        path (str): Path to the uncompressed file.
+        
+    Returns:
+        str: `path` if it exists, otherwise the path to the compressed file if it exists, otherwise `path`.
+    """
+    if not os.path.exists(path):
+        for suffix in CODECS.itervalues():
+            if os.path.exists(path + suffix):
+                return path + suffix
+    return path
+
+
+def open_file(path, mode='rb'):
+    """Open a possibly compressed file for reading.
+    
+    Data is decompressed as it is read.
+    
+    Args:
+        path (str): Path to the file.
+        mode (str): 'r' or 'rb'.
+        
+    Returns:
+        file: A file-like object.
+    """
+    suffix = compressed_suffix(path)
+    if suffix == '.gz':
+        return gzip.GzipFile(path, 'rb')
+    elif suffix == '.bz2':
+        return bz2.BZ2File(path, 'r')
+    return open(path, mode)
+
+
+def _rewrite(path, dest, open_input, open_output):
+    """Copy `path` to `dest` through the given file factories, then remove `path`."""
+    tmp_file = dest + '.part'
+    try:
+        with open_input(path) as fin, open_output(tmp_file) as fout:
+            shutil.copyfileobj(fin, fout, _BLOCK_SIZE)
+        shutil.copystat(path, tmp_file)
+        os.rename(tmp_file, dest)
+    except:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    os.remove(path)
+    return dest
+
+
+def compress_file(path, codec, level=DEFAULT_LEVEL, threads=None):
+    """Replace a file with a compressed copy.
+    
+    Args:
+        path (str): Path to the file.
+        codec (str): Key of :any:`CODECS`.
+        level (int): Compression level, 1 (fastest) to 9 (smallest).
+        threads (int): Number of gzip compression threads, see :any:`util.gzip_threads`.
+        
+    Returns:
+        str: Path to the compressed file.
+    """
+    if codec == 'gzip':
+        # Fixed modification time so identical files compress identically and can be deduplicated
+        open_output = lambda dest: util.ParallelGzipFile(dest, level, threads, mtime=0)
+    else:
+        open_output = lambda dest: bz2.BZ2File(dest, 'w', compresslevel=level)
+    return _rewrite(path, path + CODECS[codec], lambda src: open(src, 'rb'), open_output)
+
+
+def decompress_file(path):
+    """Replace a compressed file with a decompressed copy.
+    
+    Args:
+        path (str): Path to the compressed file.
+        
+    Returns:
+        str: Path to the decompressed file.
+    """
+    return _rewrite(path, strip_suffix(path), open_file, lambda dest: open(dest, 'wb'))
+
+
+def decompress_copy(path, dest):
+    """Write a decompressed copy of a possibly compressed file, leaving the file unchanged.
+    
+    Args:
+        path (str): Path to the file.
+        dest (str): Path to the copy.
+        
+    Returns:
+        str: `dest`.
+    """
+    with open_file(path) as fin, open(dest, 'wb') as fout:
+        shutil.copyfileobj(fin, fout, _BLOCK_SIZE)
+    return dest
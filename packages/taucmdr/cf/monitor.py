@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Live monitoring of the performance data written by a running trial.
+
+A :any:`DataMonitor` thread periodically counts the files and bytes in the directories a trial 
+writes to (i.e. PROFILEDIR and TRACEDIR), reports the data rate and projected final data size, 
+and can stop the trial when its data exceeds a size budget.
+"""
+
+import os
+import time
+import threading
+from taucmdr import logger, util
+
+
+LOGGER = logger.get_logger(__name__)
+
+
+def measure_paths(paths, ignore=None):
+    """Count the files in several directories and their total size.
+    
+    Files that disappear while they are being counted are skipped.
+    
+    Args:
+        paths (list): Directories to search recursively.  Each file is counted once even if the 
+                      directories overlap.
+        ignore (set): Paths to files that should not be counted.
+        
+    Returns:
+        tuple: (files, size) where `files` is the number of files and `size` is their total size in bytes.
+    """
+    seen = set()
+    files, size = 0, 0
+    for path in paths:
+        for dir_path, _, file_names in os.walk(path):
+            for name in file_names:
+                fpath = os.path.join(dir_path, name)
+                if fpath in seen or (ignore and fpath in ignore):
+                    continue
+                seen.add(fpath)
+                try:
+                    size += os.lstat(fpath).st_size
+                except OSError:
+                    continue
+                files += 1
+    return files, size
+
+
+class DataMonitor(threading.Thread):
+    """Samples the data written by a running trial in a background thread.
+    
+    Attributes:
+        start_time (float): Time sampling started, or None if the monitor hasn't started.
+        files (int): Number of files at the last sample.
+        size (int): Total size in bytes of the files at the last sample.
+        rate (float): Bytes per second written between the last two samples.
+        exceeded (bool): True if the data size exceeded the budget.
+    """
+
+    def __init__(self, name, paths, interval=1.0, report_interval=10.0, budget=None, on_exceeded=None, 
+                 expected_duration=None, ignore=None):
+        """Initialize the monitor.  Call :any:`start` to begin sampling.
+        
+        Args:
+            name (str): Name used in reports, e.g. "Trial 3".
+            paths (list): Directories the trial writes data to.
+            interval (float): Minimum seconds between samples.  Sampling slows down if walking the 
+                              directories takes long so it does not steal time from the trial.
+            report_interval (float): Seconds between reports.
+            budget (int): If not None, call `on_exceeded` once when the data size exceeds this many bytes.
+            on_exceeded: Callable taking no arguments, e.g. to stop the trial.
+            expected_duration (float): Expected trial duration in seconds used to project the final 
+                                       data size, or None to not project the final size.
+            ignore (set): Paths to files that should not be counted, e.g. the trial's output file.
+        """
+        super(DataMonitor, self).__init__(name='DataMonitor-%s' % name)
+        self.daemon = True
+        self.files = 0
+        self.size = 0
+        self.rate = 0.0
+        self.exceeded = False
+        self._name = name
+        self._paths = paths
+        self._interval = interval
+        self._report_interval = report_interval
+        self._budget = budget
+        self._on_exceeded = on_exceeded
+        self._expected_duration = expected_duration
+        self._ignore = ignore
+        self.start_time = None
+        self._last_time = None
+        self._stopped = threading.Event()
+
+    def projected_size(self, elapsed):
+        """Project the final data size from the average data rate so far.
+        
+        Args:
+            elapsed (float): Seconds since the trial started.
+            
+        Returns:
+            int: Projected size in bytes, or None if the expected duration is unknown.
+        """
+        if not self._expected_duration or elapsed <= 0:
+            return None
+        return max(self.size, int(self.size * self._expected_duration / elapsed))
+
+    def report(self, elapsed):
+        """Log the most recent sample."""
+        parts = ["%s: %d files" % (self._name, self.files), util.human_size(self.size), 
+                 "%s/s" % util.human_size(self.rate)]
+        projected = self.projected_size(elapsed)
+        if projected is not None:
+            parts.append("projected %s" % util.human_size(projected))
+        if self._budget:
+            parts.append("%.0f%% of budget" % (100.0 * self.size / self._budget))
+        LOGGER.info(', '.join(parts))
+
+    def sample(self, check_budget=True):
+        """Measure the data and check the budget.
+        
+        Args:
+            check_budget (bool): If False, don't check the budget, e.g. because the trial has ended.
+        
+        Returns:
+            float: Seconds the measurement took.
+        """
+        before = time.time()
+        last_size, last_time = self.size, self._last_time
+        self.files, self.size = measure_paths(self._paths, self._ignore)
+        now = time.time()
+        self._last_time = now
+        if now > last_time:
+            self.rate = max(0.0, (self.size - last_size) / (now - last_time))
+        if check_budget and self._budget and self.size > self._budget and not self.exceeded:
+            self.exceeded = True
+            LOGGER.error("%s data size %s exceeds the budget of %s", 
+                         self._name, util.human_size(self.size), util.human_size(self._budget))
+            if self._on_exceeded:
+                self._on_exceeded()
+        return now - before
+
+    def start(self):
+        self.start_time = self._last_time = time.time()
+        super(DataMonitor, self).start()
+
+    def run(self):
+        last_report = self.start_time
+        while not self._stopped.is_set():
+            took = self.sample()
+            now = time.time()
+            if now - last_report >= self._report_interval:
+                self.report(now - self.start_time)
+                last_report = now
+            self._stopped.wait(max(self._interval, 10*took))
+
+    def stop(self):
+        """Stop sampling, take a final sample, and wait for the thread to exit."""
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+        if self.start_time is not None:
+            self.sample(check_budget=False)
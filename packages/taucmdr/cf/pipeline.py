@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Staged processing of many independent jobs in a bounded pool of worker processes.
+
+A job is an ordered list of :any:`Stage` objects, e.g. the post-processing steps for one trial.
+A job's stages run one after another, but stages of different jobs run concurrently in up to 
+`workers` processes.  Stages must be idempotent and must leave their outputs in a state that makes 
+:any:`Stage.required` return True if they are interrupted, so a pipeline that is interrupted can be 
+resumed by running it again.
+"""
+
+import os
+import time
+import itertools
+import multiprocessing
+from multiprocessing.queues import SimpleQueue
+from abc import ABCMeta, abstractmethod
+from taucmdr import logger
+
+
+LOGGER = logger.get_logger(__name__)
+
+
+class Stage(object):
+    """One processing step of one job.
+    
+    Stages are pickled and run in worker processes, so they must not hold open files or use 
+    project storage.
+    
+    Attributes:
+        phase (str): Short description of the work the stage does, e.g. "merging traces".
+    """
+
+    __metaclass__ = ABCMeta
+
+    phase = None
+
+    @classmethod
+    def prepare(cls):
+        """Prepare to run stages of this type.
+        
+        Called in the parent process before the first stage of this type runs, e.g. to install 
+        tools that would otherwise be installed by several workers at once.
+        """
+        pass
+
+    def required(self):
+        """Check whether the stage still needs to run.
+        
+        Called in the parent process just before the stage would run.
+        
+        Returns:
+            bool: True if the stage's outputs are missing or incomplete.
+        """
+        return True
+
+    @abstractmethod
+    def run(self):
+        """Do the stage's work."""
+
+
+_STARTED = None
+"""SimpleQueue: In worker processes, the queue for (task, process ID) tuples sent when a stage starts."""
+
+
+def _init_worker(started):
+    global _STARTED  # pylint: disable=global-statement
+    _STARTED = started
+
+
+def _error_message(err):
+    return getattr(err, 'value', None) or str(err) or err.__class__.__name__
+
+
+def _run_stage(stage, task=None):
+    """Run a stage in a worker process.
+    
+    Args:
+        stage (Stage): The stage to run.
+        task (int): If not None, tell the parent process which worker runs the task.
+    
+    Returns:
+        str: None if the stage succeeded or an error message if it failed.  Errors are returned as 
+             messages since they may not be picklable.
+    """
+    if task is not None:
+        _STARTED.put((task, os.getpid()))
+    try:
+        stage.run()
+    except Exception as err:  # pylint: disable=broad-except
+        LOGGER.debug("%s failed", stage.phase, exc_info=True)
+        return _error_message(err)
+    return None
+
+
+def run_pipeline(jobs, workers=1, on_stage=None, on_done=None):
+    """Run the stages of several jobs.
+    
+    Args:
+        jobs (list): (key, stages) tuples where `key` identifies the job and `stages` is a list of 
+                     :any:`Stage` objects to run in order.
+        workers (int): Maximum number of stages to run at the same time.  If 1, stages run in this process.
+        on_stage: Called as ``on_stage(key, stage)`` in this process before each stage runs.
+        on_done: Called as ``on_done(key, error)`` in this process when a job completes or fails.
+                 `error` is None if all stages succeeded, otherwise the failed stage's error message.
+        
+    Returns:
+        list: (key, error) tuples for the jobs that failed.
+    """
+    pending = [(key, list(stages)) for key, stages in jobs]
+    prepared = set()
+    failed = []
+
+    def next_stage(stages):
+        while stages:
+            stage = stages.pop(0)
+            if stage.required():
+                if stage.__class__ not in prepared:
+                    stage.prepare()
+                    prepared.add(stage.__class__)
+                return stage
+        return None
+
+    def finish(key, error):
+        if error:
+            failed.append((key, error))
+        if on_done:
+            on_done(key, error)
+
+    def start(key, stages):
+        stage = next_stage(stages)
+        if stage is None:
+            finish(key, None)
+            return None
+        if on_stage:
+            on_stage(key, stage)
+        return stage
+
+    if workers <= 1:
+        for key, stages in pending:
+            stage = start(key, stages)
+            while stage:
+                error = _run_stage(stage)
+                if error:
+                    finish(key, error)
+                    break
+                stage = start(key, stages)
+        return failed
+    # Workers write to a SimpleQueue without a feeder thread so the message isn't lost if the worker dies
+    started = SimpleQueue()
+    pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(started,))
+    # Each running job's stages, result, and task number, and worker process IDs indexed by task number
+    running = {}
+    pids = {}
+    lost = []
+    task_numbers = itertools.count()
+
+    def submit(key, stages):
+        stage = start(key, stages)
+        if stage:
+            task = next(task_numbers)
+            running[key] = (stages, pool.apply_async(_run_stage, (stage, task)), task)
+
+    def worker_died(pid):
+        # The pool replaces dead workers, but the task a dead worker was running is lost
+        # pylint: disable=protected-access
+        return pid is not None and pid not in [proc.pid for proc in pool._pool if proc.exitcode is None]
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                submit(*pending.pop(0))
+            if not running:
+                continue
+            while not started.empty():
+                task, pid = started.get()
+                pids[task] = pid
+            for key, (stages, result, task) in running.items():
+                pid = pids.get(task)
+                if result.ready():
+                    del running[key]
+                    try:
+                        error = result.get()
+                    except Exception as err:  # pylint: disable=broad-except
+                        # The stage could not be sent to or returned from a worker 
+                        error = _error_message(err)
+                    if error:
+                        finish(key, error)
+                    else:
+                        submit(key, stages)
+                elif worker_died(pid):
+                    del running[key]
+                    lost.append(key)
+                    finish(key, "Worker process %d died" % pid)
+            # Sleep instead of blocking on a result so KeyboardInterrupt is delivered
+            time.sleep(0.05)
+        if lost:
+            # Lost tasks never complete so the pool can't be closed gracefully
+            pool.terminate()
+        else:
+            pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return failed
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Persistent columnar cache of parsed TAU profile data.
+
+The first analysis of a trial's TAU text profiles saves the parsed data in :any:`CACHE_DIR` in the
+trial prefix so later analyses can memory-map it instead of parsing thousands of text files again.
+The cache is written by a pool of worker processes.  Each worker writes one segment holding the 
+threads it parsed::
+
+    .profile_cache/
+        cache.json                  Metadata: validity key, metric names, and segment list
+        segment.00000/
+            names.json              Function name dictionary for this segment
+            threads                 Node, context, and thread numbers of each thread (C long)
+            offsets                 Start of each thread's data in the value columns (C long)
+            functions               Function identifiers (C long)
+            calls, subroutines      Call counts (double)
+            exclusive.<i>           Exclusive values of metric number <i> (double)
+            inclusive.<i>           Inclusive values of metric number <i> (double)
+
+The cache is valid only while the trial's data size and list of profile files match the values
+recorded when it was written.  ``cache.json`` is written last, so an interrupted write leaves 
+an invalid cache that is replaced on the next analysis.
+"""
+
+import os
+import sys
+import json
+import mmap
+import hashlib
+from array import array
+from taucmdr import logger, util
+from taucmdr.cf.compression import strip_suffix
+from taucmdr.cf.profile import ProfileFormatError
+from taucmdr.cf.profile.tau_profile import FunctionNames, ProfileData, ProfileReader, ThreadProfile
+from taucmdr.cf.profile.tau_profile import find_profile_files, profile_metrics
+from taucmdr.cf.profile.summary import Aggregate, choose_metric, numpy
+from taucmdr.cf.profile.ingest import map_tasks, partition
+
+
+LOGGER = logger.get_logger(__name__)
+
+CACHE_DIR = '.profile_cache'
+"""str: Name of the cache directory in the trial prefix."""
+
+CACHE_VERSION = 1
+"""int: Cache format version.  Caches with a different version are rebuilt."""
+
+_META_FILE = 'cache.json'
+
+
+def _files_digest(path, files):
+    digest = hashlib.sha1()
+    for _, _, _, _, fpath in files:
+        # Compressing a profile doesn't change its data
+        digest.update(strip_suffix(os.path.relpath(fpath, path)))
+        digest.update('\0')
+    return digest.hexdigest()
+
+
+def _write_column(segment_path, name, column):
+    with open(os.path.join(segment_path, name), 'wb') as fout:
+        column.tofile(fout)
+
+
+def _write_segment(args):
+    """Parse a chunk of threads and write them as one cache segment.
+    
+    Args:
+        args (tuple): (segment_path, metrics, groups) where `groups` is a list of 
+                      ((node, context, thread), [(file_metric, path), ...]) tuples.
+    
+    Returns:
+        tuple: (segment name, number of threads), or (None, message) if a profile could not be parsed.
+    """
+    segment_path, metrics, groups = args
+    names = FunctionNames()
+    threads = array('l')
+    offsets = array('l', [0])
+    columns = {'functions': array('l'), 'calls': array('d'), 'subroutines': array('d')}
+    for i in xrange(len(metrics)):
+        columns['exclusive.%d' % i] = array('d')
+        columns['inclusive.%d' % i] = array('d')
+    try:
+        for key, files in groups:
+            prof = ThreadProfile(*key)
+            for file_metric, path in files:
+                with ProfileReader(path) as reader:
+                    prof.add_metric(file_metric or reader.metric, reader, names)
+            size = len(prof.functions)
+            threads.extend(key)
+            offsets.append(offsets[-1] + size)
+            columns['functions'].extend(prof.functions)
+            columns['calls'].extend(prof.calls)
+            columns['subroutines'].extend(prof.subroutines)
+            for i, metric in enumerate(metrics):
+                for kind, values in ('exclusive', prof.exclusive), ('inclusive', prof.inclusive):
+                    columns['%s.%d' % (kind, i)].extend(values.get(metric, array('d', [0.0]) * size))
+    except ProfileFormatError as err:
+        # Errors can't be pickled, so send back the message and raise it in the parent process
+        return None, err.value
+    os.mkdir(segment_path)
+    with open(os.path.join(segment_path, 'names.json'), 'w') as fout:
+        json.dump(names.names, fout)
+    _write_column(segment_path, 'threads', threads)
+    _write_column(segment_path, 'offsets', offsets)
+    for name, column in columns.iteritems():
+        _write_column(segment_path, name, column)
+    return os.path.basename(segment_path), len(groups)
+
+
+class _Column(object):
+    """A read-only, memory-mapped column file."""
+
+    def __init__(self, path, typecode):
+        self.typecode = typecode
+        self.itemsize = array(typecode).itemsize
+        with open(path, 'rb') as fin:
+            size = os.fstat(fin.fileno()).st_size
+            # Empty files can't be memory-mapped
+            self.buffer = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) if size else ''
+
+    def __len__(self):
+        return len(self.buffer) // self.itemsize
+
+    def slice(self, start, stop):
+        """Copy part of the column to an array.
+        
+        Args:
+            start (int): Index of the first item.
+            stop (int): Index after the last item, or None to copy to the end of the column.
+            
+        Returns:
+            array: The column items.
+        """
+        if stop is None:
+            stop = len(self)
+        column = array(self.typecode)
+        column.fromstring(self.buffer[start*self.itemsize:stop*self.itemsize])
+        return column
+
+    def close(self):
+        """Unmap the column file."""
+        if self.buffer:
+            self.buffer.close()
+
+
+class _Segment(object):
+    """Reader for one cache segment."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'names.json')) as fin:
+            self.names = json.load(fin)
+        self._columns = []
+        self.threads = self.column('threads', 'l').slice(0, None)
+        self.offsets = self.column('offsets', 'l').slice(0, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ex_type, value, traceback):
+        for column in self._columns:
+            column.close()
+        return False
+
+    def column(self, name, typecode='d'):
+        """Memory-map a column of this segment.
+        
+        Args:
+            name (str): Column name.
+            typecode (str): :py:mod:`array` typecode of the column items.
+            
+        Returns:
+            _Column: The column.
+        """
+        column = _Column(os.path.join(self.path, name), typecode)
+        self._columns.append(column)
+        return column
+
+
+class ProfileCache(object):
+    """Persistent columnar cache of a trial's parsed TAU text profiles.
+    
+    Attributes:
+        prefix (str): Path to the directory containing the profiles.
+        path (str): Path to the cache directory.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.path = os.path.join(prefix, CACHE_DIR)
+        self._meta = None
+
+    def _key(self, data_size, files):
+        return {'version': CACHE_VERSION,
+                'byteorder': sys.byteorder,
+                'long_size': array('l').itemsize,
+                'data_size': data_size,
+                'files': _files_digest(self.prefix, files)}
+
+    def is_valid(self, data_size, files=None):
+        """Check that the cache exists and matches the profile data.
+        
+        Args:
+            data_size (int): Size of the trial data in bytes.
+            files (list): Profile files as returned by :any:`find_profile_files`, or None to find them.
+            
+        Returns:
+            bool: True if the cache can be used.
+        """
+        try:
+            with open(os.path.join(self.path, _META_FILE)) as fin:
+                meta = json.load(fin)
+        except (IOError, ValueError):
+            return False
+        if files is None:
+            files = find_profile_files(self.prefix)
+        if meta.get('key') != self._key(data_size, files):
+            LOGGER.debug("Profile cache in '%s' is out of date", self.path)
+            return False
+        self._meta = meta
+        return True
+
+    @property
+    def metrics(self):
+        """list: Names of the metrics in the cache."""
+        return self._meta['metrics']
+
+    def build(self, data_size, files=None, workers=None):
+        """Parse the profiles and write the cache, replacing any existing cache.
+        
+        Args:
+            data_size (int): Size of the trial data in bytes.
+            files (list): Profile files as returned by :any:`find_profile_files`, or None to find them.
+            workers (int): Number of worker processes, see :any:`profile_workers`.
+            
+        Raises:
+            ProfileFormatError: No profiles found or a profile could not be parsed.
+            IOError: The cache could not be written.
+        """
+        if files is None:
+            files = find_profile_files(self.prefix)
+        if not files:
+            raise ProfileFormatError("No TAU profiles found in '%s'" % self.prefix)
+        metrics = sorted(profile_metrics(files))
+        groups = {}
+        for metric, node, context, thread, fpath in files:
+            groups.setdefault((node, context, thread), []).append((metric, fpath))
+        workers, chunks = partition(sorted(groups.iteritems()), workers)
+        LOGGER.debug("Writing profile cache for %d threads in '%s' with %d workers", len(groups), self.path, workers)
+        tmp_path = '%s.%d' % (self.path, os.getpid())
+        util.rmtree(tmp_path, ignore_errors=True)
+        os.mkdir(tmp_path)
+        try:
+            tasks = ((os.path.join(tmp_path, 'segment.%05d' % i), metrics, chunk) for i, chunk in enumerate(chunks))
+            segments = []
+            for name, num_threads in map_tasks(_write_segment, tasks, workers):
+                if name is None:
+                    raise ProfileFormatError(num_threads)
+                segments.append({'name': name, 'threads': num_threads})
+            segments.sort(key=lambda segment: segment['name'])
+            meta = {'key': self._key(data_size, files), 'metrics': metrics, 'segments': segments}
+            with open(os.path.join(tmp_path, _META_FILE), 'w') as fout:
+                json.dump(meta, fout)
+            util.rmtree(self.path, ignore_errors=True)
+            os.rename(tmp_path, self.path)
+        except:
+            util.rmtree(tmp_path, ignore_errors=True)
+            raise
+        self._meta = meta
+
+    def _segments(self):
+        for segment in self._meta['segments']:
+            yield _Segment(os.path.join(self.path, segment['name']))
+
+    def aggregate(self, metric=None, use_numpy=None, inclusive=False):
+        """Aggregate a metric's values across all threads in the cache.
+        
+        Args:
+            metric (str): Metric to aggregate, or None to choose a metric with :any:`choose_metric`.
+            use_numpy (bool): Passed to :any:`Aggregate.create`.
+            inclusive (bool): If True aggregate inclusive values, otherwise aggregate exclusive values.
+        
+        Returns:
+            tuple: (aggregate, names) where `names` is the :any:`FunctionNames` dictionary for `aggregate`.
+        """
+        metric = choose_metric(self.metrics, metric)
+        column_name = '%s.%d' % ('inclusive' if inclusive else 'exclusive', self.metrics.index(metric))
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        names = FunctionNames()
+        total = Aggregate.create(metric, use_numpy, inclusive)
+        for segment in self._segments():
+            with segment:
+                part = Aggregate.create(metric, use_numpy, inclusive)
+                functions = segment.column('functions', 'l')
+                values = segment.column(column_name)
+                num_threads = len(segment.offsets) - 1
+                if use_numpy:
+                    # Aggregate the whole segment directly from the memory-mapped columns
+                    part.add(functions.buffer, values.buffer, num_threads)
+                else:
+                    for i in xrange(num_threads):
+                        start, stop = segment.offsets[i], segment.offsets[i+1]
+                        part.add(functions.slice(start, stop), values.slice(start, stop))
+                total.merge(part, [names.intern(name) for name in segment.names])
+        return total, names
+
+    def load(self):
+        """Load all cached profile data into memory.
+        
+        Returns:
+            ProfileData: The cached profile data.
+        """
+        data = ProfileData()
+        data.metrics = list(self.metrics)
+        for segment in self._segments():
+            with segment:
+                id_map = [data.functions.intern(name) for name in segment.names]
+                functions = segment.column('functions', 'l')
+                calls = segment.column('calls')
+                subroutines = segment.column('subroutines')
+                exclusive = [segment.column('exclusive.%d' % i) for i in xrange(len(data.metrics))]
+                inclusive = [segment.column('inclusive.%d' % i) for i in xrange(len(data.metrics))]
+                for i in xrange(len(segment.offsets) - 1):
+                    start, stop = segment.offsets[i], segment.offsets[i+1]
+                    prof = data.get_thread(*segment.threads[3*i:3*i+3])
+                    prof.functions = array('l', (id_map[fid] for fid in functions.slice(start, stop)))
+                    prof.calls = calls.slice(start, stop)
+                    prof.subroutines = subroutines.slice(start, stop)
+                    for j, metric in enumerate(data.metrics):
+                        prof.exclusive[metric] = exclusive[j].slice(start, stop)
+                        prof.inclusive[metric] = inclusive[j].slice(start, stop)
+        data.threads.sort(key=lambda prof: (prof.node, prof.context, prof.thread))
+        return data
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Trial-to-trial comparison of aggregated TAU profile data.
+
+Functions are aligned across trials by name.  Each trial is reduced to one :any:`Aggregate` before
+comparison so memory use depends on the number of functions and trials, not on the number of threads.
+"""
+
+from collections import namedtuple
+from taucmdr.cf.profile.tau_profile import FunctionNames
+
+
+ADDED = 'added'
+"""str: Status of a function that does not appear in the baseline trial."""
+
+REMOVED = 'removed'
+"""str: Status of a function that appears in the baseline trial but not in some other trial."""
+
+
+FunctionComparison = namedtuple('FunctionComparison', ['name', 'values', 'deltas', 'relative', 'status'])
+"""One function's values in each compared trial.
+
+`values` holds the compared statistic for each trial, or None if the function does not appear
+in that trial.  `deltas` holds ``values[i] - values[0]`` for each trial after the baseline, counting
+missing values as zero.  `relative` holds ``deltas[i] / values[0]``, or None if the baseline value
+is missing or zero.  `status` is :any:`ADDED`, :any:`REMOVED`, or the empty string.
+"""
+
+
+def compare(aggregates, statistic='mean'):
+    """Align functions across aggregated trials and compute deltas from the first trial.
+
+    Args:
+        aggregates: Iterable of (aggregate, names) tuples as returned by :any:`aggregate_profiles`.
+                    The first aggregate is the baseline.  Aggregates are reduced to one statistic
+                    per function as they are consumed.
+        statistic (str): Statistic to compare, see :any:`Aggregate.statistic`.
+
+    Yields:
+        FunctionComparison: One comparison per function in order of first appearance.
+    """
+    names = FunctionNames()
+    columns = []
+    for aggregate, agg_names in aggregates:
+        column = {}
+        for fid, value in enumerate(aggregate.statistic(statistic)):
+            if value is not None:
+                column[names.intern(agg_names[fid])] = value
+        columns.append(column)
+    for fid, name in enumerate(names.names):
+        values = [column.get(fid) for column in columns]
+        base = values[0] or 0.0
+        deltas = [(value or 0.0) - base for value in values[1:]]
+        relative = [delta / base if base else None for delta in deltas]
+        if values[0] is None:
+            status = ADDED
+        elif None in values:
+            status = REMOVED
+        else:
+            status = ''
+        yield FunctionComparison(name, values, deltas, relative, status)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Parallel ingestion of TAU text profiles.
+
+Profile files are split into chunks that are read by a pool of worker processes.  Each worker 
+reduces its chunk to an :any:`Aggregate` with its own function name dictionary so only per-function
+statistics, not per-thread data, are sent back to the parent process.  Memory use in the parent and
+in each worker depends on the number of functions, not on the number of threads.
+"""
+
+import os
+import itertools
+import multiprocessing
+from array import array
+from taucmdr import logger
+from taucmdr.error import ConfigurationError
+from taucmdr.cf.profile import ProfileFormatError
+from taucmdr.cf.profile.tau_profile import FunctionNames, ProfileReader, find_profile_files, profile_metrics
+from taucmdr.cf.profile.summary import Aggregate, choose_metric
+
+
+LOGGER = logger.get_logger(__name__)
+
+MIN_CHUNK_SIZE = 32
+"""int: Smallest number of profile files to send to a worker process at once."""
+
+CHUNKS_PER_WORKER = 4
+"""int: Target number of chunks per worker process so faster workers can take more chunks."""
+
+
+def profile_workers(workers=None):
+    """Get the number of worker processes to use for profile ingestion.
+    
+    Args:
+        workers (int): Number of worker processes.  If None, use the value of the 
+                       __TAUCMDR_PROFILE_WORKERS__ environment variable or the number of CPU cores.
+        
+    Returns:
+        int: Number of worker processes.
+        
+    Raises:
+        ConfigurationError: Invalid worker count.
+    """
+    if not workers:
+        try:
+            workers = os.environ['__TAUCMDR_PROFILE_WORKERS__']
+        except KeyError:
+            workers = multiprocessing.cpu_count()
+    try:
+        workers = int(workers)
+        if workers < 1:
+            raise ValueError
+    except ValueError:
+        raise ConfigurationError("Invalid profile worker count: %s" % workers)
+    return workers
+
+
+def _aggregate_chunk(args):
+    """Reduce a chunk of profile files to a partial aggregate.
+    
+    Args:
+        args (tuple): (metric, use_numpy, inclusive, files) where `files` is a list of (file_metric, path) tuples.
+        
+    Returns:
+        tuple: (names, aggregate) where `names` lists the partial aggregate's function names by identifier,
+               or (None, message) if a profile could not be parsed.
+    """
+    metric, use_numpy, inclusive, files = args
+    names = FunctionNames()
+    agg = Aggregate.create(metric, use_numpy, inclusive)
+    try:
+        for file_metric, path in files:
+            with ProfileReader(path) as reader:
+                if (file_metric or reader.metric) != metric:
+                    continue
+                functions = array('l')
+                values = array('d')
+                for rec in reader:
+                    functions.append(names.intern(rec.name))
+                    values.append(rec.inclusive if inclusive else rec.exclusive)
+                agg.add(functions, values)
+    except ProfileFormatError as err:
+        # Errors can't be pickled, so send back the message and raise it in the parent process
+        return None, err.value
+    return names.names, agg
+
+
+def partition(items, workers=None):
+    """Split work items into chunks for worker processes.
+    
+    Args:
+        items (list): Work items, e.g. profile files.
+        workers (int): Number of worker processes, see :any:`profile_workers`.
+        
+    Returns:
+        tuple: (workers, chunks) where `workers` is reduced so each worker gets at least 
+               :any:`MIN_CHUNK_SIZE` items and `chunks` is a list of item lists.
+    """
+    workers = min(profile_workers(workers), max(1, len(items) // MIN_CHUNK_SIZE))
+    size = max(MIN_CHUNK_SIZE, -(-len(items) // (workers * CHUNKS_PER_WORKER)))
+    return workers, [items[i:i+size] for i in xrange(0, len(items), size)]
+
+
+def map_tasks(func, tasks, workers):
+    """Apply a function to tasks in a pool of worker processes.
+    
+    Args:
+        func: Module-level function to apply to each task.
+        tasks: Iterable of picklable task arguments.
+        workers (int): Number of worker processes.  If 1, tasks are run in this process.
+        
+    Yields:
+        The result of each task in the order tasks complete.
+    """
+    if workers <= 1:
+        for result in itertools.imap(func, tasks):
+            yield result
+        return
+    pool = multiprocessing.Pool(workers)
+    try:
+        for result in pool.imap_unordered(func, tasks):
+            yield result
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+def aggregate_profiles(path, metric=None, workers=None, use_numpy=None, inclusive=False):
+    """Aggregate a metric's values across all TAU text profiles in a directory.
+    
+    Args:
+        path (str): Path to a directory containing ``profile.*.*.*`` files or ``MULTI__*`` subdirectories.
+        metric (str): Metric to aggregate, or None to choose a metric with :any:`choose_metric`.
+        workers (int): Number of worker processes, see :any:`profile_workers`.
+        use_numpy (bool): Passed to :any:`Aggregate.create`.
+        inclusive (bool): If True aggregate inclusive values, otherwise aggregate exclusive values.
+        
+    Returns:
+        tuple: (aggregate, names) where `names` is the :any:`FunctionNames` dictionary for `aggregate`.
+        
+    Raises:
+        ProfileFormatError: No profiles found or a profile could not be parsed.
+        ConfigurationError: The profiles have no values for `metric`.
+    """
+    files = find_profile_files(path)
+    if not files:
+        raise ProfileFormatError("No TAU profiles found in '%s'" % path)
+    metric = choose_metric(profile_metrics(files), metric)
+    selected = [(file_metric, fpath) for file_metric, _, _, _, fpath in files if file_metric in (None, metric)]
+    workers, chunks = partition(selected, workers)
+    LOGGER.debug("Aggregating %s in %d profile files with %d workers", metric, len(selected), workers)
+    names = FunctionNames()
+    total = Aggregate.create(metric, use_numpy, inclusive)
+    tasks = ((metric, use_numpy, inclusive, chunk) for chunk in chunks)
+    for part_names, part in map_tasks(_aggregate_chunk, tasks, workers):
+        if part_names is None:
+            raise ProfileFormatError(part)
+        total.merge(part, [names.intern(name) for name in part_names])
+    return total, names
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Streaming reader for merged TAU XML profiles.
+
+With ``TAU_PROFILE_FORMAT=merged`` TAU writes the profiles of all threads to one ``tauprofile.xml``::
+
+    <profile_xml>
+    <thread id="0.0.0.0" node="0" context="0" thread="0">
+        <metadata>...</metadata>
+    </thread>
+    <definitions thread="*">
+        <metric id="0"><name>TIME</name>...</metric>
+        <event id="0"><name>main</name><group>TAU_DEFAULT</group></event>
+    </definitions>
+    <profile thread="0.0.0.0">
+        <interval_data metrics="0">
+    0 1 1 1000 3000
+        </interval_data>
+    </profile>
+    </profile_xml>
+
+Each line of ``interval_data`` holds an event identifier, calls, subroutines, and an exclusive and 
+inclusive value for each metric named in the ``metrics`` attribute.  Definitions apply to all threads 
+if their ``thread`` attribute is ``*`` and otherwise to the named thread only.
+
+The file is parsed with :py:func:`xml.etree.cElementTree.iterparse` and each top-level element is 
+discarded as soon as it has been processed, so memory use depends on the size of one thread's 
+profile, not on the size of the file.
+"""
+
+from array import array
+from collections import OrderedDict
+from xml.etree import cElementTree
+from taucmdr import logger
+from taucmdr.cf.compression import open_file
+from taucmdr.cf.profile import ProfileFormatError
+from taucmdr.cf.profile.tau_profile import FunctionNames, ProfileData, ThreadProfile
+from taucmdr.cf.profile.summary import Aggregate, choose_metric
+
+
+LOGGER = logger.get_logger(__name__)
+
+MERGED_PROFILE_FILE = 'tauprofile.xml'
+"""str: Name of the merged profile file in the trial prefix."""
+
+
+class _Definitions(object):
+    """Metric and event definitions for one thread or for all threads."""
+
+    def __init__(self):
+        self.metrics = OrderedDict()
+        self.events = {}
+        # Function identifiers are assigned when an event is first used so unused events are not summarized
+        self.function_ids = {}
+
+    def update(self, elem):
+        """Add the definitions in a ``definitions`` element.
+        
+        TAU may write several ``definitions`` elements for the same threads, e.g. when events are 
+        created after the first profiles were written.
+        """
+        for child in elem:
+            if child.tag == 'metric':
+                self.metrics[child.get('id')] = child.findtext('name', '')
+            elif child.tag == 'event':
+                eid = int(child.get('id'))
+                self.events[eid] = child.findtext('name', '')
+                self.function_ids.pop(eid, None)
+
+
+class MergedProfileReader(object):
+    """Streaming reader for a merged TAU XML profile.
+    
+    Iterating over the reader yields a :any:`ThreadProfile` for each thread in the file.
+    
+    Attributes:
+        path (str): Path to the merged profile file.
+        functions (FunctionNames): Function name dictionary shared by all threads.
+        metrics (list): Names of the metrics defined so far, in order of definition.
+    """
+
+    def __init__(self, path, functions=None):
+        self.path = path
+        self.functions = FunctionNames() if functions is None else functions
+        self.metrics = []
+        self._threads = {}
+        self._definitions = {}
+
+    def __iter__(self):
+        with open_file(self.path) as fin:
+            depth = 0
+            root = None
+            try:
+                for event, elem in cElementTree.iterparse(fin, events=('start', 'end')):
+                    if event == 'start':
+                        if root is None:
+                            root = elem
+                        depth += 1
+                        continue
+                    depth -= 1
+                    if depth != 1:
+                        continue
+                    if elem.tag == 'thread':
+                        self._threads[elem.get('id')] = tuple(int(elem.get(attr, 0)) 
+                                                              for attr in ('node', 'context', 'thread'))
+                    elif elem.tag == 'definitions':
+                        defs = self._definitions.setdefault(elem.get('thread', '*'), _Definitions())
+                        defs.update(elem)
+                        for metric in defs.metrics.itervalues():
+                            if metric not in self.metrics:
+                                self.metrics.append(metric)
+                    elif elem.tag == 'profile':
+                        prof = self._thread_profile(elem)
+                        if prof:
+                            yield prof
+                    # Discard everything parsed so far
+                    root.clear()
+            except SyntaxError as err:
+                raise ProfileFormatError("Invalid merged profile '%s': %s" % (self.path, err))
+
+    def _thread_key(self, thread_id):
+        try:
+            return self._threads[thread_id]
+        except KeyError:
+            # Thread identifiers are "<node>.<context>.<thread>" with an optional suffix
+            try:
+                return tuple(int(part) for part in thread_id.split('.')[:3])
+            except ValueError:
+                raise ProfileFormatError("Invalid thread identifier '%s' in '%s'" % (thread_id, self.path))
+
+    def _thread_profile(self, elem):
+        thread_id = elem.get('thread', '')
+        defs = self._definitions.get(thread_id) or self._definitions.get('*')
+        data = elem.find('interval_data')
+        if defs is None or data is None:
+            LOGGER.debug("Skipping profile of thread '%s' in '%s'", thread_id, self.path)
+            return None
+        try:
+            metrics = [defs.metrics[mid] for mid in data.get('metrics', '').split()]
+        except KeyError as err:
+            raise ProfileFormatError("Undefined metric %s in '%s'" % (err, self.path))
+        prof = ThreadProfile(*self._thread_key(thread_id))
+        exclusive = [array('d') for _ in metrics]
+        inclusive = [array('d') for _ in metrics]
+        function_ids = defs.function_ids
+        for line in (data.text or '').splitlines():
+            fields = line.split()
+            if not fields:
+                continue
+            try:
+                eid = int(fields[0])
+                try:
+                    fid = function_ids[eid]
+                except KeyError:
+                    fid = function_ids[eid] = self.functions.intern(defs.events[eid])
+                prof.functions.append(fid)
+                prof.calls.append(float(fields[1]))
+                prof.subroutines.append(float(fields[2]))
+                for i in xrange(len(metrics)):
+                    exclusive[i].append(float(fields[3 + 2*i]))
+                    inclusive[i].append(float(fields[4 + 2*i]))
+            except (ValueError, KeyError, IndexError):
+                raise ProfileFormatError("Invalid data for thread '%s' in '%s': %r" % 
+                                         (thread_id, self.path, line[:80]))
+        for i, metric in enumerate(metrics):
+            prof.exclusive[metric] = exclusive[i]
+            prof.inclusive[metric] = inclusive[i]
+        return prof
+
+
+def load_merged_profile(path):
+    """Parse a merged TAU XML profile.
+    
+    Args:
+        path (str): Path to the merged profile file.
+        
+    Returns:
+        ProfileData: The parsed profile data.
+        
+    Raises:
+        ProfileFormatError: The file has no thread profiles or could not be parsed.
+    """
+    data = ProfileData()
+    reader = MergedProfileReader(path, data.functions)
+    for prof in reader:
+        data.add_thread(prof)
+    if not data.threads:
+        raise ProfileFormatError("No thread profiles found in '%s'" % path)
+    data.metrics = list(reader.metrics)
+    data.threads.sort(key=lambda prof: (prof.node, prof.context, prof.thread))
+    return data
+
+
+def aggregate_merged_profile(path, metric=None, use_numpy=None, inclusive=False):
+    """Aggregate a metric's values across all threads in a merged TAU XML profile.
+    
+    Threads are aggregated as they are parsed so only one thread's data is in memory at a time.
+    
+    Args:
+        path (str): Path to the merged profile file.
+        metric (str): Metric to aggregate, or None to choose a metric with :any:`choose_metric`.
+        use_numpy (bool): Passed to :any:`Aggregate.create`.
+        inclusive (bool): If True aggregate inclusive values, otherwise aggregate exclusive values.
+        
+    Returns:
+        tuple: (aggregate, names) where `names` is the :any:`FunctionNames` dictionary for `aggregate`.
+        
+    Raises:
+        ProfileFormatError: The file has no thread profiles or could not be parsed.
+    """
+    reader = MergedProfileReader(path)
+    agg = None
+    for prof in reader:
+        if agg is None:
+            # Metrics are defined before the first thread profile
+            agg = Aggregate.create(choose_metric(reader.metrics, metric), use_numpy, inclusive)
+        agg.add_thread(prof)
+    if agg is None:
+        raise ProfileFormatError("No thread profiles found in '%s'" % path)
+    return agg, reader.functions
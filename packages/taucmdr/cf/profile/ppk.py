@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Native writer for ParaProf packed profiles (PPK).
+
+A PPK file is a gzip-compressed stream of big-endian values as written by Java's ``DataOutputStream``.
+An ``int`` is 4 bytes, a ``double`` is 8 bytes, and a ``string`` is Java modified UTF-8 prefixed by its 
+2-byte length::
+
+    char[3]     'P', 'P', 'K' (2 bytes each)
+    int         format version (2)
+    int         oldest compatible format version (1)
+    int         header length in bytes, followed by the header:
+        int         length of reserved header block (0)
+        int         number of trial metadata attributes, then (name, value) string pairs
+        int         number of threads, then for each thread:
+            int[3]      node, context, thread
+            int         number of thread metadata attributes, then (name, value) string pairs
+    int         number of metrics, then metric names
+    int         number of groups, then group names
+    int         number of functions, then for each function:
+        string      function name
+        int         number of groups, then group indices
+    int         number of user events, then user event names
+    int         number of threads, then for each thread:
+        int[3]      node, context, thread
+        int         number of function profiles, then for each function profile:
+            int         function index
+            double[2]   calls, subroutines
+            double[2]   exclusive and inclusive value of each metric
+        int         number of user event profiles, then for each user event profile:
+            int         user event index
+            int         number of samples
+            double[4]   maximum, minimum, mean, sum of squares
+
+Metadata attributes with the same value on every thread are also recorded as trial metadata.
+
+Function and user event names must be written before any thread data, but new names may appear in 
+any thread.  Profiles are therefore read once, thread data is written to a temporary file as each 
+thread is parsed, and the temporary file is appended to the PPK file after the names.  Memory use 
+depends on the number of functions, not on the number of threads.
+"""
+
+import gzip
+import shutil
+import struct
+import tempfile
+from collections import OrderedDict
+from taucmdr import logger
+from taucmdr.cf.profile import ProfileFormatError
+from taucmdr.cf.profile.tau_profile import FunctionNames, ProfileReader, find_profile_files, profile_metrics
+
+
+LOGGER = logger.get_logger(__name__)
+
+PPK_VERSION = 2
+"""int: PPK format version written by :any:`write_ppk`."""
+
+PPK_COMPATIBLE_VERSION = 1
+"""int: Oldest PPK format version that can read files written by :any:`write_ppk`."""
+
+COMPRESS_LEVEL = 6
+"""int: gzip compression level, the same as Java's default deflate level."""
+
+_INT = struct.Struct('>i')
+
+_THREAD_ID = struct.Struct('>iii')
+
+_USER_EVENT = struct.Struct('>iidddd')
+
+
+def java_utf(value):
+    """Encode a string as written by Java's ``DataOutput.writeUTF``.
+    
+    Args:
+        value: String to encode.  Byte strings are decoded as UTF-8.
+        
+    Returns:
+        str: The 2-byte big-endian length followed by the string in Java modified UTF-8.
+        
+    Raises:
+        ProfileFormatError: The encoded string is longer than 65535 bytes.
+    """
+    if isinstance(value, str):
+        if len(value) <= 0xFFFF and '\0' not in value:
+            try:
+                value.decode('ascii')
+            except UnicodeDecodeError:
+                pass
+            else:
+                return struct.pack('>H', len(value)) + value
+        value = value.decode('utf-8', 'replace')
+    # Java strings are UTF-16 so characters beyond the Basic Multilingual Plane are encoded as surrogate pairs
+    data = value.encode('utf-16-be')
+    encoded = bytearray()
+    for unit in struct.unpack('>%dH' % (len(data) // 2), data):
+        if 0 < unit < 0x80:
+            encoded.append(unit)
+        elif unit < 0x800:
+            encoded.extend((0xC0 | unit >> 6, 0x80 | unit & 0x3F))
+        else:
+            encoded.extend((0xE0 | unit >> 12, 0x80 | unit >> 6 & 0x3F, 0x80 | unit & 0x3F))
+    if len(encoded) > 0xFFFF:
+        raise ProfileFormatError("String is too long for a PPK file: '%s...'" % value[:80])
+    return struct.pack('>H', len(encoded)) + str(encoded)
+
+
+def _attributes(attrs):
+    return _INT.pack(len(attrs)) + ''.join(java_utf(name) + java_utf(value) for name, value in attrs)
+
+
+def _names(names):
+    return _INT.pack(len(names)) + ''.join(java_utf(name) for name in names)
+
+
+class _ThreadWriter(object):
+    """Parses the profiles of one thread at a time and writes the thread's data to temporary files."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.functions = FunctionNames()
+        self.function_groups = []
+        self.groups = FunctionNames()
+        self.user_events = FunctionNames()
+        self.num_threads = 0
+        self.common_metadata = None
+        self.metadata_file = tempfile.TemporaryFile()
+        self.data_file = tempfile.TemporaryFile()
+        self._metric_ids = {metric: idx for idx, metric in enumerate(metrics)}
+        self._function_profile = struct.Struct('>idd%dd' % (2 * len(metrics)))
+
+    def close(self):
+        self.metadata_file.close()
+        self.data_file.close()
+
+    def _function_id(self, rec):
+        fid = self.functions.intern(rec.name)
+        if fid == len(self.function_groups):
+            self.function_groups.append([self.groups.intern(group.strip()) 
+                                         for group in rec.group.split('|') if group.strip()])
+        return fid
+
+    def add_thread(self, node, context, thread, files):
+        """Parse one thread's profiles and write the thread's data.
+        
+        Args:
+            node (int): Node number.
+            context (int): Context number.
+            thread (int): Thread number.
+            files (list): (metric, path) tuples naming the thread's profile for each metric.
+        """
+        num_values = 2 + 2 * len(self.metrics)
+        values = {}
+        metadata = events = None
+        for metric, path in files:
+            with ProfileReader(path) as reader:
+                idx = 2 + 2 * self._metric_ids[metric or reader.metric]
+                for rec in reader:
+                    fid = self._function_id(rec)
+                    try:
+                        row = values[fid]
+                    except KeyError:
+                        row = values[fid] = [0.0] * num_values
+                    row[0], row[1], row[idx], row[idx + 1] = rec.calls, rec.subroutines, rec.exclusive, rec.inclusive
+                if events is None:
+                    # Metadata and user events are the same in every metric's profile
+                    metadata = reader.metadata()
+                    events = [(self.user_events.intern(event.name), event) for event in reader.user_events()]
+        if self.common_metadata is None:
+            self.common_metadata = OrderedDict(metadata)
+        else:
+            thread_metadata = dict(metadata)
+            for name, value in self.common_metadata.items():
+                if thread_metadata.get(name) != value:
+                    del self.common_metadata[name]
+        self.metadata_file.write(_THREAD_ID.pack(node, context, thread) + _attributes(metadata))
+        pack = self._function_profile.pack
+        parts = [_THREAD_ID.pack(node, context, thread), _INT.pack(len(values))]
+        parts.extend(pack(fid, *values[fid]) for fid in sorted(values))
+        parts.append(_INT.pack(len(events)))
+        parts.extend(_USER_EVENT.pack(eid, event.samples, event.maximum, event.minimum, event.mean, event.sumsqr)
+                     for eid, event in sorted(events))
+        self.data_file.write(''.join(parts))
+        self.num_threads += 1
+
+    def write(self, fout):
+        """Write the complete PPK data stream.
+        
+        Args:
+            fout: File-like object to write to.
+        """
+        header = _INT.pack(0) + _attributes(self.common_metadata.items()) + _INT.pack(self.num_threads)
+        fout.write('\0P\0P\0K')
+        fout.write(_INT.pack(PPK_VERSION))
+        fout.write(_INT.pack(PPK_COMPATIBLE_VERSION))
+        fout.write(_INT.pack(len(header) + self.metadata_file.tell()))
+        fout.write(header)
+        self.metadata_file.seek(0)
+        shutil.copyfileobj(self.metadata_file, fout)
+        fout.write(_names(self.metrics))
+        fout.write(_names(self.groups.names))
+        fout.write(_INT.pack(len(self.functions)))
+        for name, groups in zip(self.functions.names, self.function_groups):
+            fout.write(java_utf(name) + _INT.pack(len(groups)) + ''.join(_INT.pack(gid) for gid in groups))
+        fout.write(_names(self.user_events.names))
+        fout.write(_INT.pack(self.num_threads))
+        self.data_file.seek(0)
+        shutil.copyfileobj(self.data_file, fout)
+
+
+def write_ppk(dest, path):
+    """Write a ParaProf packed profile from TAU text profiles.
+    
+    Args:
+        dest (str): Path to the PPK file to create.  An existing file is overwritten.
+        path (str): Path to a directory containing ``profile.*.*.*`` files or ``MULTI__*`` subdirectories.
+        
+    Raises:
+        ProfileFormatError: No profiles found or a profile could not be parsed.
+    """
+    files = find_profile_files(path)
+    if not files:
+        raise ProfileFormatError("No TAU profiles found in '%s'" % path)
+    threads = {}
+    for metric, node, context, thread, fpath in files:
+        threads.setdefault((node, context, thread), []).append((metric, fpath))
+    LOGGER.debug("Packing %d profile files from %d threads in '%s'", len(files), len(threads), path)
+    writer = _ThreadWriter(sorted(profile_metrics(files)))
+    try:
+        for key in sorted(threads):
+            writer.add_thread(*key, files=threads[key])
+        with gzip.GzipFile(dest, 'wb', COMPRESS_LEVEL) as fout:
+            writer.write(fout)
+    finally:
+        writer.close()
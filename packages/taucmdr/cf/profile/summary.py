@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Cross-thread aggregation of TAU profile data.
+
+Per-function statistics are accumulated one thread at a time so memory use depends on the number
+of functions, not on the number of threads.  NumPy is used for the per-thread updates if it is 
+installed.  Otherwise the same updates are done in loops over :py:mod:`array` columns.
+"""
+
+import math
+from abc import ABCMeta, abstractmethod
+from array import array
+from itertools import izip
+from collections import namedtuple
+from taucmdr.error import ConfigurationError
+from taucmdr.cf.profile.tau_profile import DEFAULT_METRIC
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+FunctionSummary = namedtuple('FunctionSummary', ['name', 'threads', 'total', 'mean', 'minimum', 'maximum', 
+                                                 'stddev', 'imbalance'])
+"""Statistics of one function's metric values across all threads.
+
+`threads` is the number of threads that called the function.  The other statistics count threads
+that did not call the function as zeros.  `imbalance` is ``maximum / mean - 1``.
+"""
+
+
+class Aggregate(object):
+    """Running per-function statistics of a metric's exclusive or inclusive values.
+    
+    Columns are indexed by function identifier.  Use :any:`Aggregate.create` to get an instance.
+    
+    Attributes:
+        metric (str): Name of the aggregated metric.
+        inclusive (bool): True if inclusive values are aggregated, False if exclusive values are aggregated.
+        num_threads (int): Number of threads added so far.
+        present: Number of threads that called each function.
+        total: Sum of each function's values.
+        total_sq: Sum of the squares of each function's values.
+        minimum: Smallest value of each function among threads that called it.
+        maximum: Largest value of each function.
+    """
+
+    __metaclass__ = ABCMeta
+
+    def __init__(self, metric, inclusive=False):
+        self.metric = metric
+        self.inclusive = inclusive
+        self.num_threads = 0
+
+    @staticmethod
+    def create(metric, use_numpy=None, inclusive=False):
+        """Create an empty aggregate.
+        
+        Args:
+            metric (str): Name of the metric to aggregate.
+            use_numpy (bool): If True use NumPy, if False use :py:mod:`array`, if None use NumPy if it is installed.
+            inclusive (bool): If True aggregate inclusive values, otherwise aggregate exclusive values.
+            
+        Returns:
+            Aggregate: The new aggregate.
+        """
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        cls = NumpyAggregate if use_numpy else ArrayAggregate
+        return cls(metric, inclusive)
+
+    @abstractmethod
+    def add(self, functions, values, threads=1):
+        """Add values from one or more threads.
+        
+        Args:
+            functions: Buffer of C long function identifiers, e.g. an :py:mod:`array` with typecode 'l'.
+                       If `threads` is 1 then each identifier may appear at most once.
+            values: Buffer of double precision metric values parallel to `functions`.
+            threads (int): Number of threads the values came from.
+        """
+
+    @abstractmethod
+    def merge(self, other, id_map):
+        """Add another aggregate's statistics to this aggregate.
+        
+        Args:
+            other (Aggregate): Aggregate of the same metric and type as this aggregate.
+            id_map (list): This aggregate's function identifier for each of `other`'s function identifiers.
+        """
+
+    def add_thread(self, prof):
+        """Add a thread profile's values for this aggregate's metric.
+        
+        Threads without data for the metric are ignored.
+        
+        Args:
+            prof (ThreadProfile): Thread profile data.
+        """
+        values = (prof.inclusive if self.inclusive else prof.exclusive).get(self.metric)
+        if values is not None:
+            self.add(prof.functions, values)
+
+    def summarize(self, names):
+        """Compute per-function statistics.
+        
+        Args:
+            names: Function names indexed by function identifier.
+            
+        Returns:
+            list: :any:`FunctionSummary` tuples sorted by descending total.
+        """
+        count = self.num_threads
+        result = []
+        columns = (self.present.tolist(), self.total.tolist(), self.total_sq.tolist(), 
+                   self.minimum.tolist(), self.maximum.tolist())
+        for fid, (present, total, total_sq, minimum, maximum) in enumerate(izip(*columns)):
+            if not present:
+                continue
+            mean = total / count
+            stddev = math.sqrt(max(total_sq / count - mean * mean, 0.0))
+            if present < count:
+                minimum = 0.0
+            imbalance = maximum / mean - 1.0 if mean > 0 else 0.0
+            result.append(FunctionSummary(names[fid], present, total, mean, minimum, maximum, stddev, imbalance))
+        result.sort(key=lambda summary: summary.total, reverse=True)
+        return result
+
+    def statistic(self, name):
+        """Get one statistic for every function.
+        
+        Args:
+            name (str): 'total', 'mean', or 'maximum'.
+            
+        Returns:
+            list: The statistic indexed by function identifier, or None for functions no thread called.
+        """
+        if name == 'total':
+            values = self.total.tolist()
+        elif name == 'mean':
+            values = [total / self.num_threads for total in self.total.tolist()]
+        elif name == 'maximum':
+            values = self.maximum.tolist()
+        else:
+            raise ValueError("Invalid statistic: %s" % name)
+        return [value if present else None for present, value in izip(self.present.tolist(), values)]
+
+
+class ArrayAggregate(Aggregate):
+    """Aggregate stored in :py:mod:`array` columns and updated in Python loops."""
+
+    def __init__(self, metric, inclusive=False):
+        super(ArrayAggregate, self).__init__(metric, inclusive)
+        self.present = array('l')
+        self.total = array('d')
+        self.total_sq = array('d')
+        self.minimum = array('d')
+        self.maximum = array('d')
+
+    def _grow(self, size):
+        extra = size - len(self.total)
+        if extra > 0:
+            self.present.extend(array('l', [0]) * extra)
+            self.total.extend(array('d', [0.0]) * extra)
+            self.total_sq.extend(array('d', [0.0]) * extra)
+            self.minimum.extend(array('d', [float('inf')]) * extra)
+            self.maximum.extend(array('d', [0.0]) * extra)
+
+    def add(self, functions, values, threads=1):
+        self.num_threads += threads
+        if not functions:
+            return
+        self._grow(max(functions) + 1)
+        present, total, total_sq = self.present, self.total, self.total_sq
+        minimum, maximum = self.minimum, self.maximum
+        for fid, value in izip(functions, values):
+            present[fid] += 1
+            total[fid] += value
+            total_sq[fid] += value * value
+            if value < minimum[fid]:
+                minimum[fid] = value
+            if value > maximum[fid]:
+                maximum[fid] = value
+
+    def merge(self, other, id_map):
+        self.num_threads += other.num_threads
+        if not id_map:
+            return
+        self._grow(max(id_map) + 1)
+        present, total, total_sq = self.present, self.total, self.total_sq
+        minimum, maximum = self.minimum, self.maximum
+        for fid, ours in enumerate(id_map):
+            present[ours] += other.present[fid]
+            total[ours] += other.total[fid]
+            total_sq[ours] += other.total_sq[fid]
+            if other.minimum[fid] < minimum[ours]:
+                minimum[ours] = other.minimum[fid]
+            if other.maximum[fid] > maximum[ours]:
+                maximum[ours] = other.maximum[fid]
+
+
+class NumpyAggregate(Aggregate):
+    """Aggregate stored in NumPy arrays and updated with vector operations."""
+
+    def __init__(self, metric, inclusive=False):
+        super(NumpyAggregate, self).__init__(metric, inclusive)
+        self.present = numpy.zeros(0, dtype=numpy.int_)
+        self.total = numpy.zeros(0)
+        self.total_sq = numpy.zeros(0)
+        self.minimum = numpy.zeros(0)
+        self.maximum = numpy.zeros(0)
+
+    def _grow(self, size):
+        extra = size - len(self.total)
+        if extra > 0:
+            self.present = numpy.concatenate((self.present, numpy.zeros(extra, dtype=numpy.int_)))
+            self.total = numpy.concatenate((self.total, numpy.zeros(extra)))
+            self.total_sq = numpy.concatenate((self.total_sq, numpy.zeros(extra)))
+            self.minimum = numpy.concatenate((self.minimum, numpy.full(extra, numpy.inf)))
+            self.maximum = numpy.concatenate((self.maximum, numpy.zeros(extra)))
+
+    def add(self, functions, values, threads=1):
+        self.num_threads += threads
+        if not len(functions):
+            return
+        fids = numpy.frombuffer(functions, dtype=numpy.dtype('l'))
+        vals = numpy.frombuffer(values, dtype=numpy.float64)
+        self._grow(int(fids.max()) + 1)
+        if threads == 1:
+            # Function identifiers are unique within a thread so fancy-indexed updates are safe
+            self.present[fids] += 1
+            self.total[fids] += vals
+            self.total_sq[fids] += vals * vals
+            self.minimum[fids] = numpy.minimum(self.minimum[fids], vals)
+            self.maximum[fids] = numpy.maximum(self.maximum[fids], vals)
+        else:
+            numpy.add.at(self.present, fids, 1)
+            numpy.add.at(self.total, fids, vals)
+            numpy.add.at(self.total_sq, fids, vals * vals)
+            numpy.minimum.at(self.minimum, fids, vals)
+            numpy.maximum.at(self.maximum, fids, vals)
+
+    def merge(self, other, id_map):
+        self.num_threads += other.num_threads
+        if not id_map:
+            return
+        ids = numpy.array(id_map, dtype=numpy.int_)
+        count = len(ids)
+        self._grow(int(ids.max()) + 1)
+        self.present[ids] += other.present[:count]
+        self.total[ids] += other.total[:count]
+        self.total_sq[ids] += other.total_sq[:count]
+        self.minimum[ids] = numpy.minimum(self.minimum[ids], other.minimum[:count])
+        self.maximum[ids] = numpy.maximum(self.maximum[ids], other.maximum[:count])
+
+
+def choose_metric(metrics, metric=None):
+    """Choose the metric to aggregate.
+    
+    Args:
+        metrics: Names of the available metrics.
+        metric (str): Requested metric, or None to choose :any:`DEFAULT_METRIC` if it is available 
+                      or else the first metric in sorted order.
+        
+    Returns:
+        str: The metric name.
+        
+    Raises:
+        ConfigurationError: `metric` is not available.
+    """
+    if not metric:
+        return DEFAULT_METRIC if DEFAULT_METRIC in metrics else sorted(metrics)[0]
+    if metric not in metrics:
+        raise ConfigurationError("No data for metric '%s'" % metric, 
+                                 "Available metrics are: %s" % ', '.join(sorted(metrics)))
+    return metric
+
+
+def summarize(data, metric=None, use_numpy=None, inclusive=False):
+    """Compute per-function statistics of a metric's values across all threads.
+    
+    Args:
+        data (ProfileData): Parsed profile data.
+        metric (str): Metric to summarize, or None to choose a metric with :any:`choose_metric`.
+        use_numpy (bool): Passed to :any:`Aggregate.create`.
+        inclusive (bool): If True summarize inclusive values, otherwise summarize exclusive values.
+        
+    Returns:
+        list: :any:`FunctionSummary` tuples sorted by descending total.
+        
+    Raises:
+        ConfigurationError: The profile data has no values for `metric`.
+    """
+    metric = choose_metric(data.metrics, metric)
+    agg = Aggregate.create(metric, use_numpy, inclusive)
+    for prof in data.threads:
+        agg.add_thread(prof)
+    return agg.summarize(data.functions)
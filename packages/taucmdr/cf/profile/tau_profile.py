@@ -0,0 +1,485 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""TAU text profile reader.
+
+TAU writes one text profile per thread per metric, named ``profile.<node>.<context>.<thread>``.
+Single-metric profiles are written directly to the profile directory.  Multi-metric profiles 
+are written to one ``MULTI__<metric>`` subdirectory per metric.  Each file begins with a header
+naming the number of functions and the metric, followed by one line per function::
+
+    2 templated_functions_MULTI_TIME
+    # Name Calls Subrs Excl Incl ProfileCalls #
+    "main" 1 1 1000 3000 0 GROUP="TAU_DEFAULT"
+    "compute" 10 0 2000 2000 0 GROUP="TAU_USER"
+    0 aggregates
+    1 userevents
+    # eventname numevents max min mean sumsqr
+    "Message size" 4 8 4 6 160
+
+Files are read one line at a time and only the sections a caller asks for are parsed, so memory 
+use depends on the number of functions, not on the size of the file.  Parsed data is stored in 
+:py:mod:`array` columns indexed through a shared function name dictionary.
+"""
+
+import os
+import re
+from xml.etree import ElementTree
+from array import array
+from collections import namedtuple
+from taucmdr import logger
+from taucmdr.cf.compression import CODECS, compressed_suffix, open_file
+from taucmdr.cf.profile import ProfileFormatError
+
+
+LOGGER = logger.get_logger(__name__)
+
+PROFILE_FILE_REGEX = re.compile(r'^profile\.(-?\d+)\.(\d+)\.(\d+)(?:%s)?$' % 
+                                '|'.join(re.escape(suffix) for suffix in CODECS.itervalues()))
+"""Regular expression matching TAU text profile file names, including compressed profiles."""
+
+MULTI_PREFIX = 'MULTI__'
+"""str: Prefix of the per-metric subdirectories of a multi-metric profile."""
+
+DEFAULT_METRIC = 'TIME'
+"""str: Metric name for profiles that do not name their metric."""
+
+_HEADER_REGEX = re.compile(r'^(\d+)\s+templated_functions(?:_MULTI_(\S+))?')
+
+_COUNT_REGEX = re.compile(r'^(\d+)\s+(aggregates|userevents)')
+
+
+FunctionRecord = namedtuple('FunctionRecord', ['name', 'calls', 'subroutines', 'exclusive', 'inclusive', 'group'])
+"""One function's data from a TAU text profile."""
+
+UserEventRecord = namedtuple('UserEventRecord', ['name', 'samples', 'maximum', 'minimum', 'mean', 'sumsqr'])
+"""One user event's data from a TAU text profile."""
+
+
+def find_profile_files(path):
+    """Find TAU text profiles in a profile directory.
+    
+    Args:
+        path (str): Path to a directory containing ``profile.*.*.*`` files or ``MULTI__*`` subdirectories.
+        
+    Returns:
+        list: (metric, node, context, thread, path) tuples sorted by metric and thread.  `metric` is 
+              None for single-metric profiles since the metric is named in the file header.  If a 
+              profile is found both compressed and uncompressed, e.g. while it is being compressed,
+              the uncompressed file is returned.
+    """
+    found = {}
+    def add(metric, match, path):
+        key = (metric,) + tuple(int(x) for x in match.groups())
+        if key not in found or compressed_suffix(found[key]):
+            found[key] = path
+    for name in os.listdir(path):
+        if name.startswith(MULTI_PREFIX):
+            metric = name[len(MULTI_PREFIX):]
+            metric_path = os.path.join(path, name)
+            if not os.path.isdir(metric_path):
+                continue
+            for fname in os.listdir(metric_path):
+                match = PROFILE_FILE_REGEX.match(fname)
+                if match:
+                    add(metric, match, os.path.join(metric_path, fname))
+        else:
+            match = PROFILE_FILE_REGEX.match(name)
+            if match:
+                add(None, match, os.path.join(path, name))
+    return sorted(key + (fpath,) for key, fpath in found.iteritems())
+
+
+def profile_metrics(files):
+    """Get the names of the metrics recorded in a set of profile files.
+    
+    Args:
+        files (list): Profile files as returned by :any:`find_profile_files`.
+        
+    Returns:
+        set: Metric names.
+    """
+    metrics = set(metric for metric, _, _, _, _ in files if metric)
+    for metric, _, _, _, path in files:
+        if not metric:
+            # All single-metric profiles in a directory record the same metric, named in the file header
+            with ProfileReader(path) as reader:
+                metrics.add(reader.metric)
+            break
+    return metrics
+
+
+def parse_function_line(line):
+    """Parse one function line from a TAU text profile.
+    
+    Args:
+        line (str): A line of the form ``"name" calls subrs excl incl profilecalls GROUP="group"``.
+        
+    Returns:
+        FunctionRecord: The parsed function data.
+        
+    Raises:
+        ValueError: `line` is not a function line.
+    """
+    head, sep, group = line.rstrip().rpartition(' GROUP="')
+    if not sep:
+        head, group = line.rstrip(), ''
+    elif group.endswith('"'):
+        group = group[:-1]
+    name, calls, subrs, excl, incl, _ = head.rsplit(None, 5)
+    name = name.strip()
+    if len(name) < 2 or name[0] != '"' or name[-1] != '"':
+        raise ValueError("Function name is not quoted")
+    return FunctionRecord(name[1:-1], float(calls), float(subrs), float(excl), float(incl), group)
+
+
+def parse_user_event_line(line):
+    """Parse one user event line from a TAU text profile.
+    
+    Args:
+        line (str): A line of the form ``"name" numevents max min mean sumsqr``.
+        
+    Returns:
+        UserEventRecord: The parsed user event data.
+        
+    Raises:
+        ValueError: `line` is not a user event line.
+    """
+    name, samples, maximum, minimum, mean, sumsqr = line.rstrip().rsplit(None, 5)
+    name = name.strip()
+    if len(name) < 2 or name[0] != '"' or name[-1] != '"':
+        raise ValueError("User event name is not quoted")
+    return UserEventRecord(name[1:-1], int(float(samples)), float(maximum), float(minimum), float(mean), 
+                           float(sumsqr))
+
+
+class ProfileReader(object):
+    """Streaming reader for a single TAU text profile.
+    
+    The header is read when the reader is created.  Iterating over the reader yields a 
+    :any:`FunctionRecord` for each function in the profile.  :any:`user_events` then reads 
+    the user event section.
+    
+    Attributes:
+        path (str): Path to the profile file.
+        metric (str): Name of the metric recorded in the file.
+        num_functions (int): Number of functions in the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open_file(path, 'r')
+        try:
+            header = self._file.readline()
+            match = _HEADER_REGEX.match(header)
+            if not match:
+                raise ProfileFormatError("Invalid TAU profile header in '%s': %r" % (path, header[:80]))
+            self.num_functions = int(match.group(1))
+            self.metric = match.group(2) or DEFAULT_METRIC
+            # Column names and optional metadata
+            self._columns = self._file.readline()
+            self._lineno = 2
+        except:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ex_type, value, traceback):
+        self.close()
+        return False
+
+    def __iter__(self):
+        while self._lineno < self.num_functions + 2:
+            line = self._readline()
+            try:
+                yield parse_function_line(line)
+            except ValueError:
+                raise ProfileFormatError("Invalid function data on line %d of '%s': %r" % 
+                                         (self._lineno, self.path, line[:80]))
+
+    def _readline(self):
+        self._lineno += 1
+        return self._file.readline()
+
+    def metadata(self):
+        """Get the metadata recorded in the profile header.
+        
+        Returns:
+            list: (name, value) tuples in file order.  Empty if the profile has no metadata 
+                  or the metadata could not be parsed.
+        """
+        start = self._columns.find('<metadata>')
+        if start < 0:
+            return []
+        try:
+            root = ElementTree.fromstring(self._columns[start:].strip())
+        except ElementTree.ParseError as err:
+            LOGGER.debug("Ignoring invalid metadata in '%s': %s", self.path, err)
+            return []
+        return [(attr.findtext('name', ''), attr.findtext('value', '')) for attr in root.iter('attribute')]
+
+    def user_events(self):
+        """Read the user event section of the profile.
+        
+        Any unread function lines are skipped.  Profiles without a user event section have no user events.
+        
+        Yields:
+            UserEventRecord: One record for each user event in the profile.
+        """
+        for _ in self:
+            pass
+        match = _COUNT_REGEX.match(self._readline())
+        if match and match.group(2) == 'aggregates':
+            # TAU always writes zero aggregates, but skip their lines if a profile has any
+            for _ in xrange(int(match.group(1))):
+                self._readline()
+            match = _COUNT_REGEX.match(self._readline())
+        if not (match and match.group(2) == 'userevents'):
+            return
+        # Column names
+        self._readline()
+        for _ in xrange(int(match.group(1))):
+            line = self._readline()
+            try:
+                yield parse_user_event_line(line)
+            except ValueError:
+                raise ProfileFormatError("Invalid user event data on line %d of '%s': %r" % 
+                                         (self._lineno, self.path, line[:80]))
+
+    def close(self):
+        """Close the profile file."""
+        self._file.close()
+
+
+class FunctionNames(object):
+    """Dictionary mapping function names to dense integer identifiers.
+    
+    Attributes:
+        names (list): Function names indexed by identifier.
+    """
+
+    def __init__(self, names=None):
+        self.names = []
+        self._ids = {}
+        for name in names or []:
+            self.intern(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, fid):
+        return self.names[fid]
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def intern(self, name):
+        """Get a function's identifier, adding the function to the dictionary if necessary.
+        
+        Args:
+            name (str): Function name.
+            
+        Returns:
+            int: The function's identifier.
+        """
+        try:
+            return self._ids[name]
+        except KeyError:
+            fid = self._ids[name] = len(self.names)
+            self.names.append(name)
+            return fid
+
+    def get_id(self, name):
+        """Get a function's identifier.
+        
+        Args:
+            name (str): Function name.
+            
+        Returns:
+            int: The function's identifier or None if the function is not in the dictionary.
+        """
+        return self._ids.get(name)
+
+
+class ThreadProfile(object):
+    """Performance data from one thread stored in parallel array columns.
+    
+    Position ``i`` in each column describes function ``functions[i]``.
+    
+    Attributes:
+        node (int): Node number.
+        context (int): Context number.
+        thread (int): Thread number.
+        functions (array): Function identifiers.
+        calls (array): Number of calls to each function.
+        subroutines (array): Number of subroutine calls made by each function.
+        exclusive (dict): Exclusive metric values keyed by metric name.
+        inclusive (dict): Inclusive metric values keyed by metric name.
+    """
+
+    __slots__ = ('node', 'context', 'thread', 'functions', 'calls', 'subroutines', 'exclusive', 'inclusive', 
+                 '_positions')
+
+    def __init__(self, node, context, thread):
+        self.node = node
+        self.context = context
+        self.thread = thread
+        self.functions = array('l')
+        self.calls = array('d')
+        self.subroutines = array('d')
+        self.exclusive = {}
+        self.inclusive = {}
+        self._positions = None
+
+    def _position(self, fid):
+        if self._positions is None:
+            self._positions = {fid: pos for pos, fid in enumerate(self.functions)}
+        try:
+            return self._positions[fid]
+        except KeyError:
+            pos = self._positions[fid] = len(self.functions)
+            self.functions.append(fid)
+            self.calls.append(0.0)
+            self.subroutines.append(0.0)
+            for column in self.exclusive.itervalues():
+                column.append(0.0)
+            for column in self.inclusive.itervalues():
+                column.append(0.0)
+            return pos
+
+    def add_metric(self, metric, records, names):
+        """Add one metric's data to the thread profile.
+        
+        Args:
+            metric (str): Metric name.
+            records: Iterable of :any:`FunctionRecord`.
+            names (FunctionNames): Dictionary of function identifiers.
+        """
+        first = not self.exclusive
+        exclusive = self.exclusive[metric] = array('d', [0.0]) * len(self.functions)
+        inclusive = self.inclusive[metric] = array('d', [0.0]) * len(self.functions)
+        if first:
+            # Fast path for the first metric: append in file order
+            for rec in records:
+                self.functions.append(names.intern(rec.name))
+                self.calls.append(rec.calls)
+                self.subroutines.append(rec.subroutines)
+                exclusive.append(rec.exclusive)
+                inclusive.append(rec.inclusive)
+            return
+        for rec in records:
+            pos = self._position(names.intern(rec.name))
+            self.calls[pos] = rec.calls
+            self.subroutines[pos] = rec.subroutines
+            exclusive[pos] = rec.exclusive
+            inclusive[pos] = rec.inclusive
+
+
+class ProfileData(object):
+    """Parsed TAU profile data for all threads of a trial.
+    
+    Attributes:
+        functions (FunctionNames): Function name dictionary shared by all threads.
+        metrics (list): Names of the metrics in the profile data.
+        threads (list): :any:`ThreadProfile` objects sorted by node, context, and thread.
+    """
+
+    def __init__(self):
+        self.functions = FunctionNames()
+        self.metrics = []
+        self.threads = []
+        self._thread_index = {}
+
+    def get_thread(self, node, context, thread):
+        """Get the profile of a thread, creating an empty profile if necessary.
+        
+        Args:
+            node (int): Node number.
+            context (int): Context number.
+            thread (int): Thread number.
+            
+        Returns:
+            ThreadProfile: The thread's profile.
+        """
+        key = (node, context, thread)
+        try:
+            return self._thread_index[key]
+        except KeyError:
+            prof = self._thread_index[key] = ThreadProfile(node, context, thread)
+            self.threads.append(prof)
+            return prof
+
+    def add_thread(self, prof):
+        """Add a parsed thread profile.
+        
+        Args:
+            prof (ThreadProfile): Profile of a thread not yet in the profile data.  Its function
+                                  identifiers must come from this profile data's function dictionary.
+        """
+        self._thread_index[prof.node, prof.context, prof.thread] = prof
+        self.threads.append(prof)
+
+    def load_file(self, path, node, context, thread, metric=None):
+        """Parse a TAU text profile and add its data.
+        
+        Args:
+            path (str): Path to the profile file.
+            node (int): Node number.
+            context (int): Context number.
+            thread (int): Thread number.
+            metric (str): Metric name, or None to use the metric named in the file header.
+        """
+        with ProfileReader(path) as reader:
+            metric = metric or reader.metric
+            if metric not in self.metrics:
+                self.metrics.append(metric)
+            self.get_thread(node, context, thread).add_metric(metric, reader, self.functions)
+
+    @classmethod
+    def load(cls, path):
+        """Parse all TAU text profiles in a profile directory.
+        
+        Args:
+            path (str): Path to a directory containing ``profile.*.*.*`` files or ``MULTI__*`` subdirectories.
+            
+        Returns:
+            ProfileData: The parsed profile data.
+            
+        Raises:
+            ProfileFormatError: No profiles found or a profile could not be parsed.
+        """
+        files = find_profile_files(path)
+        if not files:
+            raise ProfileFormatError("No TAU profiles found in '%s'" % path)
+        LOGGER.debug("Parsing %d profile files in '%s'", len(files), path)
+        data = cls()
+        for metric, node, context, thread, fpath in files:
+            data.load_file(fpath, node, context, thread, metric)
+        data.threads.sort(key=lambda prof: (prof.node, prof.context, prof.thread))
+        return data
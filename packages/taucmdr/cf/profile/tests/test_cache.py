@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Test functions.
+
+Functions used for unit tests of cache.py.
+"""
+
+import os
+from taucmdr import tests
+from taucmdr.cf.profile.tau_profile import ProfileData, find_profile_files
+from taucmdr.cf.profile.summary import summarize
+from taucmdr.cf.profile.cache import ProfileCache
+from taucmdr.cf.profile.ingest import MIN_CHUNK_SIZE
+from taucmdr.cf.profile.tests.test_tau_profile import write_profile
+
+
+class ProfileCacheTest(tests.TestCase):
+    """Unit tests for the persistent profile cache."""
+
+    def _write_profiles(self, name, count):
+        path = os.path.join(tests.get_test_workdir(), name)
+        for rank in xrange(count):
+            write_profile(os.path.join(path, 'MULTI__TIME', 'profile.%d.0.0' % rank), 'TIME', 
+                          [('main', 1, 1, rank, 100), ('rank_%d' % (rank % 5), 2, 0, 2 * rank + 1, 2 * rank + 1)])
+            write_profile(os.path.join(path, 'MULTI__PAPI_TOT_CYC', 'profile.%d.0.0' % rank), 'PAPI_TOT_CYC', 
+                          [('main', 1, 1, 10 * rank, 1000)])
+        return path
+
+    def test_build_and_load(self):
+        path = self._write_profiles('cache', 2 * MIN_CHUNK_SIZE + 3)
+        cache = ProfileCache(path)
+        self.assertFalse(cache.is_valid(100))
+        cache.build(100, workers=2)
+        self.assertTrue(cache.is_valid(100))
+        self.assertEqual(cache.metrics, ['PAPI_TOT_CYC', 'TIME'])
+        expected = ProfileData.load(path)
+        cached = cache.load()
+        self.assertEqual(len(cached.threads), len(expected.threads))
+        def values(data, prof):
+            return dict((data.functions[fid], (prof.exclusive['TIME'][i], prof.inclusive['PAPI_TOT_CYC'][i]))
+                        for i, fid in enumerate(prof.functions))
+        for exp, found in zip(expected.threads, cached.threads):
+            self.assertEqual((exp.node, exp.context, exp.thread), (found.node, found.context, found.thread))
+            self.assertEqual(values(expected, exp), values(cached, found))
+        for metric in 'TIME', 'PAPI_TOT_CYC':
+            aggregate, names = cache.aggregate(metric, use_numpy=False)
+            self.assertEqual(aggregate.summarize(names), summarize(expected, metric, use_numpy=False))
+
+    def test_invalidation(self):
+        path = self._write_profiles('cache_invalid', 3)
+        cache = ProfileCache(path)
+        cache.build(100)
+        self.assertTrue(cache.is_valid(100))
+        self.assertFalse(cache.is_valid(101))
+        write_profile(os.path.join(path, 'MULTI__TIME', 'profile.3.0.0'), 'TIME', [('main', 1, 0, 1, 1)])
+        self.assertFalse(ProfileCache(path).is_valid(100))
+        self.assertEqual(len(find_profile_files(path)), 7)
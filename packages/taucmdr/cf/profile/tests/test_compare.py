@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Test functions.
+
+Functions used for unit tests of compare.py.
+"""
+
+import os
+from taucmdr import tests
+from taucmdr.cf.profile.compare import compare, ADDED, REMOVED
+from taucmdr.cf.profile.ingest import aggregate_profiles
+from taucmdr.cf.profile.tests.test_tau_profile import write_profile
+
+
+BASE_PROFILES = [[('main', 1, 1, 10, 40), ('foo', 1, 0, 30, 30)],
+                 [('main', 1, 1, 30, 40), ('foo', 1, 0, 10, 10)]]
+
+
+class CompareTest(tests.TestCase):
+    """Unit tests for trial-to-trial comparison."""
+
+    def _aggregate(self, name, profiles):
+        path = os.path.join(tests.get_test_workdir(), name)
+        if not os.path.isdir(path):
+            for rank, functions in enumerate(profiles):
+                write_profile(os.path.join(path, 'profile.%d.0.0' % rank), None, functions)
+        return aggregate_profiles(path, workers=1)
+
+    def test_compare(self):
+        base = self._aggregate('compare_base', BASE_PROFILES)
+        other = self._aggregate('compare_other', [[('main', 1, 1, 15, 40), ('bar', 1, 0, 25, 25)],
+                                                  [('main', 1, 1, 25, 40), ('bar', 1, 0, 15, 15)]])
+        rows = dict((row.name, row) for row in compare([base, other]))
+        self.assertItemsEqual(rows, ['main', 'foo', 'bar'])
+        self.assertEqual(rows['main'].values, [20, 20])
+        self.assertEqual(rows['main'].deltas, [0])
+        self.assertEqual(rows['main'].relative, [0])
+        self.assertEqual(rows['main'].status, '')
+        self.assertEqual(rows['foo'].values, [20, None])
+        self.assertEqual(rows['foo'].deltas, [-20])
+        self.assertEqual(rows['foo'].relative, [-1])
+        self.assertEqual(rows['foo'].status, REMOVED)
+        self.assertEqual(rows['bar'].values, [None, 20])
+        self.assertEqual(rows['bar'].deltas, [20])
+        self.assertEqual(rows['bar'].relative, [None])
+        self.assertEqual(rows['bar'].status, ADDED)
+
+    def test_compare_total(self):
+        base = self._aggregate('compare_base', BASE_PROFILES)
+        rows = dict((row.name, row) for row in compare([base, base], 'total'))
+        self.assertEqual(rows['main'].values, [40, 40])
+        self.assertEqual(rows['foo'].deltas, [0])
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Test functions.
+
+Functions used for unit tests of ingest.py.
+"""
+
+import os
+from taucmdr import tests
+from taucmdr.cf.profile import ProfileFormatError
+from taucmdr.cf.profile.tau_profile import ProfileData
+from taucmdr.cf.profile.summary import summarize
+from taucmdr.cf.profile.ingest import aggregate_profiles, MIN_CHUNK_SIZE
+from taucmdr.cf.profile.tests.test_tau_profile import write_profile
+
+
+class IngestTest(tests.TestCase):
+    """Unit tests for parallel profile ingestion."""
+
+    def _write_profiles(self, name, count):
+        path = os.path.join(tests.get_test_workdir(), name)
+        for rank in xrange(count):
+            functions = [('main', 1, 1, rank, 100), ('rank_%d' % (rank % 5), 2, 0, 2 * rank + 1, 2 * rank + 1)]
+            if rank % 3:
+                functions.append(('sometimes', 1, 0, 7, 7))
+            write_profile(os.path.join(path, 'MULTI__TIME', 'profile.%d.0.0' % rank), 'TIME', functions)
+        return path
+
+    def test_parallel_matches_serial(self):
+        path = self._write_profiles('ingest', 3 * MIN_CHUNK_SIZE + 5)
+        expected = summarize(ProfileData.load(path), use_numpy=False)
+        for workers in 1, 3:
+            aggregate, names = aggregate_profiles(path, workers=workers, use_numpy=False)
+            self.assertEqual(aggregate.num_threads, 3 * MIN_CHUNK_SIZE + 5)
+            summaries = aggregate.summarize(names)
+            self.assertEqual(len(summaries), len(expected))
+            for found, exp in zip(summaries, expected):
+                self.assertEqual(found.name, exp.name)
+                self.assertEqual(found.threads, exp.threads)
+                self.assertAlmostEqual(found.total, exp.total)
+                self.assertAlmostEqual(found.stddev, exp.stddev)
+                self.assertEqual(found.minimum, exp.minimum)
+                self.assertEqual(found.maximum, exp.maximum)
+
+    def test_parallel_error(self):
+        path = self._write_profiles('ingest_error', 2 * MIN_CHUNK_SIZE)
+        with open(os.path.join(path, 'MULTI__TIME', 'profile.%d.0.0' % MIN_CHUNK_SIZE), 'w') as fout:
+            fout.write('1 templated_functions_MULTI_TIME\n# Name Calls Subrs Excl Incl ProfileCalls #\ngarbage\n')
+        self.assertRaises(ProfileFormatError, aggregate_profiles, path, workers=2, use_numpy=False)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Test functions.
+
+Functions used for unit tests of merged_profile.py.
+"""
+
+import os
+from taucmdr import tests
+from taucmdr.cf.profile import ProfileFormatError
+from taucmdr.cf.profile.merged_profile import aggregate_merged_profile, load_merged_profile
+
+
+MERGED_PROFILE = """<?xml version="1.0" encoding="UTF-8"?>
+<profile_xml>
+<thread id="0.0.0.0" node="0" context="0" thread="0">
+<metadata><attribute><name>Node Name</name><value>n001</value></attribute></metadata>
+</thread>
+<thread id="1.0.0.0" node="1" context="0" thread="0">
+<metadata><attribute><name>Node Name</name><value>n002</value></attribute></metadata>
+</thread>
+<definitions thread="*">
+<metric id="0"><name>TIME</name><units>microseconds</units></metric>
+<metric id="1"><name>PAPI_TOT_CYC</name><units>counts</units></metric>
+<event id="0"><name>main</name><group>TAU_DEFAULT</group></event>
+<event id="1"><name>foo</name><group>TAU_USER</group></event>
+<event id="2"><name>unused</name><group>TAU_USER</group></event>
+</definitions>
+<profile thread="0.0.0.0">
+<name>final</name>
+<interval_data metrics="0 1">
+0 1 1 10 40 100 400
+1 1 0 30 30 300 300
+</interval_data>
+</profile>
+<profile thread="1.0.0.0">
+<name>final</name>
+<interval_data metrics="1 0">
+0 1 1 200 300 20 30
+</interval_data>
+</profile>
+</profile_xml>
+"""
+
+
+class MergedProfileTest(tests.TestCase):
+    """Unit tests for the merged TAU XML profile reader."""
+
+    def _write(self, name, content):
+        path = os.path.join(tests.get_test_workdir(), name)
+        with open(path, 'w') as fout:
+            fout.write(content)
+        return path
+
+    def test_load(self):
+        data = load_merged_profile(self._write('tauprofile.xml', MERGED_PROFILE))
+        self.assertEqual(data.metrics, ['TIME', 'PAPI_TOT_CYC'])
+        self.assertEqual(data.functions.names, ['main', 'foo'])
+        self.assertEqual([(prof.node, prof.context, prof.thread) for prof in data.threads], [(0, 0, 0), (1, 0, 0)])
+        self.assertEqual(list(data.threads[0].calls), [1, 1])
+        self.assertEqual(list(data.threads[0].exclusive['TIME']), [10, 30])
+        self.assertEqual(list(data.threads[0].inclusive['PAPI_TOT_CYC']), [400, 300])
+        self.assertEqual(list(data.threads[1].exclusive['TIME']), [20])
+        self.assertEqual(list(data.threads[1].exclusive['PAPI_TOT_CYC']), [200])
+
+    def test_definition_blocks(self):
+        content = MERGED_PROFILE.replace(
+            '<metric id="1"><name>PAPI_TOT_CYC</name><units>counts</units></metric>\n', '').replace(
+                '<event id="1"><name>foo</name><group>TAU_USER</group></event>\n', '').replace(
+                    '<profile thread="0.0.0.0">', 
+                    '<definitions thread="*">\n'
+                    '<metric id="1"><name>PAPI_TOT_CYC</name><units>counts</units></metric>\n'
+                    '<event id="1"><name>foo</name><group>TAU_USER</group></event>\n'
+                    '</definitions>\n'
+                    '<profile thread="0.0.0.0">').replace(
+                        '<profile thread="1.0.0.0">',
+                        '<definitions thread="*">\n'
+                        '<event id="3"><name>bar</name><group>TAU_USER</group></event>\n'
+                        '</definitions>\n'
+                        '<profile thread="1.0.0.0">').replace(
+                            '0 1 1 200 300 20 30\n', '0 1 1 200 300 20 30\n3 1 0 5 5 1 1\n')
+        self.assertEqual(content.count('<definitions'), 3)
+        data = load_merged_profile(self._write('definitions.xml', content))
+        self.assertEqual(data.metrics, ['TIME', 'PAPI_TOT_CYC'])
+        self.assertEqual(data.functions.names, ['main', 'foo', 'bar'])
+        self.assertEqual(list(data.threads[0].inclusive['PAPI_TOT_CYC']), [400, 300])
+        self.assertEqual(list(data.threads[1].exclusive['TIME']), [20, 1])
+
+    def test_aggregate(self):
+        path = self._write('tauprofile.xml', MERGED_PROFILE)
+        agg, names = aggregate_merged_profile(path, use_numpy=False)
+        self.assertEqual(agg.metric, 'TIME')
+        self.assertEqual(agg.num_threads, 2)
+        main, foo = agg.summarize(names)
+        self.assertEqual((main.name, main.total, main.minimum, main.maximum), ('main', 30, 10, 20))
+        self.assertEqual((foo.name, foo.threads, foo.total, foo.minimum), ('foo', 1, 30, 0))
+        agg, names = aggregate_merged_profile(path, 'PAPI_TOT_CYC', use_numpy=False, inclusive=True)
+        self.assertEqual(agg.statistic('total'), [700, 300])
+
+    def test_invalid(self):
+        path = self._write('invalid.xml', MERGED_PROFILE[:MERGED_PROFILE.index('</interval_data>')])
+        self.assertRaises(ProfileFormatError, load_merged_profile, path)
+        path = self._write('empty.xml', '<profile_xml></profile_xml>')
+        self.assertRaises(ProfileFormatError, aggregate_merged_profile, path)
+        path = self._write('bad_event.xml', MERGED_PROFILE.replace('1 1 0 30 30 300 300', '7 1 0 30 30 300 300'))
+        self.assertRaises(ProfileFormatError, load_merged_profile, path)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Test functions.
+
+Functions used for unit tests of ppk.py.
+"""
+
+import os
+import gzip
+import struct
+from taucmdr import tests
+from taucmdr.cf.profile import ProfileFormatError
+from taucmdr.cf.profile.ppk import java_utf, write_ppk
+from taucmdr.cf.profile.tests.test_tau_profile import write_profile
+
+
+class _Reader(object):
+    """Reads the values of a PPK data stream in order."""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def unpack(self, fmt):
+        values = struct.unpack_from('>' + fmt, self.data, self.pos)
+        self.pos += struct.calcsize('>' + fmt)
+        return values
+
+    def int(self):
+        return self.unpack('i')[0]
+
+    def utf(self):
+        size = self.unpack('H')[0]
+        self.pos += size
+        return self.data[self.pos - size:self.pos].decode('utf-8')
+
+    def names(self):
+        return [self.utf() for _ in xrange(self.int())]
+
+    def attributes(self):
+        return [(self.utf(), self.utf()) for _ in xrange(self.int())]
+
+
+class PpkTest(tests.TestCase):
+    """Unit tests for the native PPK writer."""
+
+    def test_java_utf(self):
+        self.assertEqual(java_utf('main'), '\x00\x04main')
+        self.assertEqual(java_utf('a\0b'), '\x00\x04a\xc0\x80b')
+        self.assertEqual(java_utf(u'\xe9'), '\x00\x02\xc3\xa9')
+        self.assertEqual(java_utf(u'\U0001f600'), '\x00\x06\xed\xa0\xbd\xed\xb8\x80')
+        self.assertRaises(ProfileFormatError, java_utf, u'\xe9' * 0x8000)
+
+    def test_write_ppk(self):
+        path = os.path.join(tests.get_test_workdir(), 'ppk')
+        for rank in 0, 1:
+            metadata = [('Node Name', 'n%03d' % rank), ('OS Name', 'Linux')]
+            events = [('Message size', 4, 8, 4, 6, 160)] if rank else None
+            write_profile(os.path.join(path, 'MULTI__TIME', 'profile.%d.0.0' % rank), 'TIME',
+                          [('main', 1, 1, 10 + rank, 30)], metadata, events)
+            write_profile(os.path.join(path, 'MULTI__PAPI_TOT_CYC', 'profile.%d.0.0' % rank), 'PAPI_TOT_CYC',
+                          [('main', 1, 1, 100, 300), ('foo', 2, 0, 200, 200)], metadata, events)
+        dest = os.path.join(tests.get_test_workdir(), 'test.ppk')
+        write_ppk(dest, path)
+        with gzip.open(dest, 'rb') as fin:
+            ppk = _Reader(fin.read())
+        self.assertEqual(ppk.unpack('HHHii'), (ord('P'), ord('P'), ord('K'), 2, 1))
+        header_end = ppk.int() + ppk.pos
+        self.assertEqual(ppk.int(), 0)
+        self.assertEqual(ppk.attributes(), [('OS Name', 'Linux')])
+        self.assertEqual(ppk.int(), 2)
+        for rank in 0, 1:
+            self.assertEqual(ppk.unpack('iii'), (rank, 0, 0))
+            self.assertEqual(ppk.attributes(), [('Node Name', 'n%03d' % rank), ('OS Name', 'Linux')])
+        self.assertEqual(ppk.pos, header_end)
+        self.assertEqual(ppk.names(), ['PAPI_TOT_CYC', 'TIME'])
+        self.assertEqual(ppk.names(), ['TAU_DEFAULT'])
+        functions = []
+        for _ in xrange(ppk.int()):
+            functions.append(ppk.utf())
+            self.assertEqual([ppk.int() for _ in xrange(ppk.int())], [0])
+        self.assertEqual(functions, ['main', 'foo'])
+        self.assertEqual(ppk.names(), ['Message size'])
+        self.assertEqual(ppk.int(), 2)
+        for rank in 0, 1:
+            self.assertEqual(ppk.unpack('iii'), (rank, 0, 0))
+            self.assertEqual(ppk.int(), 2)
+            self.assertEqual(ppk.unpack('idddddd'), (0, 1, 1, 100, 300, 10 + rank, 30))
+            self.assertEqual(ppk.unpack('idddddd'), (1, 2, 0, 200, 200, 0, 0))
+            if rank:
+                self.assertEqual(ppk.int(), 1)
+                self.assertEqual(ppk.unpack('iidddd'), (0, 4, 8, 4, 6, 160))
+            else:
+                self.assertEqual(ppk.int(), 0)
+        self.assertEqual(ppk.pos, len(ppk.data))
+
+    def test_no_profiles(self):
+        self.assertRaises(ProfileFormatError, write_ppk, os.path.join(tests.get_test_workdir(), 'test.ppk'),
+                          tests.get_test_workdir())
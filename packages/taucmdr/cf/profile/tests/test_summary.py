@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Test functions.
+
+Functions used for unit tests of summary.py.
+"""
+
+import os
+from taucmdr import tests
+from taucmdr.error import ConfigurationError
+from taucmdr.cf.profile.tau_profile import ProfileData
+from taucmdr.cf.profile.summary import Aggregate, summarize, numpy
+from taucmdr.cf.profile.tests.test_tau_profile import write_profile
+
+
+class SummaryTest(tests.TestCase):
+    """Unit tests for cross-thread profile aggregation."""
+
+    def _profile_data(self):
+        path = os.path.join(tests.get_test_workdir(), 'summary')
+        if not os.path.isdir(path):
+            write_profile(os.path.join(path, 'profile.0.0.0'), None, [('main', 1, 1, 10, 40), ('foo', 1, 0, 30, 30)])
+            write_profile(os.path.join(path, 'profile.1.0.0'), None, [('main', 1, 1, 20, 30), ('foo', 1, 0, 10, 10)])
+            write_profile(os.path.join(path, 'profile.2.0.0'), None, [('main', 1, 0, 30, 30)])
+        return ProfileData.load(path)
+
+    def _check_summary(self, use_numpy):
+        main, foo = summarize(self._profile_data(), use_numpy=use_numpy)
+        self.assertEqual(main.name, 'main')
+        self.assertEqual((main.threads, main.total, main.mean, main.minimum, main.maximum), (3, 60, 20, 10, 30))
+        self.assertAlmostEqual(main.stddev, (200.0 / 3) ** 0.5)
+        self.assertAlmostEqual(main.imbalance, 0.5)
+        self.assertEqual(foo.name, 'foo')
+        self.assertEqual((foo.threads, foo.total, foo.minimum, foo.maximum), (2, 40, 0, 30))
+        self.assertAlmostEqual(foo.mean, 40.0 / 3)
+
+    def test_array(self):
+        self._check_summary(False)
+
+    @tests.skipIf(numpy is None, "NumPy is not installed")
+    def test_numpy(self):
+        self._check_summary(True)
+
+    def test_bad_metric(self):
+        self.assertRaises(ConfigurationError, summarize, self._profile_data(), 'PAPI_TOT_CYC')
+
+    def test_abstract(self):
+        self.assertRaises(TypeError, Aggregate, 'TIME')
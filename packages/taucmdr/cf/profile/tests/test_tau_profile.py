@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Test functions.
+
+Functions used for unit tests of tau_profile.py.
+"""
+
+import os
+from taucmdr import tests
+from taucmdr.cf.compression import compress_file
+from taucmdr.cf.profile import ProfileFormatError
+from taucmdr.cf.profile.tau_profile import ProfileData, ProfileReader, find_profile_files, parse_function_line
+
+
+def write_profile(path, metric, functions, metadata=None, user_events=None):
+    """Write a TAU text profile for testing.
+    
+    Args:
+        path (str): Path to the new profile file.
+        metric (str): Metric name for the header, or None for a single-metric header.
+        functions (list): (name, calls, subrs, excl, incl) tuples.
+        metadata (list): (name, value) tuples.
+        user_events (list): (name, numevents, max, min, mean, sumsqr) tuples.
+    """
+    dirname = os.path.dirname(path)
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    with open(path, 'w') as fout:
+        header = 'templated_functions_MULTI_%s' % metric if metric else 'templated_functions'
+        fout.write('%d %s\n' % (len(functions), header))
+        attributes = ''.join('<attribute><name>%s</name><value>%s</value></attribute>' % attr 
+                             for attr in metadata or [])
+        fout.write('# Name Calls Subrs Excl Incl ProfileCalls # <metadata>%s</metadata>\n' % attributes)
+        for name, calls, subrs, excl, incl in functions:
+            fout.write('"%s" %d %d %.16G %.16G 0 GROUP="TAU_DEFAULT"\n' % (name, calls, subrs, excl, incl))
+        fout.write('0 aggregates\n')
+        if user_events:
+            fout.write('%d userevents\n# eventname numevents max min mean sumsqr\n' % len(user_events))
+            for event in user_events:
+                fout.write('"%s" %d %.16G %.16G %.16G %.16G\n' % event)
+
+
+class TauProfileTest(tests.TestCase):
+    """Unit tests for the TAU text profile reader."""
+
+    def test_parse_function_line(self):
+        line = '"int main(int, char **) C [{a.c} {1,1}-{9,1}]" 1 2 1.5E+06 3E+06 0 GROUP="TAU_USER"\n'
+        rec = parse_function_line(line)
+        self.assertEqual(rec.name, 'int main(int, char **) C [{a.c} {1,1}-{9,1}]')
+        self.assertEqual((rec.calls, rec.subroutines, rec.exclusive, rec.inclusive), (1, 2, 1.5e6, 3e6))
+        self.assertEqual(rec.group, 'TAU_USER')
+        self.assertRaises(ValueError, parse_function_line, '0 aggregates')
+
+    def test_single_metric(self):
+        path = os.path.join(tests.get_test_workdir(), 'single_metric')
+        write_profile(os.path.join(path, 'profile.0.0.0'), None, [('main', 1, 1, 10, 30), ('foo', 4, 0, 20, 20)])
+        write_profile(os.path.join(path, 'profile.1.0.0'), None, [('main', 1, 0, 25, 25)])
+        with ProfileReader(os.path.join(path, 'profile.0.0.0')) as reader:
+            self.assertEqual(reader.metric, 'TIME')
+            self.assertEqual(reader.num_functions, 2)
+        data = ProfileData.load(path)
+        self.assertEqual(data.metrics, ['TIME'])
+        self.assertEqual(data.functions.names, ['main', 'foo'])
+        self.assertEqual([(prof.node, prof.context, prof.thread) for prof in data.threads], [(0, 0, 0), (1, 0, 0)])
+        self.assertEqual(list(data.threads[0].exclusive['TIME']), [10, 20])
+        self.assertEqual(list(data.threads[0].calls), [1, 4])
+        self.assertEqual(list(data.threads[1].inclusive['TIME']), [25])
+
+    def test_metadata_user_events(self):
+        path = os.path.join(tests.get_test_workdir(), 'user_events', 'profile.0.0.0')
+        write_profile(path, None, [('main', 1, 0, 10, 10)], 
+                      metadata=[('Node Name', 'n001'), ('pid', '42')], 
+                      user_events=[('Message size', 4, 8, 4, 6, 160)])
+        with ProfileReader(path) as reader:
+            self.assertEqual(reader.metadata(), [('Node Name', 'n001'), ('pid', '42')])
+            events = list(reader.user_events())
+        self.assertEqual(len(events), 1)
+        self.assertEqual(tuple(events[0]), ('Message size', 4, 8, 4, 6, 160))
+        path = os.path.join(tests.get_test_workdir(), 'user_events', 'profile.1.0.0')
+        write_profile(path, None, [('main', 1, 0, 10, 10)])
+        with ProfileReader(path) as reader:
+            self.assertEqual(reader.metadata(), [])
+            self.assertEqual(list(reader.user_events()), [])
+
+    def test_multi_metric(self):
+        path = os.path.join(tests.get_test_workdir(), 'multi_metric')
+        write_profile(os.path.join(path, 'MULTI__TIME', 'profile.0.0.0'), 'TIME', 
+                      [('main', 1, 1, 10, 30), ('foo', 4, 0, 20, 20)])
+        write_profile(os.path.join(path, 'MULTI__PAPI_TOT_CYC', 'profile.0.0.0'), 'PAPI_TOT_CYC', 
+                      [('foo', 4, 0, 200, 200), ('bar', 2, 0, 5, 5), ('main', 1, 1, 100, 305)])
+        self.assertEqual(len(find_profile_files(path)), 2)
+        data = ProfileData.load(path)
+        self.assertEqual(sorted(data.metrics), ['PAPI_TOT_CYC', 'TIME'])
+        prof = data.threads[0]
+        names = [data.functions[fid] for fid in prof.functions]
+        self.assertEqual(sorted(names), ['bar', 'foo', 'main'])
+        pos = names.index('main')
+        self.assertEqual(prof.exclusive['TIME'][pos], 10)
+        self.assertEqual(prof.exclusive['PAPI_TOT_CYC'][pos], 100)
+        pos = names.index('bar')
+        self.assertEqual(prof.exclusive['TIME'][pos], 0)
+        self.assertEqual(prof.inclusive['PAPI_TOT_CYC'][pos], 5)
+
+    def test_compressed(self):
+        path = os.path.join(tests.get_test_workdir(), 'compressed')
+        for i in xrange(3):
+            write_profile(os.path.join(path, 'profile.%d.0.0' % i), None, [('main', 1, 0, 10 + i, 10 + i)])
+        compress_file(os.path.join(path, 'profile.0.0.0'), 'gzip')
+        compress_file(os.path.join(path, 'profile.1.0.0'), 'bz2')
+        # Both copies exist while a profile is being compressed
+        write_profile(os.path.join(path, 'profile.2.0.0.gz'), None, [])
+        files = find_profile_files(path)
+        self.assertEqual([os.path.basename(fpath) for _, _, _, _, fpath in files], 
+                         ['profile.0.0.0.gz', 'profile.1.0.0.bz2', 'profile.2.0.0'])
+        data = ProfileData.load(path)
+        self.assertEqual([list(prof.exclusive['TIME']) for prof in data.threads], [[10], [11], [12]])
+
+    def test_invalid(self):
+        path = os.path.join(tests.get_test_workdir(), 'invalid_profile')
+        os.makedirs(path)
+        with open(os.path.join(path, 'profile.0.0.0'), 'w') as fout:
+            fout.write('not a profile\n')
+        self.assertRaises(ProfileFormatError, ProfileData.load, path)
+        self.assertRaises(ProfileFormatError, ProfileData.load, tests.get_test_workdir())
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Filter expressions for selecting records by their fields.
+
+A filter expression compares a record's fields to values, e.g.::
+
+    return_code != 0 and begin_time > 2026-01-01 and command ~ 'lulesh'
+
+Each comparison is ``<field> <operator> <value>`` where the operator is one of:
+
+    * ``=`` or ``==``, ``!=``: the field is, or is not, equal to the value.
+    * ``<``, ``<=``, ``>``, ``>=``: the field is less than or greater than the value.
+    * ``~``, ``!~``: the field does, or does not, contain a match for a regular expression.
+    
+Comparisons are combined with ``and``, ``or``, ``not``, and parentheses.  Values containing spaces,
+parentheses, or operator characters must be quoted with single or double quotes.  Values are converted 
+to the type of the field they are compared to: integers may be given as sizes with units, e.g. 
+``data_size > 1G``, and dates and times are given as ``YYYY-MM-DD [HH:MM[:SS]]`` in UTC.
+A comparison with a field that a record does not have is false.
+"""
+
+import re
+import operator
+from datetime import datetime
+from taucmdr import util
+from taucmdr.error import ConfigurationError
+
+
+_TOKEN_RE = re.compile(r"""\s*(?:(?P<paren>[()])|
+                                 (?P<operator>==|!=|<=|>=|!~|[=<>~])|
+                                 (?P<quoted>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")|
+                                 (?P<word>[^\s()'"=<>!~]+))""", re.VERBOSE)
+
+_KEYWORDS = ('and', 'or', 'not')
+
+_COMPARABLE_TYPES = ('integer', 'float', 'boolean', 'datetime', 'string')
+
+_DATETIME_FORMATS = ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+_OPERATORS = {'=': operator.eq, 
+              '==': operator.eq, 
+              '!=': operator.ne, 
+              '<': operator.lt, 
+              '<=': operator.le, 
+              '>': operator.gt, 
+              '>=': operator.ge,
+              '~': lambda lhs, regex: regex.search(_text(lhs)) is not None,
+              '!~': lambda lhs, regex: regex.search(_text(lhs)) is None}
+
+
+def _text(value):
+    return value if isinstance(value, basestring) else str(value)
+
+
+def _parse_datetime(value):
+    """Convert a date and time to the same string format as ``str(datetime)`` so they compare as strings."""
+    value = value.replace('T', ' ', 1)
+    for fmt in _DATETIME_FORMATS:
+        try:
+            return str(datetime.strptime(value, fmt))
+        except ValueError:
+            pass
+    raise ValueError("expected a date and time like 'YYYY-MM-DD HH:MM:SS'")
+
+
+def _comparable(props):
+    """Check that an attribute's values can be compared to values in a filter expression."""
+    if props.get('internal', False) or 'model' in props or 'collection' in props:
+        return False
+    return props.get('type', 'string') in _COMPARABLE_TYPES
+
+
+def _convert(props, value):
+    """Convert a value to an attribute's type."""
+    kind = props.get('type', 'string')
+    if kind == 'integer':
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                return util.parse_size(value)
+            except ValueError:
+                raise ValueError("expected an integer or a size like '10G'")
+    elif kind == 'float':
+        return float(value)
+    elif kind == 'boolean':
+        try:
+            return util.parse_bool(value)
+        except TypeError:
+            raise ValueError("expected 'true' or 'false'")
+    elif kind == 'datetime':
+        return _parse_datetime(value)
+    return value
+
+
+class Query(object):
+    """A compiled filter expression.
+    
+    Queries are callable: ``query(record)`` is True if the record's fields match the expression.
+    Any mapping of field names to values may be matched, e.g. data records or storage elements.
+    
+    Attributes:
+        expression (str): The filter expression.
+        fields (frozenset): Names of the fields the expression compares.
+    """
+    
+    def __init__(self, expression, tree):
+        self.expression = expression
+        self._tree = tree
+        self.fields = frozenset(self._fields(tree))
+        
+    def __str__(self):
+        return self.expression
+    
+    def __call__(self, record):
+        return self._evaluate(self._tree, record)
+
+    @classmethod
+    def _fields(cls, node):
+        if node[0] == 'compare':
+            yield node[1]
+        elif node[0] == 'not':
+            for field in cls._fields(node[1]):
+                yield field
+        else:
+            for child in node[1]:
+                for field in cls._fields(child):
+                    yield field
+
+    @classmethod
+    def _evaluate(cls, node, record):
+        kind = node[0]
+        if kind == 'compare':
+            _, field, oper, value = node
+            lhs = record.get(field)
+            return lhs is not None and _OPERATORS[oper](lhs, value)
+        elif kind == 'not':
+            return not cls._evaluate(node[1], record)
+        elif kind == 'and':
+            return all(cls._evaluate(child, record) for child in node[1])
+        return any(cls._evaluate(child, record) for child in node[1])
+
+    def bounds(self, field):
+        """Get the range of values a field must have for a record to match.
+        
+        Only comparisons that every matching record satisfies narrow the range, i.e. comparisons
+        that are not beneath an ``or`` or ``not``.  Use the range to select candidate records from 
+        an index ordered by `field`, then match the candidates against the query.
+        
+        Args:
+            field (str): Name of the field.
+            
+        Returns:
+            tuple: (low, high) bounds, each either None if the range is unbounded or a 
+                   (value, inclusive) pair.
+        """
+        low = high = None
+        nodes = [self._tree]
+        while nodes:
+            node = nodes.pop()
+            if node[0] == 'and':
+                nodes.extend(node[1])
+            elif node[0] == 'compare' and node[1] == field:
+                _, _, oper, value = node
+                if oper in ('=', '==', '>', '>='):
+                    bound = (value, oper != '>')
+                    if low is None or bound[0] > low[0] or (bound[0] == low[0] and not bound[1]):
+                        low = bound
+                if oper in ('=', '==', '<', '<='):
+                    bound = (value, oper != '<')
+                    if high is None or bound[0] < high[0] or (bound[0] == high[0] and not bound[1]):
+                        high = bound
+        return low, high
+
+
+class _Parser(object):
+    """Recursive descent parser for filter expressions."""
+
+    def __init__(self, expression, attributes):
+        self.expression = expression
+        self.attributes = attributes
+        self.tokens = self._tokenize(expression)
+        self.pos = 0
+
+    def _tokenize(self, expression):
+        tokens = []
+        pos = 0
+        end = len(expression.rstrip())
+        while pos < end:
+            match = _TOKEN_RE.match(expression, pos)
+            if not match:
+                raise ValueError("unexpected '%s'" % expression[pos:].strip())
+            kind = match.lastgroup
+            text = match.group(kind)
+            if kind == 'quoted':
+                text = re.sub(r'\\(.)', r'\1', text[1:-1])
+            elif kind == 'word' and text.lower() in _KEYWORDS:
+                kind, text = 'keyword', text.lower()
+            tokens.append((kind, text))
+            pos = match.end()
+        return tokens
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _next(self, expected):
+        kind, text = self._peek()
+        if kind is None:
+            raise ValueError("expected %s at end of expression" % expected)
+        self.pos += 1
+        return kind, text
+
+    def parse(self):
+        tree = self._disjunction()
+        kind, text = self._peek()
+        if kind is not None:
+            raise ValueError("unexpected '%s'" % text)
+        return tree
+
+    def _disjunction(self):
+        children = [self._conjunction()]
+        while self._peek() == ('keyword', 'or'):
+            self.pos += 1
+            children.append(self._conjunction())
+        return children[0] if len(children) == 1 else ('or', children)
+
+    def _conjunction(self):
+        children = [self._negation()]
+        while self._peek() == ('keyword', 'and'):
+            self.pos += 1
+            children.append(self._negation())
+        return children[0] if len(children) == 1 else ('and', children)
+
+    def _negation(self):
+        if self._peek() == ('keyword', 'not'):
+            self.pos += 1
+            return ('not', self._negation())
+        if self._peek() == ('paren', '('):
+            self.pos += 1
+            tree = self._disjunction()
+            if self._next("')'") != ('paren', ')'):
+                raise ValueError("expected ')'")
+            return tree
+        return self._comparison()
+
+    def _comparison(self):
+        kind, field = self._next("a field name")
+        if kind != 'word':
+            raise ValueError("expected a field name instead of '%s'" % field)
+        props = self.attributes.get(field)
+        if props is None or not _comparable(props):
+            raise ValueError("unknown field '%s'" % field)
+        kind, oper = self._next("an operator")
+        if kind != 'operator':
+            raise ValueError("expected an operator after '%s' instead of '%s'" % (field, oper))
+        kind, value = self._next("a value")
+        if kind not in ('word', 'quoted'):
+            raise ValueError("expected a value after '%s %s' instead of '%s'" % (field, oper, value))
+        if oper in ('~', '!~'):
+            try:
+                value = re.compile(value)
+            except re.error as err:
+                raise ValueError("invalid regular expression '%s': %s" % (value, err))
+        else:
+            try:
+                value = _convert(props, value)
+            except ValueError as err:
+                raise ValueError("invalid value '%s' for field '%s': %s" % (value, field, err))
+        return ('compare', field, oper, value)
+
+
+def parse_query(expression, attributes):
+    """Compile a filter expression.
+    
+    Args:
+        expression (str): The filter expression, see :any:`taucmdr.cf.query`.
+        attributes (dict): Model attributes naming the fields that may be compared and their types.
+        
+    Returns:
+        Query: The compiled expression.
+        
+    Raises:
+        ConfigurationError: Invalid filter expression.
+    """
+    try:
+        return Query(expression, _Parser(expression, attributes).parse())
+    except ValueError as err:
+        fields = sorted(attr for attr, props in attributes.iteritems() if _comparable(props))
+        raise ConfigurationError("Invalid filter expression '%s': %s" % (expression, err),
+                                 "Comparisons are like `return_code != 0` or `command ~ 'lulesh'` and are "
+                                 "combined with 'and', 'or', 'not', and parentheses.",
+                                 "Fields are: %s" % ', '.join(fields))
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Retention of trial data.
+
+A retention policy bounds the trial data kept by an experiment.  When the policy is exceeded the
+data of the least recently used trials is evicted: the data files are deleted but the trial records
+are kept and marked as evicted.  Trials older than the policy's maximum age are evicted regardless 
+of when they were last used.
+
+A policy is given as a comma-separated list of limits, e.g. ``size=10G,count=100,age=30d``:
+
+    * ``size=<size>``: maximum total size of the experiment's trial data, see :any:`util.parse_size`.
+    * ``count=<count>``: maximum number of trials that keep their data.
+    * ``age=<age>``: maximum age of trial data, a number with an optional unit suffix (s, m, h, d, or w).
+      The default unit is days.
+"""
+
+import re
+from collections import namedtuple
+from taucmdr import logger, util
+from taucmdr.error import ConfigurationError
+
+
+LOGGER = logger.get_logger(__name__)
+
+RetentionPolicy = namedtuple('RetentionPolicy', ['max_size', 'max_count', 'max_age'])
+"""Limits on an experiment's trial data.  Limits that are not set are None.  `max_age` is in seconds."""
+
+_AGE_RE = re.compile(r'^\s*(\d+(?:\.\d*)?)\s*([smhdw]?)\s*$', re.IGNORECASE)
+
+_AGE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_age(value):
+    """Parse an age, e.g. '30d' or '12h'.
+    
+    Args:
+        value (str): A number with an optional unit suffix: s, m, h, d (the default), or w.
+        
+    Returns:
+        float: The age in seconds.
+        
+    Raises:
+        ValueError: `value` is not a valid age.
+    """
+    match = _AGE_RE.match(value)
+    if not match:
+        raise ValueError("Invalid age '%s'" % value)
+    number, unit = match.groups()
+    return float(number) * _AGE_UNITS[unit.lower() or 'd']
+
+
+def parse_policy(value):
+    """Parse a retention policy string.
+    
+    Args:
+        value (str): Comma-separated ``size=<size>``, ``count=<count>``, and ``age=<age>`` limits, 
+                     or 'none' or None to keep all trial data.
+        
+    Returns:
+        RetentionPolicy: The policy, or None if all trial data is kept.
+        
+    Raises:
+        ConfigurationError: Invalid policy.
+    """
+    if not value or value.lower() == 'none':
+        return None
+    limits = {}
+    for part in value.split(','):
+        key, _, limit = part.partition('=')
+        key, limit = key.strip().lower(), limit.strip()
+        try:
+            if key == 'size':
+                limits['max_size'] = util.parse_size(limit)
+            elif key == 'count':
+                limits['max_count'] = int(limit)
+                if limits['max_count'] < 0:
+                    raise ValueError
+            elif key == 'age':
+                limits['max_age'] = parse_age(limit)
+            else:
+                raise ConfigurationError("Invalid retention limit '%s'" % part.strip(),
+                                         "Valid limits are size=<size>, count=<count>, and age=<age>.")
+        except ValueError:
+            raise ConfigurationError("Invalid retention limit '%s'" % part.strip(),
+                                     "Sizes are like '10G', counts are integers, and ages are like '30d'.")
+    return RetentionPolicy(limits.get('max_size'), limits.get('max_count'), limits.get('max_age'))
+
+
+def select_evictions(candidates, policy, now, keep=()):
+    """Choose the trial data to evict so that an experiment satisfies a retention policy.
+    
+    Data older than the policy's maximum age is evicted first, then the least recently used data 
+    is evicted until the count and size limits are met.  Data in `keep`, e.g. the data of trials 
+    that are still running, counts towards the size and count limits but is never evicted.
+    
+    Args:
+        candidates (list): (key, last_used, created, size) tuples, one for each trial with data.  
+                           Times are in seconds since the epoch and `size` is in bytes.
+        policy (RetentionPolicy): The policy to satisfy.
+        now (float): The current time in seconds since the epoch.
+        keep (set): Keys of candidates that must not be evicted.
+        
+    Returns:
+        list: Keys of the candidates to evict, least recently used first.
+    """
+    evict = []
+    remaining = []
+    for key, last_used, created, size in sorted(candidates, key=lambda candidate: candidate[1]):
+        if policy.max_age is not None and now - created > policy.max_age and key not in keep:
+            evict.append(key)
+        else:
+            remaining.append((key, size))
+    count = len(remaining)
+    total = sum(size for _, size in remaining)
+    for key, size in remaining:
+        over_count = policy.max_count is not None and count > policy.max_count
+        over_size = policy.max_size is not None and total > policy.max_size
+        if not (over_count or over_size):
+            break
+        if key not in keep:
+            evict.append(key)
+            count -= 1
+            total -= size
+    return evict
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Binary package cache.
+
+Building a software package like TAU or Score-P can take an hour, but an :any:`Installation`'s UID
+identifies everything that affects the build: sources, target, compilers, and dependencies.  A 
+:any:`BinaryCache` keeps a tarball of each successfully built installation named by the package name 
+and UID so an identical installation in another account or on another machine is unpacked in seconds 
+instead of built.  Set the __TAUCMDR_BINARY_CACHE__ environment variable to the path of a cache 
+directory or to the URL of an HTTP server that answers GET and PUT requests, e.g. a WebDAV share.
+
+Installed files may contain the absolute paths of the installation and its dependencies, so each 
+tarball records the storage prefix it was built in.  When a tarball is unpacked in a different storage 
+prefix that prefix is replaced in text files and symbolic links.  Binary files are patched in place by 
+padding the new prefix with leading path separators, which only works if the new prefix is no longer
+than the old one.
+
+A SHA-256 checksum is stored next to each tarball and checked before the tarball is unpacked.  Members 
+with unsafe paths and links that lead outside the installation are rejected.
+"""
+
+import os
+import stat
+import hashlib
+import posixpath
+import shutil
+import tarfile
+import tempfile
+import urllib2
+from taucmdr import logger, util
+
+
+LOGGER = logger.get_logger(__name__)
+
+PREFIX_HEADER = 'TAUCMDR.prefix'
+"""str: Name of the tarball header that records the storage prefix the installation was built in."""
+
+TIMEOUT = 60
+"""int: Maximum time in seconds to wait for the cache server."""
+
+CHECKSUM_SUFFIX = '.sha256'
+"""str: Suffix of the file next to each tarball that holds the tarball's SHA-256 checksum."""
+
+
+def binary_cache():
+    """Get the binary package cache.
+    
+    Returns:
+        BinaryCache: The cache at the path or URL in the __TAUCMDR_BINARY_CACHE__ environment variable, 
+                     or None if that variable is not set.
+    """
+    location = os.environ.get('__TAUCMDR_BINARY_CACHE__')
+    return BinaryCache(location) if location else None
+
+
+def _storage_prefix(install_prefix):
+    # Installations are at <storage prefix>/<package name>/<installation tag>
+    return os.path.dirname(os.path.dirname(os.path.abspath(install_prefix)))
+
+
+def _sha256(path, block_size=1 << 20):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as fin:
+        for block in iter(lambda: fin.read(block_size), ''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _resolve(path, links, seen=()):
+    """Resolve a path through a tarball's symbolic links without touching the filesystem.
+    
+    Args:
+        path (str): Path relative to the unpacked root.
+        links (dict): Root-relative link targets indexed by the link's member name.
+        seen (tuple): Links already being resolved.
+        
+    Returns:
+        str: The resolved path relative to the unpacked root, or None if it leads outside the root.
+    """
+    parts = []
+    for part in path.split('/'):
+        if part in ('', '.'):
+            continue
+        if part == '..':
+            if not parts:
+                return None
+            parts.pop()
+            continue
+        parts.append(part)
+        name = '/'.join(parts)
+        if name in links:
+            if name in seen:
+                return None
+            resolved = _resolve(links[name], links, seen + (name,))
+            if resolved is None:
+                return None
+            parts = resolved.split('/') if resolved else []
+    return '/'.join(parts)
+
+
+def _check_members(members, archive, old_install_prefix):
+    """Check that unpacking a tarball can't create or change files outside the unpacked root.
+    
+    Symbolic links may be relative or point into the installation prefix the tarball was built in, 
+    since those are relocated.
+    
+    Args:
+        members (list): The tarball's :any:`tarfile.TarInfo` members.
+        archive (str): Path to the tarball.
+        old_install_prefix (str): Installation prefix the tarball was built in.
+    
+    Raises:
+        IOError: A member has an unsafe path or link target.
+    """
+    links = {}
+    for member in members:
+        name = posixpath.normpath(member.name)
+        if os.path.isabs(member.name) or '..' in member.name.split('/'):
+            raise IOError("Unsafe path '%s' in '%s'" % (member.name, archive))
+        if member.issym():
+            target = member.linkname
+            if posixpath.isabs(target):
+                if target != old_install_prefix and not target.startswith(old_install_prefix + '/'):
+                    raise IOError("Unsafe link '%s' -> '%s' in '%s'" % (member.name, target, archive))
+                links[name] = target[len(old_install_prefix):].lstrip('/')
+            else:
+                links[name] = posixpath.join(posixpath.dirname(name), target)
+    for member in members:
+        if member.issym():
+            target = links[posixpath.normpath(member.name)]
+        elif member.islnk():
+            target = member.linkname
+        else:
+            continue
+        if posixpath.isabs(target) or _resolve(target, links) is None:
+            raise IOError("Unsafe link '%s' -> '%s' in '%s'" % (member.name, member.linkname, archive))
+
+
+def _relocate_file(path, old_prefix, new_prefix):
+    with open(path, 'rb') as fin:
+        data = fin.read()
+    if old_prefix not in data:
+        return
+    if '\0' in data:
+        # Keep string lengths and offsets in binary files
+        if len(new_prefix) > len(old_prefix):
+            raise IOError("Cannot relocate '%s' from '%s' to the longer prefix '%s'" % 
+                          (path, old_prefix, new_prefix))
+        new_prefix = os.sep * (len(old_prefix) - len(new_prefix)) + new_prefix
+    mode = stat.S_IMODE(os.stat(path).st_mode)
+    os.chmod(path, mode | stat.S_IWUSR)
+    with open(path, 'wb') as fout:
+        fout.write(data.replace(old_prefix, new_prefix))
+    os.chmod(path, mode)
+
+
+class BinaryCache(object):
+    """Tarballs of software package installations indexed by package name and UID.
+    
+    Attributes:
+        location (str): Path to the cache directory or URL of the cache server.
+        remote (bool): True if the cache is on a server.
+    """
+
+    def __init__(self, location):
+        if location.startswith('file://'):
+            location = location[7:]
+        self.location = location.rstrip('/')
+        self.remote = util.is_url(self.location)
+
+    @staticmethod
+    def _archive_name(pkg):
+        return '%s-%s.tgz' % (pkg.name, pkg.uid)
+
+    def _source(self, pkg):
+        if self.remote:
+            return '/'.join((self.location, self._archive_name(pkg)))
+        return os.path.join(self.location, self._archive_name(pkg))
+
+    def _retrieve(self, pkg, staging):
+        """Get the path to the package's tarball, downloading it to `staging` if the cache is remote."""
+        source = self._source(pkg)
+        if not self.remote:
+            return source if os.path.isfile(source) else None
+        try:
+            response = urllib2.urlopen(source, timeout=TIMEOUT)
+        except urllib2.HTTPError as err:
+            if err.code == 404:
+                return None
+            raise
+        archive = os.path.join(staging, self._archive_name(pkg))
+        with open(archive, 'wb') as fout:
+            shutil.copyfileobj(response, fout)
+        response.close()
+        return archive
+
+    def _checksum(self, pkg):
+        """Get the checksum stored with the package's tarball, or None if there isn't one."""
+        source = self._source(pkg) + CHECKSUM_SUFFIX
+        if not self.remote:
+            if not os.path.isfile(source):
+                return None
+            with open(source) as fin:
+                data = fin.read()
+        else:
+            try:
+                response = urllib2.urlopen(source, timeout=TIMEOUT)
+            except urllib2.HTTPError as err:
+                if err.code == 404:
+                    return None
+                raise
+            data = response.read()
+            response.close()
+        # Same format as the sha256sum command
+        return data.split()[0] if data.strip() else None
+
+    def fetch(self, pkg):
+        """Unpack the cached installation of a software package at the package's installation prefix.
+        
+        Args:
+            pkg (Installation): The software package.  The installation prefix must not exist.
+            
+        Returns:
+            bool: True if the installation was unpacked, False if it is not in the cache.
+            
+        Raises:
+            IOError: The cached installation could not be retrieved, verified, unpacked, or relocated.
+        """
+        install_prefix = pkg.install_prefix
+        parent = os.path.dirname(install_prefix)
+        util.mkdirp(parent)
+        # Unpack next to the installation prefix so the unpacked files can be renamed into place
+        staging = tempfile.mkdtemp(prefix='.%s.' % os.path.basename(install_prefix), dir=parent)
+        try:
+            archive = self._retrieve(pkg, staging)
+            if not archive:
+                LOGGER.debug("%s is not in the binary cache '%s'", self._archive_name(pkg), self.location)
+                return False
+            checksum = self._checksum(pkg)
+            if not checksum:
+                raise IOError("No checksum for '%s'" % self._source(pkg))
+            if _sha256(archive) != checksum:
+                raise IOError("Checksum mismatch for '%s'" % self._source(pkg))
+            LOGGER.info("Unpacking cached %s from '%s'", pkg.title, self._source(pkg))
+            root = os.path.join(staging, 'root')
+            new_prefix = _storage_prefix(install_prefix)
+            try:
+                with tarfile.open(archive) as fin:
+                    members = fin.getmembers()
+                    old_prefix = fin.pax_headers.get(PREFIX_HEADER)
+                    old_install_prefix = os.path.join(old_prefix or new_prefix, 
+                                                      os.path.relpath(install_prefix, new_prefix))
+                    _check_members(members, archive, old_install_prefix)
+                    fin.extractall(root, members)
+            except tarfile.TarError as err:
+                raise IOError("Cannot extract '%s': %s" % (archive, err))
+            if old_prefix and old_prefix != new_prefix:
+                old_prefix = str(old_prefix)
+                LOGGER.info("Relocating %s from '%s' to '%s'", pkg.title, old_prefix, new_prefix)
+                for member in members:
+                    path = os.path.join(root, member.name)
+                    if member.issym() and member.linkname.startswith(old_prefix):
+                        os.remove(path)
+                        os.symlink(new_prefix + member.linkname[len(old_prefix):], path)
+                    elif member.isfile():
+                        _relocate_file(path, old_prefix, new_prefix)
+            os.rename(root, install_prefix)
+        finally:
+            util.rmtree(staging, ignore_errors=True)
+        return True
+
+    def store(self, pkg):
+        """Add the installation of a software package to the cache.
+        
+        Replaces the package's tarball if it is already in the cache.  The tarball's checksum is 
+        stored next to it.
+        
+        Args:
+            pkg (Installation): The installed software package.
+            
+        Raises:
+            IOError: The installation could not be packed or sent to the cache.
+        """
+        name = self._archive_name(pkg)
+        if self.remote:
+            staging = util.mkdtemp()
+            archive = os.path.join(staging, name)
+        else:
+            util.mkdirp(self.location)
+            staging = None
+            archive = os.path.join(self.location, '.%s.%d' % (name, os.getpid()))
+        LOGGER.info("Adding %s to the binary cache '%s'", pkg.title, self.location)
+        try:
+            with util.ParallelGzipFile(archive) as fout:
+                tar = tarfile.open(fileobj=fout, mode='w|', format=tarfile.PAX_FORMAT, 
+                                   pax_headers={PREFIX_HEADER: _storage_prefix(pkg.install_prefix)})
+                try:
+                    for item in sorted(os.listdir(pkg.install_prefix)):
+                        tar.add(os.path.join(pkg.install_prefix, item), arcname=item)
+                finally:
+                    tar.close()
+            checksum = '%s  %s\n' % (_sha256(archive), name)
+            if self.remote:
+                with open(archive, 'rb') as fin:
+                    self._put(self._source(pkg), fin, os.path.getsize(archive), 'application/gzip')
+                self._put(self._source(pkg) + CHECKSUM_SUFFIX, checksum, len(checksum), 'text/plain')
+            else:
+                os.rename(archive, self._source(pkg))
+                checksum_file = archive + CHECKSUM_SUFFIX
+                with open(checksum_file, 'w') as fout:
+                    fout.write(checksum)
+                os.rename(checksum_file, self._source(pkg) + CHECKSUM_SUFFIX)
+        finally:
+            if staging:
+                util.rmtree(staging, ignore_errors=True)
+            else:
+                for path in archive, archive + CHECKSUM_SUFFIX:
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    @staticmethod
+    def _put(url, data, size, content_type):
+        request = urllib2.Request(url, data=data, headers={'Content-Length': str(size), 'Content-Type': content_type})
+        request.get_method = lambda: 'PUT'
+        urllib2.urlopen(request, timeout=TIMEOUT).close()
@@ -28,7 +28,13 @@
 """Software installation management."""
 
 import os
+import re
+import sys
+import errno
+import time
+import signal
 import multiprocessing
+from collections import deque
 from subprocess import CalledProcessError
 from contextlib import contextmanager
 from taucmdr import logger, util
@@ -38,6 +44,7 @@ from taucmdr.cf.storage import StorageError
 from taucmdr.cf.storage.levels import ORDERED_LEVELS
 from taucmdr.cf.storage.levels import highest_writable_storage 
 from taucmdr.cf.software import SoftwarePackageError
+from taucmdr.cf.software.binary_cache import binary_cache
 from taucmdr.cf import compiler
 from taucmdr.cf.compiler import InstalledCompilerSet
 from taucmdr.cf.platforms import Architecture, OperatingSystem, HOST_OS, DARWIN
@@ -45,28 +52,108 @@ from taucmdr.cf.platforms import Architecture, OperatingSystem, HOST_OS, DARWIN
 LOGGER = logger.get_logger(__name__)
 
 
-def parallel_make_flags(nprocs=None):
-    """Flags to enable parallel compilation with `make`.
+def max_make_jobs():
+    """Get the maximum number of jobs that all `make` commands may run at the same time.
     
-    Args:
-        ncores (int): Number of parallel processes to use.  
-                      Default is one less than the number of CPU cores.
-                      
     Returns:
-        list: Command line arguments to pass to `make`.
+        int: The value of the __TAUCMDR_MAX_MAKE_JOBS__ environment variable or, if it is not set,
+             one less than the number of CPU cores.
+             
+    Raises:
+        ConfigurationError: Invalid job count.
+    """
+    try:
+        nprocs = os.environ['__TAUCMDR_MAX_MAKE_JOBS__']
+    except KeyError:
+        nprocs = max(1, multiprocessing.cpu_count() - 1)
+    try:
+        nprocs = int(nprocs)
+        if nprocs < 1:
+            raise ValueError
+    except ValueError:
+        raise ConfigurationError("Invalid parallel make job count: %s" % nprocs)
+    return nprocs
+
+
+class MakeJobserver(object):
+    """A GNU make jobserver shared by every `make` command.
+    
+    The jobserver is a pipe holding one token for each job that may run.  A token is taken for 
+    each `make` command's first job before the command starts and `make` takes tokens from the pipe
+    to run more jobs in parallel, so the total number of jobs never exceeds the number of tokens.
+    Processes forked after the jobserver is created share its pipe, e.g. concurrent package installations
+    started by :any:`install_packages`.  See https://www.gnu.org/software/make/manual/html_node/Job-Slots.html.
+    
+    Attributes:
+        jobs (int): Maximum number of jobs that may run at the same time.
     """
-    if not nprocs:
+    
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self._read_fd, self._write_fd = os.pipe()
+        os.write(self._write_fd, '+' * jobs)
+
+    @staticmethod
+    def _auth_option():
+        """GNU make 4.2 renamed ``--jobserver-fds`` to ``--jobserver-auth``."""
         try:
-            nprocs = int(os.environ['__TAUCMDR_MAX_MAKE_JOBS__'])
-        except (KeyError, ValueError):
-            nprocs = max(1, multiprocessing.cpu_count() - 1)
+            stdout = util.get_command_output(['make', '--version'])
+        except (CalledProcessError, OSError) as err:
+            LOGGER.debug("Failed to get make version: %s", err)
+            return 'jobserver-auth'
+        match = re.search(r'GNU Make (\d+)\.(\d+)', stdout)
+        if match and (int(match.group(1)), int(match.group(2))) < (4, 2):
+            return 'jobserver-fds'
+        return 'jobserver-auth'
+
+    @property
+    def makeflags(self):
+        """str: Value of MAKEFLAGS for a `make` command that uses this jobserver."""
+        return ' -j --%s=%d,%d' % (self._auth_option(), self._read_fd, self._write_fd)
+
+    @contextmanager
+    def job(self):
+        """Take a token from the jobserver for one job, waiting until one is available."""
+        while True:
+            try:
+                token = os.read(self._read_fd, 1)
+                break
+            except OSError as err:
+                if err.errno != errno.EINTR:
+                    raise
         try:
-            nprocs = int(nprocs)
-            if nprocs < 1:
-                raise ValueError
-        except ValueError:
-            raise ConfigurationError("Invalid parallel make job count: %s" % nprocs)
-    return ['-j', str(nprocs)]
+            yield
+        finally:
+            os.write(self._write_fd, token)
+
+    def make(self, cmd, cwd=None, parallel=True):
+        """Run a `make` command as a client of this jobserver.
+        
+        Args:
+            cmd (list): The `make` command and its command line arguments, which must not include ``-j``.
+            cwd (str): If not None, change directory to `cwd` before running `make`.
+            parallel (bool): If False, run one job at a time without using the jobserver.
+            
+        Returns:
+            int: The `make` command's return code.
+        """
+        env = {'MAKEFLAGS': self.makeflags if parallel else None}
+        with self.job():
+            return util.create_subprocess(cmd, cwd=cwd, env=env, stdout=False, show_progress=True)
+
+
+def make_jobserver():
+    """Get the jobserver shared by all `make` commands, creating it if it doesn't exist yet.
+    
+    Returns:
+        MakeJobserver: A jobserver with :any:`max_make_jobs` tokens.
+    """
+    try:
+        return make_jobserver.value
+    except AttributeError:
+        make_jobserver.value = MakeJobserver(max_make_jobs())
+        LOGGER.debug("Created make jobserver with %d job slots", make_jobserver.value.jobs)
+        return make_jobserver.value
 
 
 def tmpfs_prefix():
@@ -109,6 +196,214 @@ def tmpfs_prefix():
     return tmp_prefix
     
 
+def install_jobs(jobs=None):
+    """Get the number of software packages to install at the same time.
+    
+    Args:
+        jobs (int): Number of packages.  If None, use the value of the __TAUCMDR_INSTALL_JOBS__ 
+                    environment variable or the number of CPU cores.
+        
+    Returns:
+        int: Number of packages to install at the same time.
+        
+    Raises:
+        ConfigurationError: Invalid package count.
+    """
+    if not jobs:
+        try:
+            jobs = os.environ['__TAUCMDR_INSTALL_JOBS__']
+        except KeyError:
+            jobs = multiprocessing.cpu_count()
+    try:
+        jobs = int(jobs)
+        if jobs < 1:
+            raise ValueError
+    except ValueError:
+        raise ConfigurationError("Invalid package installation job count: %s" % jobs)
+    return jobs
+
+
+def _installation_graph(packages):
+    """Find all packages reachable from `packages` and the packages each of them depends on.
+    
+    Packages are identified by name and UID so a package that several packages depend on, 
+    e.g. binutils for both TAU and Score-P, appears once.
+    
+    Returns:
+        tuple: (nodes, requires) dictionaries indexed by package identifier.  `nodes` maps identifiers
+               to :any:`Installation` objects and `requires` maps identifiers to sets of the identifiers
+               of the packages that must be installed first.
+    """
+    nodes, requires = {}, {}
+    def visit(pkg):
+        key = (pkg.name, pkg.uid)
+        if key not in nodes:
+            nodes[key] = pkg
+            requires[key] = set(visit(dep) for dep in pkg.dependencies.itervalues())
+        return key
+    for pkg in packages:
+        visit(pkg)
+    return nodes, requires
+
+
+def _installed(pkg, force_reinstall):
+    """Check if a package is installed and should not be reinstalled."""
+    if force_reinstall and not pkg.unmanaged:
+        return False
+    try:
+        pkg.verify()
+    except SoftwarePackageError as err:
+        LOGGER.debug(err)
+        return False
+    return True
+
+
+def _log_tail(path, lines=50):
+    """Get the last lines of a log file, or an empty list if it can't be read."""
+    try:
+        with open(path) as fin:
+            return list(deque(fin, maxlen=lines))
+    except IOError:
+        return []
+
+
+class _InstallProcess(object):
+    """Installs a software package in a child process.
+    
+    The child process runs in its own process group with stdout and stderr redirected to a log file 
+    beside the package's installation prefix so the output of concurrent installations is not interleaved.
+    
+    Attributes:
+        pkg (Installation): The package being installed.
+        log (str): Path to the installation log file.
+        start_time (float): Time the installation started, in seconds since the epoch.
+    """
+    
+    def __init__(self, pkg, force_reinstall):
+        self.pkg = pkg
+        self.log = pkg.install_prefix + '.log'
+        self.start_time = time.time()
+        util.mkdirp(os.path.dirname(self.log))
+        # Unpack sources in this process' temporary directory so they are deleted when this process exits
+        tmpfs_prefix()
+        # Share one jobserver among all installations
+        make_jobserver()
+        self._reader, writer = multiprocessing.Pipe(duplex=False)
+        # Don't let the child inherit buffered output
+        sys.stdout.flush()
+        sys.stderr.flush()
+        self._process = multiprocessing.Process(target=self._run, args=(pkg, force_reinstall, self.log, writer))
+        self._process.start()
+        writer.close()
+
+    @staticmethod
+    def _run(pkg, force_reinstall, log, writer):
+        os.setpgrp()
+        with open(log, 'w') as fout:
+            os.dup2(fout.fileno(), sys.__stdout__.fileno())
+            os.dup2(fout.fileno(), sys.__stderr__.fileno())
+        os.environ['__TAUCMDR_PROGRESS_BARS__'] = 'disabled'
+        try:
+            pkg.install_package(force_reinstall)
+        except Exception as err:  # pylint: disable=broad-except
+            LOGGER.debug("%s installation failed", pkg.title, exc_info=True)
+            # Send a message since the exception may not be picklable
+            writer.send(getattr(err, 'value', None) or str(err) or err.__class__.__name__)
+        else:
+            writer.send(None)
+
+    def poll(self):
+        """Check if the installation has finished.
+        
+        Returns:
+            tuple: (finished, error) where `error` is None if the package was installed, 
+                   otherwise a message describing why the installation failed.
+        """
+        if self._process.is_alive():
+            return False, None
+        self._process.join()
+        if self._reader.poll():
+            return True, self._reader.recv()
+        return True, "installation process exited with code %s" % self._process.exitcode
+
+    def stop(self):
+        """Stop the installation and all processes it started."""
+        if self._process.is_alive():
+            try:
+                os.killpg(self._process.pid, signal.SIGTERM)
+            except OSError:
+                self._process.terminate()
+        self._process.join()
+
+
+def install_packages(packages, force_reinstall=False, jobs=None):
+    """Install software packages and the packages they depend on.
+    
+    Each package is installed after the packages it depends on.  Packages that do not depend on
+    each other are installed at the same time in up to `jobs` child processes, each writing its
+    output to a log file beside the package's installation prefix.  If a package fails to install
+    then the installations that are still running are stopped and the error is raised.
+    
+    Args:
+        packages (list): :any:`Installation` objects to install.
+        force_reinstall (bool): If True, reinstall packages even if they pass verification.
+        jobs (int): Maximum number of packages to install at the same time, see :any:`install_jobs`.
+                    If 1, packages are installed one after another in this process.  
+                    Packages that are already installed or are unmanaged are verified in this process.
+                    
+    Raises:
+        SoftwarePackageError: A package failed to install.
+    """
+    nodes, requires = _installation_graph(packages)
+    jobs = install_jobs(jobs)
+    pending = sorted(nodes)
+    done = set()
+    running = {}
+    last_report = time.time()
+    try:
+        while pending or running:
+            for key in [key for key in pending if requires[key] <= done]:
+                if len(running) >= jobs:
+                    break
+                pending.remove(key)
+                pkg = nodes[key]
+                if jobs == 1 or pkg.unmanaged:
+                    # Unmanaged packages are only verified
+                    pkg.install_package(force_reinstall)
+                elif not _installed(pkg, force_reinstall):
+                    running[key] = _InstallProcess(pkg, force_reinstall)
+                    LOGGER.info("Installing %s, see '%s'", pkg.title, running[key].log)
+                    continue
+                done.add(key)
+            if not running:
+                continue
+            time.sleep(0.5)
+            for key, proc in running.items():
+                finished, error = proc.poll()
+                if not finished:
+                    continue
+                del running[key]
+                elapsed = util.human_duration(time.time() - proc.start_time)
+                if error:
+                    LOGGER.info("%s installation failed after %s", proc.pkg.title, elapsed)
+                    tail = _log_tail(proc.log)
+                    if tail:
+                        LOGGER.info("Last lines of '%s':\n%s", proc.log, ''.join(tail))
+                    raise SoftwarePackageError("%s installation failed: %s" % (proc.pkg.title, error),
+                                               "See '%s' for details." % proc.log)
+                LOGGER.info("Installed %s in %s", proc.pkg.title, elapsed)
+                done.add(key)
+            now = time.time()
+            if running and now - last_report > 60:
+                last_report = now
+                LOGGER.info("Still installing %s", ', '.join("%s (%s)" % (proc.pkg.title, 
+                                                                          util.human_duration(now - proc.start_time))
+                                                             for proc in running.itervalues()))
+    finally:
+        for proc in running.itervalues():
+            proc.stop()
+
+
 @contextmanager
 def new_os_environ():
     old_environ = os.environ
@@ -402,7 +697,7 @@ class Installation(object):
         self.dependencies[name] = cls(sources, self.target_arch, self.target_os, self.compilers, *args, **kwargs)
 
     def install(self, force_reinstall=False):
-        """Execute the installation sequence in a sanitized environment.
+        """Install the packages this package depends on and then install this package.
         
         Modifies the system by building and installing software.
         
@@ -412,8 +707,31 @@ class Installation(object):
         Raises:
             SoftwarePackageError: Installation failed.
         """
-        for pkg in self.dependencies.itervalues():
-            pkg.install(force_reinstall)
+        self.install_dependencies(force_reinstall)
+        return self.install_package(force_reinstall)
+
+    def install_dependencies(self, force_reinstall=False):
+        """Install the packages this package depends on, see :any:`install_packages`.
+        
+        Args:
+            force_reinstall (bool): If True, reinstall even if the software packages pass verification.
+            
+        Raises:
+            SoftwarePackageError: Installation failed.
+        """
+        install_packages(self.dependencies.values(), force_reinstall)
+
+    def install_package(self, force_reinstall=False):
+        """Execute this package's installation sequence in a sanitized environment.
+        
+        The packages this package depends on must already be installed.
+        
+        Args:
+            force_reinstall (bool): If True, reinstall even if the software package passes verification.
+            
+        Raises:
+            SoftwarePackageError: Installation failed.
+        """
         if self.unmanaged or not force_reinstall:
             try:
                 return self.verify()
@@ -428,6 +746,8 @@ class Installation(object):
         if os.path.isdir(self.install_prefix):
             LOGGER.info("Cleaning %s installation prefix '%s'", self.title, self.install_prefix)
             util.rmtree(self.install_prefix, ignore_errors=True)
+        if not force_reinstall and self._install_from_cache():
+            return
         with new_os_environ(), util.umask(002):
             try:
                 self._src_prefix = self._prepare_src()
@@ -444,7 +764,38 @@ class Installation(object):
                 self._src_prefix = None
         # Verify the new installation
         LOGGER.info("Verifying %s installation...", self.title)
-        return self.verify()
+        self.verify()
+        self._store_in_cache()
+
+    def _install_from_cache(self):
+        """Unpack this package from the binary cache, see :any:`binary_cache`.
+        
+        Returns:
+            bool: True if a valid installation was unpacked, False if the package must be built.
+        """
+        cache = binary_cache()
+        if not cache or self.unmanaged or os.path.exists(self.install_prefix):
+            return False
+        try:
+            with util.umask(002):
+                if not cache.fetch(self):
+                    return False
+            self.verify()
+        except (IOError, OSError, SoftwarePackageError) as err:
+            LOGGER.warning("Cannot use cached %s, building from source: %s", self.title, err)
+            util.rmtree(self.install_prefix, ignore_errors=True)
+            return False
+        self.set_group()
+        return True
+
+    def _store_in_cache(self):
+        """Add this package's installation to the binary cache, if there is one."""
+        cache = binary_cache()
+        if cache and not self.unmanaged:
+            try:
+                cache.store(self)
+            except (IOError, OSError) as err:
+                LOGGER.warning("Cannot add %s to the binary cache: %s", self.title, err)
 
     def installation_sequence(self):
         raise NotImplementedError
@@ -522,11 +873,11 @@ class MakeInstallation(Installation):
         """
         assert self._src_prefix
         LOGGER.debug("Making %s at '%s'", self.name, self._src_prefix)
-        cmd = ['make'] + parallel_make_flags() + flags
+        cmd = ['make'] + flags
         LOGGER.info("Compiling %s...", self.title)
-        if util.create_subprocess(cmd, cwd=self._src_prefix, stdout=False, show_progress=True):
-            cmd = ['make'] + flags
-            if util.create_subprocess(cmd, cwd=self._src_prefix, stdout=False, show_progress=True):
+        jobserver = make_jobserver()
+        if jobserver.make(cmd, cwd=self._src_prefix):
+            if jobserver.make(cmd, cwd=self._src_prefix, parallel=False):
                 util.add_error_stack(self._src_prefix)
                 raise SoftwarePackageError('%s compilation failed' % self.title)
 
@@ -541,11 +892,11 @@ class MakeInstallation(Installation):
         """
         assert self._src_prefix
         LOGGER.debug("Installing %s to '%s'", self.name, self.install_prefix)
-        cmd = ['make', 'install'] + parallel_make_flags() + flags
+        cmd = ['make', 'install'] + flags
         LOGGER.info("Installing %s...", self.title)
-        if util.create_subprocess(cmd, cwd=self._src_prefix, stdout=False, show_progress=True):
-            cmd = ['make', 'install'] + flags
-            if util.create_subprocess(cmd, cwd=self._src_prefix, stdout=False, show_progress=True):
+        jobserver = make_jobserver()
+        if jobserver.make(cmd, cwd=self._src_prefix):
+            if jobserver.make(cmd, cwd=self._src_prefix, parallel=False):
                 util.add_error_stack(self._src_prefix)
                 raise SoftwarePackageError('%s installation failed' % self.title)
         # Some systems use lib64 instead of lib
@@ -46,13 +46,14 @@ from subprocess import CalledProcessError
 from taucmdr import logger, util
 from taucmdr.error import ConfigurationError, InternalError
 from taucmdr.cf.software import SoftwarePackageError
-from taucmdr.cf.software.installation import Installation, parallel_make_flags, new_os_environ
+from taucmdr.cf.software.installation import Installation, make_jobserver, new_os_environ
 from taucmdr.cf.compiler import host as host_compilers, InstalledCompilerSet
 from taucmdr.cf.compiler.host import CC, CXX, FC, UPC, GNU, APPLE_LLVM, IBM
 from taucmdr.cf.compiler.mpi import MPI_CC, MPI_CXX, MPI_FC
 from taucmdr.cf.compiler.shmem import SHMEM_CC, SHMEM_CXX, SHMEM_FC
 from taucmdr.cf.compiler.cuda import CUDA_CXX, CUDA_FC
 from taucmdr.cf.platforms import TauMagic, DARWIN, CRAY_CNL, HOST_ARCH, HOST_OS
+from taucmdr.cf.trace.tau_trace import merge_traces
 
 
 LOGGER = logger.get_logger(__name__)
@@ -697,9 +698,9 @@ class TauInstallation(Installation):
         Raises:
             SoftwarePackageError: 'make install' failed.
         """
-        cmd = ['make', 'install'] + parallel_make_flags()
+        cmd = ['make', 'install']
         LOGGER.info('Compiling and installing TAU...')
-        if util.create_subprocess(cmd, cwd=self._src_prefix, stdout=False, show_progress=True):
+        if make_jobserver().make(cmd, cwd=self._src_prefix):
             raise SoftwarePackageError('TAU compilation/installation failed')
 
     def install(self, force_reinstall=False):
@@ -737,9 +738,11 @@ class TauInstallation(Installation):
                                        *unmanaged_hints)
         # Check dependencies after verifying TAU instead of before in case 
         # we're using an unmanaged TAU or forced makefile. 
-        for pkg in self.dependencies.itervalues():
-            pkg.install(force_reinstall)
+        self.install_dependencies(force_reinstall)
         LOGGER.info("Installing %s at '%s'", self.title, self.install_prefix)
+        # TAU configurations share an installation prefix so only use the cache if the prefix is new 
+        if not force_reinstall and self._install_from_cache():
+            return
         with new_os_environ(), util.umask(002):
             try:
                 # Keep reconfiguring the same source because that's how TAU works
@@ -761,7 +764,8 @@ class TauInstallation(Installation):
                 raise
         # Verify the new installation
         LOGGER.info("Verifying %s installation...", self.title)
-        return self.verify()
+        self.verify()
+        self._store_in_cache()
     
     def installation_sequence(self):
         self.configure()
@@ -1429,15 +1433,16 @@ class TauInstallation(Installation):
                                      "Make sure Java is installed and working",
                                      "Install the most recent Java from http://java.com")
 
-    def merge_tau_trace_files(self, prefix):
-        """Use tau_treemerge.pl to merge multiple TAU trace files into a single edf and a single trc file.
+    def merge_tau_trace_files(self, prefix, workers=None):
+        """Merge multiple TAU trace files into a single edf and a single trc file.
         
-        The new edf file and trc file are written to ``prefix``.
+        The new edf file and trc file are written to ``prefix``.  Traces are merged natively 
+        by :any:`merge_traces` so ``tau_treemerge.pl`` is not required.
         
         Args: 
             prefix (str): Path to the directory containing *.trc and *.edf files.
+            workers (int): Number of worker processes, or None for the default.
         """
-        self._prep_data_analysis_tools()
         trc_files = glob.glob(os.path.join(prefix, '*.trc'))
         edf_files = glob.glob(os.path.join(prefix, '*.edf'))
         if not trc_files:
@@ -1447,13 +1452,11 @@ class TauInstallation(Installation):
         merged_trc = os.path.join(prefix, 'tau.trc')
         merged_edf = os.path.join(prefix, 'tau.edf')
         if os.path.isfile(merged_trc):
-            raise ConfigurationError("Remove '%s' before merging *.trc files")
+            raise ConfigurationError("Remove '%s' before merging *.trc files" % merged_trc)
         if os.path.isfile(merged_edf):
-            raise ConfigurationError("Remove '%s' before merging *.edf files")
-        cmd = [os.path.join(self.bin_path, 'tau_treemerge.pl')]
+            raise ConfigurationError("Remove '%s' before merging *.edf files" % merged_edf)
         LOGGER.info("Merging %d TAU trace files...", len(trc_files) + len(edf_files))
-        if util.create_subprocess(cmd, cwd=prefix, stdout=False, log=True, show_progress=True):
-            raise InternalError("Nonzero return code from tau_treemerge.pl")
+        merge_traces(prefix, workers)
 
     def tau_trace_to_slog2(self, trc, edf, slog2):
         """Convert a TAU trace file to SLOG2 format.
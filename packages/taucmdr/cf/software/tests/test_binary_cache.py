@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Test functions.
+
+Functions used for unit tests of binary_cache.py.
+"""
+
+import os
+import shutil
+import hashlib
+import tarfile
+import threading
+import BaseHTTPServer
+import SimpleHTTPServer
+from taucmdr import tests, util
+from taucmdr.tests import TestCase
+from taucmdr.cf.software.binary_cache import BinaryCache, PREFIX_HEADER
+
+
+def _workdir(*parts):
+    return os.path.join(tests.get_test_workdir(), 'binary_cache', *parts)
+
+
+class _Package(object):
+    """Stands in for an :any:`Installation` in the storage prefix `storage`."""
+
+    def __init__(self, storage, name='pkg', uid='0123456789'):
+        self.name = name
+        self.title = name.upper()
+        self.uid = uid
+        self.install_prefix = os.path.join(storage, name, uid)
+
+
+class _CacheRequestHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
+    """Serves files in the server's root directory and stores files sent with PUT."""
+
+    def translate_path(self, path):
+        return os.path.join(self.server.root, path.lstrip('/'))
+
+    def do_PUT(self):
+        with open(self.translate_path(self.path), 'wb') as fout:
+            fout.write(self.rfile.read(int(self.headers['Content-Length'])))
+        self.send_response(201)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class BinaryCacheTest(TestCase):
+    """Unit tests for BinaryCache."""
+
+    def setUp(self):
+        self.old_storage = _workdir('old', 'storage', 'prefix')
+        pkg = _Package(self.old_storage)
+        for subdir in 'bin', 'lib':
+            util.mkdirp(os.path.join(pkg.install_prefix, subdir))
+        self.tool = os.path.join(pkg.install_prefix, 'bin', 'tool')
+        with open(self.tool, 'w') as fout:
+            fout.write("#!/bin/sh\nexec %s/dep/1/bin/dep\n" % self.old_storage)
+        os.chmod(self.tool, 0755)
+        with open(os.path.join(pkg.install_prefix, 'lib', 'libpkg.so'), 'wb') as fout:
+            fout.write("\x7fELF\0%s/pkg/0123456789/lib\0" % self.old_storage)
+        os.symlink(self.tool, os.path.join(pkg.install_prefix, 'tool'))
+        os.symlink('libpkg.so', os.path.join(pkg.install_prefix, 'lib', 'libpkg.so.1'))
+        self.pkg = pkg
+
+    def tearDown(self):
+        util.rmtree(_workdir())
+
+    def _check_relocated(self, new_storage):
+        pkg = _Package(new_storage)
+        with open(os.path.join(pkg.install_prefix, 'bin', 'tool')) as fin:
+            self.assertEqual(fin.read(), "#!/bin/sh\nexec %s/dep/1/bin/dep\n" % new_storage)
+        self.assertTrue(os.access(os.path.join(pkg.install_prefix, 'bin', 'tool'), os.X_OK))
+        with open(os.path.join(pkg.install_prefix, 'lib', 'libpkg.so'), 'rb') as fin:
+            data = fin.read()
+        with open(os.path.join(self.pkg.install_prefix, 'lib', 'libpkg.so'), 'rb') as fin:
+            self.assertEqual(len(data), len(fin.read()))
+        self.assertEqual(os.path.normpath(data.split('\0')[1]), os.path.join(pkg.install_prefix, 'lib'))
+        self.assertEqual(os.readlink(os.path.join(pkg.install_prefix, 'tool')),
+                         os.path.join(pkg.install_prefix, 'bin', 'tool'))
+        self.assertEqual(os.readlink(os.path.join(pkg.install_prefix, 'lib', 'libpkg.so.1')), 'libpkg.so')
+
+    def test_local(self):
+        cache = BinaryCache(_workdir('cache'))
+        self.assertFalse(cache.fetch(_Package(_workdir('new'))))
+        self.assertFalse(os.path.exists(_Package(_workdir('new')).install_prefix))
+        cache.store(self.pkg)
+        self.assertEqual(sorted(os.listdir(_workdir('cache'))), ['pkg-0123456789.tgz', 'pkg-0123456789.tgz.sha256'])
+        self.assertTrue(cache.fetch(_Package(_workdir('new'))))
+        self._check_relocated(_workdir('new'))
+        self.assertEqual(os.listdir(_workdir('new', 'pkg')), ['0123456789'])
+        # Unpacking in the original storage prefix doesn't change anything
+        shutil.rmtree(self.pkg.install_prefix)
+        self.assertTrue(BinaryCache('file://' + _workdir('cache')).fetch(self.pkg))
+        self._check_relocated(self.old_storage)
+
+    def test_longer_prefix(self):
+        cache = BinaryCache(_workdir('cache'))
+        cache.store(self.pkg)
+        pkg = _Package(_workdir('a', 'much', 'longer', 'storage', 'prefix'))
+        self.assertRaises(IOError, cache.fetch, pkg)
+        self.assertFalse(os.path.exists(pkg.install_prefix))
+        self.assertEqual(os.listdir(os.path.dirname(pkg.install_prefix)), [])
+        # Text files can be relocated to a longer prefix
+        os.remove(os.path.join(self.pkg.install_prefix, 'lib', 'libpkg.so'))
+        cache.store(self.pkg)
+        self.assertTrue(cache.fetch(pkg))
+        with open(os.path.join(pkg.install_prefix, 'bin', 'tool')) as fin:
+            self.assertIn(_workdir('a', 'much', 'longer', 'storage', 'prefix', 'dep'), fin.read())
+
+    def test_checksum(self):
+        cache = BinaryCache(_workdir('cache'))
+        cache.store(self.pkg)
+        archive = _workdir('cache', 'pkg-0123456789.tgz')
+        with open(archive, 'ab') as fout:
+            fout.write('\0')
+        pkg = _Package(_workdir('new'))
+        self.assertRaises(IOError, cache.fetch, pkg)
+        self.assertFalse(os.path.exists(pkg.install_prefix))
+        os.remove(archive + '.sha256')
+        self.assertRaises(IOError, cache.fetch, pkg)
+        self.assertFalse(os.path.exists(pkg.install_prefix))
+
+    def _store_links(self, links):
+        """Put a tarball containing a file and the given links in the cache."""
+        util.mkdirp(_workdir('cache'))
+        archive = _workdir('cache', 'pkg-0123456789.tgz')
+        with tarfile.open(archive, 'w:gz', format=tarfile.PAX_FORMAT, 
+                          pax_headers={PREFIX_HEADER: self.old_storage}) as tar:
+            tar.add(self.tool, arcname='bin/tool')
+            for name, linkname, link_type in links:
+                member = tarfile.TarInfo(name)
+                member.type = link_type
+                member.linkname = linkname
+                tar.addfile(member)
+        with open(archive, 'rb') as fin:
+            checksum = hashlib.sha256(fin.read()).hexdigest()
+        with open(archive + '.sha256', 'w') as fout:
+            fout.write('%s  pkg-0123456789.tgz\n' % checksum)
+
+    def test_unsafe_links(self):
+        cache = BinaryCache(_workdir('cache'))
+        pkg = _Package(_workdir('new'))
+        outside = _workdir('outside')
+        for links in ([('etc', '../../..', tarfile.SYMTYPE)],
+                      [('etc', outside, tarfile.SYMTYPE)],
+                      [('bin/up', '..', tarfile.SYMTYPE), ('etc', 'bin/up/..', tarfile.SYMTYPE)],
+                      [('here', '.', tarfile.SYMTYPE), ('bin/etc', '../here/bin/../..', tarfile.SYMTYPE)],
+                      [('loop', 'loop', tarfile.SYMTYPE)],
+                      [('etc', outside, tarfile.LNKTYPE)],
+                      [('up', '..', tarfile.SYMTYPE), ('passwd', 'up/passwd', tarfile.LNKTYPE)]):
+            self._store_links(links)
+            self.assertRaises(IOError, cache.fetch, pkg)
+            self.assertFalse(os.path.exists(pkg.install_prefix))
+            self.assertFalse(os.path.exists(outside))
+        # Links that stay inside the installation are kept
+        self._store_links([('tool', os.path.join(self.pkg.install_prefix, 'bin', 'tool'), tarfile.SYMTYPE),
+                           ('lib/tool', '../bin/tool', tarfile.SYMTYPE),
+                           ('bin/tool.1', 'bin/tool', tarfile.LNKTYPE)])
+        self.assertTrue(cache.fetch(pkg))
+        self.assertEqual(os.readlink(os.path.join(pkg.install_prefix, 'tool')),
+                         os.path.join(pkg.install_prefix, 'bin', 'tool'))
+        self.assertEqual(os.readlink(os.path.join(pkg.install_prefix, 'lib', 'tool')), '../bin/tool')
+        self.assertTrue(os.path.isfile(os.path.join(pkg.install_prefix, 'bin', 'tool.1')))
+
+    def test_http(self):
+        util.mkdirp(_workdir('server'))
+        server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), _CacheRequestHandler)
+        server.root = _workdir('server')
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            cache = BinaryCache('http://127.0.0.1:%d/cache/' % server.server_port)
+            self.assertTrue(cache.remote)
+            self.assertFalse(cache.fetch(_Package(_workdir('new'))))
+            util.mkdirp(_workdir('server', 'cache'))
+            cache.store(self.pkg)
+            self.assertEqual(sorted(os.listdir(_workdir('server', 'cache'))),
+                             ['pkg-0123456789.tgz', 'pkg-0123456789.tgz.sha256'])
+            self.assertTrue(cache.fetch(_Package(_workdir('new'))))
+            self._check_relocated(_workdir('new'))
+            self.assertFalse(cache.fetch(_Package(_workdir('new'), uid='other')))
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
@@ -30,9 +30,151 @@
 Functions used for unit tests of installation.py.
 """
 
-
+import os
+import time
+import unittest
+import threading
+from taucmdr import tests, util
 from taucmdr.tests import TestCase, not_implemented
+from taucmdr.cf.software import SoftwarePackageError
+from taucmdr.cf.software.installation import install_packages, MakeJobserver
+
+
+_MAKEFILE = """JOBS = job1 job2 job3 job4 job5 job6
+all: $(JOBS)
+$(JOBS):
+\t@touch %(running)s/$@-$$$$ && ls %(running)s | wc -l >> %(counts)s && sleep 0.5 && rm %(running)s/$@-$$$$
+"""
+
+
+def _workdir():
+    return os.path.join(tests.get_test_workdir(), 'install_packages')
+
+
+class _Package(object):
+    """Stands in for an :any:`Installation` by creating a marker file after a delay."""
+    
+    def __init__(self, name, dependencies=(), delay=0, fail=False):
+        self.name = self.title = self.uid = name
+        self.dependencies = dict((dep.name, dep) for dep in dependencies)
+        self.unmanaged = False
+        self.install_prefix = os.path.join(_workdir(), name)
+        self.delay = delay
+        self.fail = fail
+        
+    def verify(self):
+        if not os.path.exists(self.install_prefix):
+            raise SoftwarePackageError("'%s' does not exist" % self.install_prefix)
+        
+    def install_package(self, force_reinstall=False):
+        for dep in self.dependencies.itervalues():
+            dep.verify()
+        begin = time.time()
+        time.sleep(self.delay)
+        if self.fail:
+            raise SoftwarePackageError("%s failed" % self.name)
+        with open(self.install_prefix, 'w') as fout:
+            fout.write("%r %r" % (begin, time.time()))
+        with open(os.path.join(_workdir(), 'installed'), 'a') as fout:
+            fout.write(self.name + '\n')
+            
+    def interval(self):
+        with open(self.install_prefix) as fin:
+            return [float(x) for x in fin.read().split()]
+
 
 @not_implemented
 class InstallationTest(TestCase):
     pass
+
+
+class InstallPackagesTest(TestCase):
+    """Unit tests for install_packages."""
+    
+    def setUp(self):
+        util.mkdirp(_workdir())
+
+    def tearDown(self):
+        util.rmtree(_workdir())
+
+    def _installed(self):
+        with open(os.path.join(_workdir(), 'installed')) as fin:
+            return sorted(fin.read().split())
+
+    def test_dependency_order(self):
+        libs = [_Package(name, delay=0.5) for name in 'a', 'b', 'c']
+        shared = _Package('shared', libs[:2])
+        other = _Package('other', [libs[2], _Package('shared', libs[:2])])
+        top = _Package('top', [shared, other])
+        install_packages([top], jobs=3)
+        # Packages with the same name and UID are installed once
+        self.assertEqual(self._installed(), ['a', 'b', 'c', 'other', 'shared', 'top'])
+        intervals = [pkg.interval() for pkg in libs]
+        # Independent packages were installed at the same time
+        self.assertLess(max(begin for begin, _ in intervals), min(end for _, end in intervals))
+        self.assertGreaterEqual(shared.interval()[0], max(end for _, end in intervals[:2]))
+        self.assertGreaterEqual(other.interval()[0], intervals[2][1])
+        self.assertGreaterEqual(top.interval()[0], max(shared.interval()[1], other.interval()[1]))
+        self.assertTrue(os.path.exists(top.install_prefix + '.log'))
+
+    def test_serial(self):
+        first = _Package('first')
+        second = _Package('second', [first])
+        install_packages([second], jobs=1)
+        self.assertEqual(self._installed(), ['first', 'second'])
+        self.assertGreaterEqual(second.interval()[0], first.interval()[1])
+        self.assertFalse(os.path.exists(second.install_prefix + '.log'))
+
+    def test_fail_fast(self):
+        slow = _Package('slow', delay=60)
+        broken = _Package('broken', fail=True)
+        top = _Package('top', [slow, broken])
+        begin = time.time()
+        self.assertRaises(SoftwarePackageError, install_packages, [top], jobs=2)
+        self.assertLess(time.time() - begin, 30)
+        self.assertRaises(SoftwarePackageError, slow.verify)
+        self.assertRaises(SoftwarePackageError, top.verify)
+
+
+@unittest.skipUnless(util.which('make'), "make not found")
+class MakeJobserverTest(TestCase):
+    """Unit tests for MakeJobserver."""
+    
+    def setUp(self):
+        util.mkdirp(os.path.join(_workdir(), 'running'))
+
+    def tearDown(self):
+        util.rmtree(_workdir())
+
+    def _makefile(self, name):
+        path = os.path.join(_workdir(), name)
+        util.mkdirp(path)
+        with open(os.path.join(path, 'Makefile'), 'w') as fout:
+            fout.write(_MAKEFILE % {'running': os.path.join(_workdir(), 'running'),
+                                    'counts': os.path.join(_workdir(), 'counts')})
+        return path
+
+    def _max_jobs(self):
+        with open(os.path.join(_workdir(), 'counts')) as fin:
+            return max(int(line) for line in fin)
+
+    def test_shared_limit(self):
+        jobserver = MakeJobserver(3)
+        retvals = []
+        threads = [threading.Thread(target=lambda cwd: retvals.append(jobserver.make(['make'], cwd=cwd)),
+                                    args=(self._makefile(name),)) for name in 'first', 'second']
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(retvals, [0, 0])
+        # Concurrent makes ran jobs in parallel but never more jobs than the jobserver has tokens
+        self.assertGreater(self._max_jobs(), 1)
+        self.assertLessEqual(self._max_jobs(), 3)
+        # All tokens were returned
+        self.assertEqual(os.read(jobserver._read_fd, 3), '+++')
+
+    def test_serial(self):
+        jobserver = MakeJobserver(3)
+        self.assertEqual(jobserver.make(['make'], cwd=self._makefile('serial'), parallel=False), 0)
+        self.assertEqual(self._max_jobs(), 1)
@@ -193,6 +193,14 @@ class AbstractStorage(object):
     @abstractmethod
     def __exit__(self, ex_type, value, traceback):
         """Finalizes the database transaction."""
+
+    @abstractmethod
+    def on_commit(self, callback):
+        """Invoke `callback` once the current transaction has been committed.
+        
+        Args:
+            callback: Callable accepting no arguments.
+        """
         
     @abstractmethod
     def table(self, table_name):
@@ -251,6 +259,7 @@ class AbstractStorage(object):
             * Record.eid_type: return the record with that element identifier.
             * dict: return all records with attributes matching `keys`.
             * list or tuple: return a list of records matching the elements of `keys`
+            * callable: return all records for which ``keys(record)`` is True, e.g. a :any:`Query`.
             * None: return all records.
         
         Args:
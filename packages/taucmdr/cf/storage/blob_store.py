@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Content-addressed store for deduplicating trial data files.
+
+Repeated trials often write byte-identical files, e.g. OTF2 definitions, TAU event definitions, or 
+the profiles of idle ranks.  A :any:`BlobStore` keeps one copy of each distinct file, named by the 
+SHA-256 hash of its contents, and replaces duplicate files with hard links to that copy.  The 
+deduplicated files keep their paths so readers don't need to know about the store.
+
+Files in the store are shared by every trial that links to them, so they are made read-only.  
+Programs that update trial data must write new files and rename them rather than modify files
+in place.  A stored file that is no longer linked from any trial is removed by :any:`BlobStore.prune`.
+"""
+
+import os
+import stat
+import errno
+import hashlib
+from taucmdr import logger, util
+
+
+LOGGER = logger.get_logger(__name__)
+
+BLOB_STORE_DIR = '.blobs'
+"""str: Name of the blob store directory in the project prefix."""
+
+_READ_ONLY = ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+
+
+def _file_hash(path, block_size=1 << 20):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as fin:
+        for block in iter(lambda: fin.read(block_size), ''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class BlobStore(object):
+    """Content-addressed file store.
+    
+    Attributes:
+        prefix (str): Path to the store directory.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def _blob_path(self, digest):
+        return os.path.join(self.prefix, digest[:2], digest)
+
+    def add(self, path):
+        """Store a file or replace it with a link to an identical stored file.
+        
+        Args:
+            path (str): Path to the file.
+            
+        Returns:
+            bool: True if no other file shares the file's contents, i.e. they were not already in 
+                  the store or `path` is the only file linked to them.  False if `path` now links to 
+                  a copy that other files share.
+                  
+        Raises:
+            OSError: The file could not be linked, e.g. because the filesystem does not support hard links.
+        """
+        blob = self._blob_path(_file_hash(path))
+        try:
+            blob_stat = os.stat(blob)
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
+        else:
+            path_stat = os.stat(path)
+            if (blob_stat.st_dev, blob_stat.st_ino) == (path_stat.st_dev, path_stat.st_ino):
+                # Linked from the store and `path` only
+                return blob_stat.st_nlink <= 2
+            # Link to a temporary name and rename so `path` is never missing
+            tmp_path = path + '.blob'
+            os.link(blob, tmp_path)
+            os.rename(tmp_path, path)
+            return False
+        util.mkdirp(os.path.dirname(blob))
+        os.chmod(path, stat.S_IMODE(os.stat(path).st_mode) & _READ_ONLY)
+        tmp_blob = '%s.%d' % (blob, os.getpid())
+        os.link(path, tmp_blob)
+        os.rename(tmp_blob, blob)
+        return True
+
+    def dedup(self, paths):
+        """Deduplicate several files.
+        
+        Files that can't be linked are left as they are.
+        
+        Args:
+            paths: Paths to files.
+            
+        Returns:
+            int: Total size in bytes of the files whose contents are not shared with other files or 
+                 that could not be deduplicated, i.e. the physical size of the files.
+        """
+        physical_size = 0
+        for path in paths:
+            size = os.path.getsize(path)
+            try:
+                if self.add(path):
+                    physical_size += size
+            except (IOError, OSError) as err:
+                LOGGER.debug("Not deduplicating '%s': %s", path, err)
+                physical_size += size
+        return physical_size
+
+    def prune(self):
+        """Remove stored files that are no longer linked from outside the store.
+        
+        Returns:
+            int: Total size in bytes of the removed files.
+        """
+        removed = 0
+        for dir_path, _, file_names in os.walk(self.prefix):
+            for name in file_names:
+                path = os.path.join(dir_path, name)
+                try:
+                    path_stat = os.stat(path)
+                    if path_stat.st_nlink == 1:
+                        os.remove(path)
+                        removed += path_stat.st_size
+                except OSError as err:
+                    LOGGER.debug("Could not prune '%s': %s", path, err)
+        if removed:
+            LOGGER.debug("Pruned %s from '%s'", util.human_size(removed), self.prefix)
+        return removed
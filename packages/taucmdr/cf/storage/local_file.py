@@ -34,6 +34,7 @@ both the database and the key/value store.
 
 import os
 import json
+import copy
 import tinydb
 from tinydb import operations
 from taucmdr import logger, util
@@ -44,11 +45,24 @@ LOGGER = logger.get_logger(__name__)
 
 
 
+def _copy_element(value):
+    """Copy the dictionaries and lists in a database element.
+    
+    Much faster than :any:`copy.deepcopy` since elements only contain JSON data.  Exact types are 
+    checked since most values are scalars and function calls are slow.
+    """
+    # pylint: disable=unidiomatic-typecheck
+    if type(value) is list:
+        return [_copy_element(val) if type(val) in (dict, list) else val for val in value]
+    return {key: _copy_element(val) if type(val) in (dict, list) else val for key, val in value.iteritems()}
+
+
 class _JsonRecord(StorageRecord):
     eid_type = int
     
     def __init__(self, database, element, eid=None):
-        super(_JsonRecord, self).__init__(database, eid or element.eid, element)
+        # TinyDB shares the values of elements with _JsonFileStorage's cache so changes must not reach them
+        super(_JsonRecord, self).__init__(database, eid or element.eid, _copy_element(element))
 
     def __str__(self):
         return json.dumps(self.element)
@@ -62,6 +76,10 @@ class _JsonFileStorage(tinydb.JSONStorage):
     
     TinyDB's default storage (:any:`tinydb.JSONStorage`) assumes write access to the JSON file.
     This isn't the case for system-level storage and possibly others.
+    
+    TinyDB reads the whole file for every query so the parsed data is kept until the file's 
+    modification time or size changes.  Parsing a large project file would otherwise dominate 
+    the run time of short commands like ``trial list``.
     """
     def __init__(self, path):
         try:
@@ -74,19 +92,48 @@ class _JsonFileStorage(tinydb.JSONStorage):
         else:
             self.readonly = False
             LOGGER.debug("'%s' opened read-write", path)
+        self._cache = None
+
+    def _file_version(self):
+        stat = os.fstat(self._handle.fileno())
+        return stat.st_mtime, stat.st_size
+
+    def read(self):
+        # Check the version before reading so data written meanwhile is never cached as the older version
+        version = self._file_version()
+        if self._cache and self._cache[0] == version:
+            return self._cache[1]
+        data = super(_JsonFileStorage, self).read()
+        self._cache = (version, data)
+        return data
 
     def write(self, *args, **kwargs):
+        # TinyDB changes the data it read before writing it, so the cached data is stale even if the write fails
+        self._cache = None
         if self.readonly:
             raise ConfigurationError("Cannot write to '%s'" % self.path, "Check that you have `write` access.")
         else:
             super(_JsonFileStorage, self).write(*args, **kwargs)
 
+    def clear_cache(self):
+        """Read the file again on the next read even if its modification time and size haven't changed.
+        
+        Modification times are coarse so a change made by another process may not be detected.
+        """
+        self._cache = None
+
 
 class LocalFileStorage(AbstractStorage):
     """A persistant, transactional record storage system.  
     
     Uses :py:class:`TinyDB` for both the database and the key/value store.
     
+    Transactions nest.  Each ``with`` block opens a savepoint and every modification made while
+    a transaction is open appends its inverse operation to an undo log.  If a ``with`` block exits
+    with an exception then only the operations performed since that block's savepoint are undone,
+    so the cost of a rollback is proportional to the work done in the transaction rather than
+    the size of the database.
+    
     Attributes:
         dbfile (str): Absolute path to database file.
     """
@@ -96,7 +143,9 @@ class LocalFileStorage(AbstractStorage):
     def __init__(self, name, prefix):
         super(LocalFileStorage, self).__init__(name)
         self._transaction_count = 0
-        self._db_copy = None
+        self._undo_log = []
+        self._commit_hooks = []
+        self._savepoints = []
         self._database = None
         self._prefix = prefix
         
@@ -172,6 +221,11 @@ class LocalFileStorage(AbstractStorage):
                                    "Check that you have `read` access")
             LOGGER.debug("Initialized %s database '%s'", self.name, dbfile)
 
+    def clear_cache(self):
+        """Discard data cached from the database file, e.g. after locking it against other processes."""
+        if self._database is not None:
+            self._database._storage.clear_cache()  # pylint: disable=protected-access
+
     def disconnect_database(self, *args, **kwargs):
         """Close the database for reading and writing."""
         if self._database:
@@ -188,24 +242,120 @@ class LocalFileStorage(AbstractStorage):
         return self._database._storage.path
 
     def __enter__(self):
-        """Initiates the database transaction."""
-        # Use protected methods to duplicate database in memory rather than on disk.
-        # pylint: disable=protected-access
+        """Initiates the database transaction or, if a transaction is already open, a new savepoint."""
         if self._transaction_count == 0:
             self.connect_database()
-            self._db_copy = self._database._read()
+            self._undo_log = []
+            self._commit_hooks = []
+        self._savepoints.append((len(self._undo_log), len(self._commit_hooks)))
         self._transaction_count += 1
         return self
 
     def __exit__(self, ex_type, value, traceback):
-        """Finalizes the database transaction."""
-        # Use protected methods to duplicate database in memory rather than on disk.
-        # pylint: disable=protected-access
+        """Finalizes the database transaction or releases the innermost savepoint.
+        
+        If an exception was raised then all modifications made since the matching call to 
+        :any:`__enter__` are reverted and commit hooks registered since then are discarded.
+        When the outermost transaction completes successfully the remaining commit hooks are invoked.
+        """
         self._transaction_count -= 1
-        if ex_type and self._transaction_count == 0:
-            self._database._write(self._db_copy)
-            self._db_copy = None
-            return False
+        savepoint, hook_count = self._savepoints.pop()
+        if ex_type:
+            self._rollback(savepoint)
+            del self._commit_hooks[hook_count:]
+        if self._transaction_count == 0:
+            hooks = self._commit_hooks
+            self._undo_log = []
+            self._commit_hooks = []
+            for hook in hooks:
+                hook()
+        return False
+
+    def on_commit(self, callback):
+        """Invoke `callback` once the current transaction has been committed.
+        
+        If no transaction is open then `callback` is invoked immediately.  If the transaction 
+        (or the savepoint that registered `callback`) is rolled back then `callback` is never invoked.
+        
+        Args:
+            callback: Callable accepting no arguments.
+        """
+        if self._transaction_count:
+            self._commit_hooks.append(callback)
+        else:
+            callback()
+
+    def _log_undo(self, table_name, elements):
+        """Record the inverse of a pending modification in the undo log.
+        
+        Does nothing if no transaction is open.
+        
+        Args:
+            table_name (str): Name of the table that will be modified.
+            elements (dict): Element identifiers mapped to the element's value before the modification
+                             or None if the element did not exist.
+        """
+        if self._transaction_count and elements:
+            self._undo_log.append((table_name, elements))
+
+    def _log_undo_search(self, table, keys, match_any):
+        """Record the inverse of a pending modification to the records matching `keys`.
+        
+        Args:
+            table: Table that will be modified.
+            keys: Fields or element identifiers to match.  See :any:`update`.
+            match_any (bool): See :any:`update`.
+            
+        Returns:
+            dict: The logged elements.
+        """
+        if not self._transaction_count:
+            return None
+        if isinstance(keys, self.Record.eid_type):
+            element = table.get(eid=keys)
+            elements = [element] if element else []
+        elif isinstance(keys, dict):
+            elements = table.search(self._query(keys, match_any))
+        elif isinstance(keys, (list, tuple)):
+            elements = self._elements(table, keys)
+        else:
+            return None
+        return {elem.eid: copy.deepcopy(dict(elem)) for elem in elements}
+
+    def _rollback(self, savepoint):
+        """Revert all modifications logged after `savepoint`.
+        
+        Inverse operations are applied in reverse order to an in-memory copy of each affected 
+        table and each table is written back exactly once.
+        
+        Args:
+            savepoint (int): Position in the undo log to roll back to.
+        """
+        # Use protected methods to modify elements by identifier.
+        # pylint: disable=protected-access
+        undo = self._undo_log[savepoint:]
+        del self._undo_log[savepoint:]
+        if not undo:
+            return
+        LOGGER.debug("%s: rolling back %d operations", self.name, len(undo))
+        tables = {}
+        for table_name, elements in reversed(undo):
+            try:
+                data = tables[table_name][1]
+            except KeyError:
+                table = self._database.table(table_name or '_default')
+                data = table._read()
+                tables[table_name] = (table, data)
+            for eid, element in elements.iteritems():
+                if element is None:
+                    data.pop(eid, None)
+                else:
+                    data[eid] = element
+        for table, data in tables.itervalues():
+            table._write(data)
+            # Don't reuse the identifiers of restored elements, e.g. after purge resets the table's counter
+            if data:
+                table._last_id = max(table._last_id, max(data))
 
     def table(self, table_name):
         self.connect_database()
@@ -214,6 +364,12 @@ class LocalFileStorage(AbstractStorage):
         else:
             return self._database.table(table_name)
     
+    @staticmethod
+    def _elements(table, eids):
+        """Get the elements of a table with the given element identifiers, in order, with one read of the table."""
+        elements = {element.eid: element for element in table.all()}
+        return [elements[eid] for eid in eids if eid in elements]
+
     @staticmethod
     def _query(keys, match_any):
         """Construct a TinyDB query object."""
@@ -288,6 +444,7 @@ class LocalFileStorage(AbstractStorage):
             * self.Record.eid_type: return the record with that element identifier.
             * dict: return all records with attributes matching `keys`.
             * list or tuple: return a list of records matching the elements of `keys`
+            * callable: return all records for which ``keys(record)`` is True, e.g. a :any:`Query`.
             * None: return all records.
         
         Args:
@@ -316,10 +473,17 @@ class LocalFileStorage(AbstractStorage):
             return [self.Record(self, element=element) for element in table.search(self._query(keys, match_any))]
         elif isinstance(keys, (list, tuple)):
             #LOGGER.debug("%s: search(keys=%r)", table_name, keys)
+            if all(isinstance(key, self.Record.eid_type) for key in keys):
+                # Read the table once rather than once per element identifier
+                elements = self._elements(table, keys)
+                return [self.Record(self, element=element) for element in elements]
             result = []
             for key in keys:
                 result.extend(self.search(keys=key, table_name=table_name, match_any=match_any))
             return result
+        elif callable(keys):
+            #LOGGER.debug("%s: search(%r)", table_name, keys)
+            return [self.Record(self, element=element) for element in table.search(keys)]
         else:
             raise ValueError(keys)
 
@@ -402,6 +566,7 @@ class LocalFileStorage(AbstractStorage):
             Record: The new record.
         """
         eid = self.table(table_name).insert(data)
+        self._log_undo(table_name, {eid: None})
         record = self.Record(self, eid=eid, element=data)
         return record
 
@@ -424,6 +589,7 @@ class LocalFileStorage(AbstractStorage):
             ValueError: ``bool(keys) == False`` or invaild value for `keys`.
         """
         table = self.table(table_name)
+        self._log_undo(table_name, self._log_undo_search(table, keys, match_any))
         if isinstance(keys, self.Record.eid_type):
             #LOGGER.debug("%s: update(%r, eid=%r)", table_name, fields, keys)
             table.update(fields, eids=[keys])
@@ -458,6 +624,7 @@ class LocalFileStorage(AbstractStorage):
             ValueError: ``bool(keys) == False`` or invaild value for `keys`.
         """
         table = self.table(table_name)
+        self._log_undo(table_name, self._log_undo_search(table, keys, match_any))
         if isinstance(keys, self.Record.eid_type):
             for field in fields:
                 #LOGGER.debug("%s: unset(%s, eid=%r)", table_name, field, keys)
@@ -491,6 +658,7 @@ class LocalFileStorage(AbstractStorage):
             ValueError: ``bool(keys) == False`` or invaild value for `keys`.
         """
         table = self.table(table_name)
+        self._log_undo(table_name, self._log_undo_search(table, keys, match_any))
         if isinstance(keys, self.Record.eid_type):
             #LOGGER.debug("%s: remove(eid=%r)", table_name, keys)
             table.remove(eids=[keys])
@@ -510,4 +678,7 @@ class LocalFileStorage(AbstractStorage):
             table_name (str): Name of the table to operate on.  See :any:`AbstractDatabase.table`.
         """
         LOGGER.debug("%s: purge()", table_name)
-        self.table(table_name).purge()
+        table = self.table(table_name)
+        if self._transaction_count:
+            self._log_undo(table_name, {elem.eid: copy.deepcopy(dict(elem)) for elem in table.all()})
+        table.purge()
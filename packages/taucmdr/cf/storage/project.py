@@ -34,6 +34,8 @@ where :any:`USER_PREFIX` is not accessible from cluster compute nodes.
 
 
 import os
+from contextlib import contextmanager
+import fasteners
 from taucmdr import logger, util
 from taucmdr import PROJECT_DIR
 from taucmdr.cf.storage import StorageError
@@ -71,6 +73,30 @@ class ProjectStorage(LocalFileStorage):
     
     def __init__(self):
         super(ProjectStorage, self).__init__('project', None)
+        self._lock = None
+        self._lock_depth = 0
+
+    @contextmanager
+    def lock(self):
+        """Lock the project against modification by other processes.
+        
+        The lock is reentrant within a process.  Nested :any:`fasteners.InterProcessLock` objects for 
+        the same file can't be used instead since releasing the inner lock releases the outer lock too.
+        """
+        if not self._lock_depth:
+            lock = fasteners.InterProcessLock(os.path.join(self.prefix, '.lock'))
+            lock.acquire()
+            self._lock = lock
+            # Another process may have changed the database since it was last read
+            self.clear_cache()
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if not self._lock_depth:
+                self._lock.release()
+                self._lock = None
     
     def connect_filesystem(self, *args, **kwargs):
         """Prepares the store filesystem for reading and writing."""
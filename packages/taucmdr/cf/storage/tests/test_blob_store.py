@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Test functions.
+
+Functions used for unit tests of blob_store.py.
+"""
+
+import os
+from taucmdr import tests, util
+from taucmdr.cf.storage.blob_store import BlobStore
+
+
+class BlobStoreTest(tests.TestCase):
+    """Unit tests for BlobStore."""
+
+    def _write(self, path, data):
+        util.mkdirp(os.path.dirname(path))
+        with open(path, 'w') as fout:
+            fout.write(data)
+
+    def test_dedup(self):
+        workdir = os.path.join(tests.get_test_workdir(), 'blob_store')
+        store = BlobStore(os.path.join(workdir, 'blobs'))
+        paths = [os.path.join(workdir, trial, 'traces.def') for trial in '0', '1', '2']
+        for path in paths:
+            self._write(path, 'definitions')
+        unique = os.path.join(workdir, '2', 'profile.0.0.0')
+        self._write(unique, 'profile')
+        self.assertEqual(store.dedup(paths[:1]), len('definitions'))
+        self.assertEqual(store.dedup(paths[1:] + [unique]), len('profile'))
+        # Deduplicating again does nothing
+        self.assertEqual(store.dedup(paths), 0)
+        inodes = set(os.stat(path).st_ino for path in paths)
+        self.assertEqual(len(inodes), 1)
+        for path in paths:
+            with open(path) as fin:
+                self.assertEqual(fin.read(), 'definitions')
+
+    def test_prune(self):
+        workdir = os.path.join(tests.get_test_workdir(), 'blob_prune')
+        store = BlobStore(os.path.join(workdir, 'blobs'))
+        paths = [os.path.join(workdir, trial, 'tau.edf') for trial in '0', '1']
+        for path in paths:
+            self._write(path, 'events')
+        store.dedup(paths)
+        os.remove(paths[0])
+        self.assertEqual(store.prune(), 0)
+        os.remove(paths[1])
+        self.assertEqual(store.prune(), len('events'))
+        self.assertEqual([files for _, _, files in os.walk(store.prefix) if files], [])
@@ -30,8 +30,123 @@
 Functions used for unit tests of local_file.py.
 """
 
+import os
+import json
 from taucmdr import tests
+from taucmdr.error import ConfigurationError
+from taucmdr.cf.storage.local_file import LocalFileStorage
+
 
-@tests.not_implemented
 class LocalFileTest(tests.TestCase):
-    pass
+    """Unit tests for LocalFileStorage."""
+
+    def setUp(self):
+        self.storage = LocalFileStorage('test', os.path.join(tests.get_test_workdir(), 'local_file_test'))
+        self.storage.connect_database()
+        self.storage.purge(table_name='rec')
+
+    def tearDown(self):
+        self.storage.disconnect_database()
+
+    def test_commit(self):
+        with self.storage as database:
+            database.insert({'name': 'a'}, table_name='rec')
+            database.insert({'name': 'b'}, table_name='rec')
+        self.assertEqual(self.storage.count(table_name='rec'), 2)
+
+    def test_rollback(self):
+        keep = self.storage.insert({'name': 'keep', 'tags': [1, 2]}, table_name='rec')
+        gone = self.storage.insert({'name': 'gone'}, table_name='rec')
+        with self.assertRaises(RuntimeError):
+            with self.storage as database:
+                database.insert({'name': 'new'}, table_name='rec')
+                database.update({'tags': [3]}, keep.eid, table_name='rec')
+                database.unset(['name'], keep.eid, table_name='rec')
+                database.remove(gone.eid, table_name='rec')
+                raise RuntimeError
+        records = self.storage.search(table_name='rec')
+        self.assertEqual(sorted(rec['name'] for rec in records), ['gone', 'keep'])
+        self.assertEqual(self.storage.get(keep.eid, table_name='rec')['tags'], [1, 2])
+
+    def test_savepoint(self):
+        with self.storage as database:
+            database.insert({'name': 'outer'}, table_name='rec')
+            try:
+                with database:
+                    database.insert({'name': 'inner'}, table_name='rec')
+                    database.update({'name': 'changed'}, {'name': 'outer'}, table_name='rec')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            database.insert({'name': 'after'}, table_name='rec')
+        records = self.storage.search(table_name='rec')
+        self.assertEqual(sorted(rec['name'] for rec in records), ['after', 'outer'])
+
+    def test_purge_rollback(self):
+        self.storage.insert({'name': 'a'}, table_name='rec')
+        with self.assertRaises(RuntimeError):
+            with self.storage as database:
+                database.purge(table_name='rec')
+                database.insert({'name': 'b'}, table_name='rec')
+                raise RuntimeError
+        records = self.storage.search(table_name='rec')
+        self.assertEqual([rec['name'] for rec in records], ['a'])
+
+    def test_purge_rollback_eids(self):
+        first = self.storage.insert({'name': 'a'}, table_name='rec')
+        with self.assertRaises(RuntimeError):
+            with self.storage as database:
+                database.purge(table_name='rec')
+                raise RuntimeError
+        second = self.storage.insert({'name': 'b'}, table_name='rec')
+        self.assertNotEqual(first.eid, second.eid)
+        records = self.storage.search(table_name='rec')
+        self.assertEqual(sorted(rec['name'] for rec in records), ['a', 'b'])
+
+    def test_search(self):
+        recs = [self.storage.insert({'name': name, 'size': size}, table_name='rec') 
+                for name, size in ('a', 1), ('b', 2), ('c', 3)]
+        found = self.storage.search([recs[2].eid, 999, recs[0].eid], table_name='rec')
+        self.assertEqual([rec['name'] for rec in found], ['c', 'a'])
+        found = self.storage.search(lambda element: element['size'] > 1, table_name='rec')
+        self.assertEqual(sorted(rec['name'] for rec in found), ['b', 'c'])
+
+    def test_other_writer(self):
+        rec = self.storage.insert({'name': 'a'}, table_name='rec')
+        other = LocalFileStorage('test', self.storage.prefix)
+        other.connect_database()
+        try:
+            self.assertEqual(self.storage.get(rec.eid, table_name='rec')['name'], 'a')
+            dbfile = os.path.join(self.storage.prefix, 'test.json')
+            mtime = os.path.getmtime(dbfile)
+            other.update({'name': 'b'}, rec.eid, table_name='rec')
+            self.assertEqual(self.storage.get(rec.eid, table_name='rec')['name'], 'b')
+            # A change that keeps the file's size and modification time is only seen after clearing the cache
+            other.update({'name': 'c'}, rec.eid, table_name='rec')
+            os.utime(dbfile, (mtime, mtime))
+            self.storage.get(rec.eid, table_name='rec')
+            other.update({'name': 'd'}, rec.eid, table_name='rec')
+            os.utime(dbfile, (mtime, mtime))
+            self.assertEqual(self.storage.get(rec.eid, table_name='rec')['name'], 'c')
+            self.storage.clear_cache()
+            self.assertEqual(self.storage.get(rec.eid, table_name='rec')['name'], 'd')
+        finally:
+            other.disconnect_database()
+
+    def test_change_read_record(self):
+        rec = self.storage.insert({'name': 'a', 'tags': [1, 2], 'attrs': {'x': 1}}, table_name='rec')
+        found = self.storage.get(rec.eid, table_name='rec')
+        found['tags'].append(3)
+        found['attrs']['x'] = 2
+        found.element['name'] = 'b'
+        with open(os.path.join(self.storage.prefix, 'test.json')) as fin:
+            on_disk = json.load(fin)['rec'][str(rec.eid)]
+        self.assertEqual(dict(self.storage.get(rec.eid, table_name='rec').element), on_disk)
+        self.assertEqual(on_disk, {'name': 'a', 'tags': [1, 2], 'attrs': {'x': 1}})
+        # A failed write doesn't leave changed data cached
+        self.storage._database._storage.readonly = True  # pylint: disable=protected-access
+        try:
+            self.assertRaises(ConfigurationError, self.storage.insert, {'name': 'c'}, table_name='rec')
+        finally:
+            self.storage._database._storage.readonly = False  # pylint: disable=protected-access
+        self.assertEqual(self.storage.count(table_name='rec'), 1)
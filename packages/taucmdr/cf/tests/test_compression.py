@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Unit tests for taucmdr.cf.compression"""
+
+import os
+from taucmdr import tests
+from taucmdr.error import ConfigurationError
+from taucmdr.cf import compression
+
+
+class CompressionTest(tests.TestCase):
+    """Unit tests for taucmdr.cf.compression"""
+
+    def test_parse_policy(self):
+        self.assertEqual(compression.parse_policy('gzip'), ('gzip', compression.DEFAULT_LEVEL))
+        self.assertEqual(compression.parse_policy('BZ2:9'), ('bz2', 9))
+        self.assertIsNone(compression.parse_policy('none'))
+        self.assertIsNone(compression.parse_policy(None))
+        for value in 'zip', 'gzip:0', 'gzip:fast':
+            self.assertRaises(ConfigurationError, compression.parse_policy, value)
+
+    def test_round_trip(self):
+        path = os.path.join(tests.get_test_workdir(), 'tauprofile.xml')
+        data = '<profiles>%s</profiles>' % ('<thread/>' * 10000)
+        for codec, suffix in compression.CODECS.iteritems():
+            with open(path, 'w') as fout:
+                fout.write(data)
+            compressed = compression.compress_file(path, codec, 9)
+            self.assertEqual(compressed, path + suffix)
+            self.assertFalse(os.path.exists(path))
+            self.assertLess(os.path.getsize(compressed), len(data))
+            self.assertEqual(compression.find_file(path), compressed)
+            with compression.open_file(compressed) as fin:
+                self.assertEqual(fin.read(), data)
+            self.assertEqual(compression.decompress_file(compressed), path)
+            self.assertFalse(os.path.exists(compressed))
+            with open(path) as fin:
+                self.assertEqual(fin.read(), data)
+            os.remove(path)
+
+    def test_decompress_copy(self):
+        workdir = tests.get_test_workdir()
+        path = os.path.join(workdir, 'profile.0.0.0')
+        copy = os.path.join(workdir, 'copy.0.0.0')
+        data = 'templated_functions_MULTI_TIME\n' * 1000
+        with open(path, 'w') as fout:
+            fout.write(data)
+        compressed = compression.compress_file(path, 'gzip')
+        self.assertEqual(compression.decompress_copy(compressed, copy), copy)
+        self.assertTrue(os.path.exists(compressed))
+        self.assertFalse(os.path.exists(path))
+        with open(copy) as fin:
+            self.assertEqual(fin.read(), data)
+        os.remove(compressed)
+        os.remove(copy)
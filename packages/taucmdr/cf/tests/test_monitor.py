@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Unit tests for taucmdr.cf.monitor"""
+
+import os
+import time
+from taucmdr import tests
+from taucmdr.cf.monitor import DataMonitor, measure_paths
+
+
+class DataMonitorTest(tests.TestCase):
+    """Unit tests for taucmdr.cf.monitor"""
+
+    def _write(self, path, size):
+        with open(path, 'w') as fout:
+            fout.write('x' * size)
+
+    def test_measure_paths(self):
+        path = os.path.join(tests.get_test_workdir(), 'monitor_measure')
+        os.makedirs(os.path.join(path, 'traces'))
+        self._write(os.path.join(path, 'profile.0.0.0'), 100)
+        self._write(os.path.join(path, 'traces', 'trace.0'), 50)
+        self._write(os.path.join(path, 'output.log'), 10)
+        self.assertEqual(measure_paths([path]), (3, 160))
+        # Overlapping directories are counted once
+        self.assertEqual(measure_paths([path, os.path.join(path, 'traces')], 
+                                       ignore=set([os.path.join(path, 'output.log')])), (2, 150))
+
+    def test_budget(self):
+        path = os.path.join(tests.get_test_workdir(), 'monitor_budget')
+        os.makedirs(path)
+        exceeded = []
+        monitor = DataMonitor('test', [path], interval=0.01, report_interval=0.05, budget=1000, 
+                              on_exceeded=lambda: exceeded.append(True), expected_duration=1)
+        monitor.start()
+        for i in xrange(5):
+            self._write(os.path.join(path, 'trace.%d' % i), 400)
+            time.sleep(0.05)
+        monitor.stop()
+        self.assertEqual(exceeded, [True])
+        self.assertTrue(monitor.exceeded)
+        self.assertEqual((monitor.files, monitor.size), (5, 2000))
+        self.assertEqual(monitor.projected_size(0.5), 4000)
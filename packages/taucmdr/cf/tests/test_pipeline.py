@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Unit tests for taucmdr.cf.pipeline"""
+
+import os
+import signal
+from taucmdr import tests
+from taucmdr.cf.pipeline import Stage, run_pipeline
+
+
+class AppendStage(Stage):
+    """Appends a line to a file unless the line is already there."""
+
+    phase = "appending"
+
+    def __init__(self, path, line):
+        self.path = path
+        self.line = line
+
+    def required(self):
+        if not os.path.exists(self.path):
+            return True
+        with open(self.path) as fin:
+            return self.line not in fin.read().split()
+
+    def run(self):
+        with open(self.path, 'a') as fout:
+            fout.write(self.line + '\n')
+
+
+class FailStage(Stage):
+    """Always fails."""
+
+    phase = "failing"
+
+    def run(self):
+        raise RuntimeError("stage failed")
+
+
+class UnpicklableStage(Stage):
+    """Can't be sent to a worker process."""
+
+    phase = "pickling"
+
+    def __init__(self):
+        self.func = lambda: None
+
+    def run(self):
+        pass
+
+
+class KillWorkerStage(Stage):
+    """Kills the worker process that runs it."""
+
+    phase = "dying"
+
+    def run(self):
+        os.kill(os.getpid(), signal.SIGKILL)
+
+
+class PipelineTest(tests.TestCase):
+    """Unit tests for taucmdr.cf.pipeline"""
+
+    def _jobs(self, name, count):
+        path = os.path.join(tests.get_test_workdir(), name)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        jobs = []
+        for i in xrange(count):
+            job_file = os.path.join(path, '%d.txt' % i)
+            if os.path.exists(job_file):
+                os.remove(job_file)
+            jobs.append((i, [AppendStage(job_file, 'one'), AppendStage(job_file, 'two')]))
+        return jobs
+
+    def _check(self, jobs):
+        for _, stages in jobs:
+            with open(stages[0].path) as fin:
+                self.assertEqual(fin.read().split(), ['one', 'two'])
+
+    def test_serial(self):
+        jobs = self._jobs('pipeline_serial', 3)
+        started, done = [], []
+        failed = run_pipeline(jobs, on_stage=lambda key, stage: started.append((key, stage.line)),
+                              on_done=lambda key, error: done.append((key, error)))
+        self.assertEqual(failed, [])
+        self.assertEqual(started, [(0, 'one'), (0, 'two'), (1, 'one'), (1, 'two'), (2, 'one'), (2, 'two')])
+        self.assertEqual(done, [(0, None), (1, None), (2, None)])
+        self._check(jobs)
+
+    def test_parallel(self):
+        jobs = self._jobs('pipeline_parallel', 5)
+        done = []
+        failed = run_pipeline(jobs, workers=2, on_done=lambda key, error: done.append(key))
+        self.assertEqual(failed, [])
+        self.assertItemsEqual(done, range(5))
+        self._check(jobs)
+
+    def test_resume(self):
+        jobs = self._jobs('pipeline_resume', 2)
+        AppendStage(jobs[0][1][0].path, 'one').run()
+        started = []
+        run_pipeline(jobs, on_stage=lambda key, stage: started.append((key, stage.line)))
+        self.assertEqual(started, [(0, 'two'), (1, 'one'), (1, 'two')])
+        self._check(jobs)
+
+    def test_failure(self):
+        for workers in 1, 2:
+            jobs = self._jobs('pipeline_failure_%d' % workers, 2)
+            jobs[0][1].insert(1, FailStage())
+            failed = run_pipeline(jobs, workers=workers)
+            self.assertEqual(failed, [(0, "stage failed")])
+            with open(jobs[0][1][0].path) as fin:
+                self.assertEqual(fin.read().split(), ['one'])
+            with open(jobs[1][1][0].path) as fin:
+                self.assertEqual(fin.read().split(), ['one', 'two'])
+
+    def test_abstract(self):
+        class NoRunStage(Stage):
+            pass
+        self.assertRaises(TypeError, NoRunStage)
+
+    def test_lost_stages(self):
+        for name, stage in ('pickle', UnpicklableStage()), ('killed', KillWorkerStage()):
+            jobs = self._jobs('pipeline_lost_%s' % name, 2)
+            jobs[0][1].insert(1, stage)
+            failed = run_pipeline(jobs, workers=2)
+            self.assertEqual([key for key, _ in failed], [0])
+            with open(jobs[1][1][0].path) as fin:
+                self.assertEqual(fin.read().split(), ['one', 'two'])
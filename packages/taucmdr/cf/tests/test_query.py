@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Unit tests for taucmdr.cf.query"""
+
+from taucmdr import tests
+from taucmdr.error import ConfigurationError
+from taucmdr.cf import query
+
+ATTRIBUTES = {'number': {'type': 'integer'},
+              'command': {'type': 'string'},
+              'begin_time': {'type': 'datetime'},
+              'data_size': {'type': 'integer'},
+              'wall_time': {'type': 'float'},
+              'experiment': {'model': 'Experiment'},
+              'trial_counter': {'type': 'integer', 'internal': True}}
+
+TRIALS = [{'number': 0, 'command': './lulesh -s 10', 'begin_time': '2025-12-31 23:59:59.5', 'data_size': 1024},
+          {'number': 1, 'command': './lulesh -s 20', 'begin_time': '2026-01-02 08:00:00.25', 'data_size': 4096},
+          {'number': 2, 'command': './amg', 'begin_time': '2026-01-03 08:00:00.75', 'wall_time': 1.5}]
+
+
+class QueryTest(tests.TestCase):
+    """Unit tests for taucmdr.cf.query"""
+
+    def _numbers(self, expression):
+        compiled = query.parse_query(expression, ATTRIBUTES)
+        return [trial['number'] for trial in TRIALS if compiled(trial)]
+
+    def test_compare(self):
+        self.assertEqual(self._numbers("number != 1"), [0, 2])
+        self.assertEqual(self._numbers("begin_time > 2026-01-01"), [1, 2])
+        self.assertEqual(self._numbers("begin_time <= '2026-01-02 08:00'"), [0])
+        self.assertEqual(self._numbers("data_size >= 4K"), [1])
+        self.assertEqual(self._numbers("command ~ 'lulesh.*20'"), [1])
+        self.assertEqual(self._numbers("command !~ lulesh"), [2])
+        self.assertEqual(self._numbers("wall_time < 2"), [2])
+
+    def test_combine(self):
+        self.assertEqual(self._numbers("number = 0 or number == 2"), [0, 2])
+        self.assertEqual(self._numbers("not (number = 0 or data_size > 2K) and command ~ '^\\./'"), [2])
+        self.assertEqual(self._numbers("command ~ lulesh AND NOT begin_time < 2026-01-01"), [1])
+
+    def test_fields(self):
+        compiled = query.parse_query("number < 3 and (command ~ a or not data_size = 0)", ATTRIBUTES)
+        self.assertEqual(compiled.fields, frozenset(['number', 'command', 'data_size']))
+
+    def test_bounds(self):
+        compiled = query.parse_query("number > 1 and number >= 1 and number < 9 and (number < 5 or number = 7)", 
+                                     ATTRIBUTES)
+        self.assertEqual(compiled.bounds('number'), ((1, False), (9, False)))
+        self.assertEqual(compiled.bounds('data_size'), (None, None))
+        compiled = query.parse_query("begin_time = 2026-01-01", ATTRIBUTES)
+        self.assertEqual(compiled.bounds('begin_time'), (('2026-01-01 00:00:00', True), ('2026-01-01 00:00:00', True)))
+        compiled = query.parse_query("number > 1 or number < 0", ATTRIBUTES)
+        self.assertEqual(compiled.bounds('number'), (None, None))
+
+    def test_invalid(self):
+        for expression in ('', 'number', 'number = ', 'number = x', 'size = 1', 'experiment = 1', 
+                           'trial_counter = 1',
+                           '(number = 1', 'number = 1)', 'number ! 1', "command ~ '('", 'begin_time > yesterday'):
+            self.assertRaises(ConfigurationError, query.parse_query, expression, ATTRIBUTES)
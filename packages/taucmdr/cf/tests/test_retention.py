@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Unit tests for taucmdr.cf.retention"""
+
+from taucmdr import tests
+from taucmdr.error import ConfigurationError
+from taucmdr.cf import retention
+from taucmdr.cf.retention import RetentionPolicy
+
+
+class RetentionTest(tests.TestCase):
+    """Unit tests for taucmdr.cf.retention"""
+
+    def test_parse_policy(self):
+        self.assertEqual(retention.parse_policy('size=1K, count=10,age=2h'), RetentionPolicy(1024, 10, 7200))
+        self.assertEqual(retention.parse_policy('age=30'), RetentionPolicy(None, None, 30 * 86400))
+        self.assertIsNone(retention.parse_policy('none'))
+        self.assertIsNone(retention.parse_policy(None))
+        for value in 'size=big', 'count=-1', 'age=3y', 'weight=1':
+            self.assertRaises(ConfigurationError, retention.parse_policy, value)
+
+    def test_select_evictions(self):
+        # (key, last used, created, size)
+        candidates = [('a', 50, 10, 100), ('b', 20, 20, 100), ('c', 40, 30, 100), ('d', 60, 40, 100)]
+        evict = retention.select_evictions
+        self.assertEqual(evict(candidates, RetentionPolicy(250, None, None), 100), ['b', 'c'])
+        self.assertEqual(evict(candidates, RetentionPolicy(None, 3, None), 100), ['b'])
+        self.assertEqual(evict(candidates, RetentionPolicy(None, None, 75), 100), ['b', 'a'])
+        self.assertEqual(evict(candidates, RetentionPolicy(None, 3, 75), 100), ['b', 'a'])
+        self.assertEqual(evict(candidates, RetentionPolicy(400, 4, 1000), 100), [])
+
+    def test_keep(self):
+        candidates = [('a', 10, 10, 100), ('b', 20, 20, 100), ('c', 30, 30, 100)]
+        evict = retention.select_evictions
+        self.assertEqual(evict(candidates, RetentionPolicy(100, None, None), 100, keep=['a']), ['b', 'c'])
+        self.assertEqual(evict(candidates, RetentionPolicy(None, None, 1), 100, keep=['a', 'c']), ['b'])
@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""TAU binary trace merger.
+
+TAU writes one binary trace ``tautrace.<node>.<context>.<thread>.trc`` per thread and one text event 
+definition file ``events.<node>.edf`` per node.  Each trace is a sequence of fixed-size records in the 
+byte order of the host that wrote it::
+
+    int32   event identifier, defined in the node's EDF file
+    uint16  node identifier
+    uint16  thread identifier
+    int64   event parameter
+    uint64  timestamp
+
+An EDF file has a header line followed by one line per event::
+
+    3 dynamic_trace_events
+    # FunctionId Group Tag "Name Type" Parameters
+    0 TAUEVENT 1 "Message size" TriggerValue
+    1 TAU_DEFAULT 0 "main()" EntryExit
+    60000 TRACER 0 "EV_INIT" none
+
+:any:`merge_traces` merges all traces into one trace ordered by timestamp and all EDF files into one 
+EDF file, replacing ``tau_treemerge.pl``.  Events are identified by their definition text, so an 
+event keeps its identifier unless another node already used that identifier for a different event.
+
+Traces are read through memory maps.  The merged trace is split into time ranges of roughly equal 
+record counts by sampling the input timestamps, and worker processes merge each time range from all 
+inputs directly into its place in the output file.  Within a time range, records are merged with a 
+heap keyed by timestamp and input order, and runs of records from one input are copied as blocks.  
+The result is the same as merging all inputs in one process.
+"""
+
+import os
+import re
+import sys
+import mmap
+import heapq
+import struct
+from taucmdr import logger
+from taucmdr.cf.trace import TraceFormatError
+from taucmdr.cf.profile.ingest import map_tasks, profile_workers
+
+
+LOGGER = logger.get_logger(__name__)
+
+TRACE_FILE_REGEX = re.compile(r'^tautrace\.(\d+)\.(\d+)\.(\d+)\.trc$')
+"""Regular expression matching per-thread TAU trace file names."""
+
+EDF_FILE_REGEX = re.compile(r'^events\.(\d+)\.edf$')
+"""Regular expression matching per-node TAU event definition file names."""
+
+MERGED_TRACE_FILE = 'tau.trc'
+"""str: Name of the merged trace file."""
+
+MERGED_EDF_FILE = 'tau.edf'
+"""str: Name of the merged event definition file."""
+
+RECORD_SIZE = 24
+"""int: Size in bytes of one trace record."""
+
+EV_INIT = 60000
+"""int: Identifier of the event that begins every TAU trace, used to detect the trace byte order."""
+
+MIN_PART_RECORDS = 1 << 18
+"""int: Minimum number of records merged by one worker task."""
+
+PARTS_PER_WORKER = 4
+"""int: Number of time ranges per worker process, to balance uneven ranges."""
+
+_SAMPLES_PER_TRACE = 16
+
+_WRITE_SIZE = 1 << 20
+
+_EDF_HEADER_REGEX = re.compile(r'^\s*(\d+)\s+dynamic_trace_events')
+
+
+def find_trace_files(path):
+    """Find per-thread TAU traces and per-node event definition files.
+    
+    Args:
+        path (str): Path to a directory containing ``tautrace.*.*.*.trc`` and ``events.*.edf`` files.
+        
+    Returns:
+        tuple: (traces, edfs) where `traces` is a list of (node, context, thread, path) tuples sorted 
+               by node, context, and thread and `edfs` is a dictionary mapping node numbers to paths.
+    """
+    traces = []
+    edfs = {}
+    for name in os.listdir(path):
+        match = TRACE_FILE_REGEX.match(name)
+        if match:
+            node, context, thread = (int(x) for x in match.groups())
+            traces.append((node, context, thread, os.path.join(path, name)))
+            continue
+        match = EDF_FILE_REGEX.match(name)
+        if match:
+            edfs[int(match.group(1))] = os.path.join(path, name)
+    traces.sort()
+    return traces, edfs
+
+
+class EventDefinitions(object):
+    """Event definitions merged from several EDF files.
+    
+    Attributes:
+        events (dict): Event definition text keyed by merged event identifier.
+    """
+
+    def __init__(self):
+        self.events = {}
+        self._ids = {}
+        self._next_id = 0
+
+    def add_file(self, path):
+        """Merge an EDF file's event definitions.
+        
+        Args:
+            path (str): Path to the EDF file.
+            
+        Returns:
+            dict: Merged identifiers keyed by the file's identifiers, for identifiers that changed.
+            
+        Raises:
+            TraceFormatError: The file could not be parsed.
+        """
+        remap = {}
+        with open(path) as fin:
+            header = fin.readline()
+            if not _EDF_HEADER_REGEX.match(header):
+                raise TraceFormatError("Invalid event definition header in '%s': %r" % (path, header[:80]))
+            for lineno, line in enumerate(fin, 2):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                eid, _, definition = line.partition(' ')
+                try:
+                    eid = int(eid)
+                except ValueError:
+                    raise TraceFormatError("Invalid event definition on line %d of '%s': %r" % 
+                                           (lineno, path, line[:80]))
+                definition = definition.strip()
+                gid = self._ids.get(definition)
+                if gid is None:
+                    gid = eid if eid not in self.events else self._next_id
+                    self.events[gid] = definition
+                    self._ids[definition] = gid
+                    self._next_id = max(self._next_id, gid + 1)
+                if gid != eid:
+                    remap[eid] = gid
+        return remap
+
+    def write(self, path):
+        """Write the merged event definitions to an EDF file.
+        
+        Args:
+            path (str): Path to the EDF file to create.
+        """
+        with open(path, 'w') as fout:
+            fout.write('%d dynamic_trace_events\n' % len(self.events))
+            fout.write('# FunctionId Group Tag "Name Type" Parameters\n')
+            for gid in sorted(self.events):
+                fout.write('%d %s\n' % (gid, self.events[gid]))
+
+
+def _byte_order(path, buf):
+    """Detect a trace's byte order from its first record."""
+    orders = [order for order in '<>' if struct.unpack_from(order + 'i', buf, 0)[0] == EV_INIT]
+    if len(orders) == 1:
+        return orders[0]
+    LOGGER.debug("Assuming native byte order for '%s'", path)
+    return '<' if sys.byteorder == 'little' else '>'
+
+
+class _Trace(object):
+    """A memory-mapped trace file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as fin:
+            size = os.fstat(fin.fileno()).st_size
+            if size % RECORD_SIZE:
+                raise TraceFormatError("Size of '%s' is not a multiple of the %d byte record size" % 
+                                       (path, RECORD_SIZE))
+            self.num_records = size // RECORD_SIZE
+            # Empty files can't be memory-mapped
+            self.buffer = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) if size else ''
+
+    def close(self):
+        """Unmap the trace file."""
+        if self.buffer:
+            self.buffer.close()
+
+    def timestamp(self, index, timestamp_struct):
+        """Get the timestamp of a record.
+        
+        Args:
+            index (int): Record number.
+            timestamp_struct (Struct): Unpacks a timestamp in the trace's byte order.
+            
+        Returns:
+            int: The timestamp.
+        """
+        return timestamp_struct.unpack_from(self.buffer, index * RECORD_SIZE + 16)[0]
+
+    def bisect(self, timestamp, timestamp_struct):
+        """Find the first record with a timestamp not less than `timestamp`.
+        
+        Args:
+            timestamp (int): Timestamp to search for.
+            timestamp_struct (Struct): Unpacks a timestamp in the trace's byte order.
+            
+        Returns:
+            int: Record number.
+        """
+        low, high = 0, self.num_records
+        while low < high:
+            mid = (low + high) // 2
+            if self.timestamp(mid, timestamp_struct) < timestamp:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+
+def _remap_events(block, remap, event_struct):
+    records = bytearray(block)
+    for pos in xrange(0, len(records), RECORD_SIZE):
+        gid = remap.get(event_struct.unpack_from(records, pos)[0])
+        if gid is not None:
+            event_struct.pack_into(records, pos, gid)
+    return str(records)
+
+
+def _merge_part(args):
+    """Merge one time range of all traces into its place in the merged trace.
+    
+    Args:
+        args (tuple): (dest, offset, order, inputs) where `dest` is the merged trace file, `offset` is 
+                      the byte offset of this time range in `dest`, `order` is the traces' byte order, 
+                      and `inputs` is a list of (path, start, stop, remap) tuples giving the range of 
+                      record numbers to merge from each trace and its event identifier map.
+    
+    Returns:
+        int: Number of records written.
+    """
+    dest, offset, order, inputs = args
+    timestamp_struct = struct.Struct(order + 'Q')
+    event_struct = struct.Struct(order + 'i')
+    traces = []
+    heap = []
+    try:
+        for path, start, stop, remap in inputs:
+            trace = _Trace(path)
+            traces.append((trace, stop * RECORD_SIZE, remap))
+            if start < stop:
+                heap.append((trace.timestamp(start, timestamp_struct), len(traces) - 1, start * RECORD_SIZE))
+        heapq.heapify(heap)
+        written = 0
+        with open(dest, 'r+b') as fout:
+            fout.seek(offset)
+            parts = []
+            buffered = 0
+            while heap:
+                _, idx, pos = heapq.heappop(heap)
+                trace, end, remap = traces[idx]
+                buf = trace.buffer
+                # Copy the run of records that precede the next record of any other trace
+                stop = pos + RECORD_SIZE
+                timestamp = None
+                limit = heap[0][:2] if heap else None
+                while stop < end:
+                    timestamp = timestamp_struct.unpack_from(buf, stop + 16)[0]
+                    if limit and (timestamp, idx) > limit:
+                        break
+                    stop += RECORD_SIZE
+                block = buf[pos:stop]
+                if remap:
+                    block = _remap_events(block, remap, event_struct)
+                parts.append(block)
+                buffered += len(block)
+                if stop < end:
+                    heapq.heappush(heap, (timestamp, idx, stop))
+                if buffered >= _WRITE_SIZE:
+                    fout.write(''.join(parts))
+                    written += buffered
+                    parts, buffered = [], 0
+            fout.write(''.join(parts))
+            written += buffered
+    finally:
+        for trace, _, _ in traces:
+            trace.close()
+    return written // RECORD_SIZE
+
+
+def _split_times(traces, parts, timestamp_struct):
+    """Choose timestamps that split the traces into time ranges with similar numbers of records."""
+    samples = []
+    for trace in traces:
+        count = min(trace.num_records, _SAMPLES_PER_TRACE)
+        weight = float(trace.num_records) / count if count else 0
+        for i in xrange(count):
+            samples.append((trace.timestamp(i * trace.num_records // count, timestamp_struct), weight))
+    samples.sort()
+    total = sum(weight for _, weight in samples)
+    splits = []
+    cumulative = 0.0
+    for timestamp, weight in samples:
+        cumulative += weight
+        if cumulative >= total * (len(splits) + 1) / parts:
+            if len(splits) == parts - 1:
+                break
+            if not splits or timestamp > splits[-1]:
+                splits.append(timestamp)
+    return splits
+
+
+def merge_traces(prefix, workers=None):
+    """Merge per-thread TAU traces into one trace and one event definition file.
+    
+    Writes :any:`MERGED_EDF_FILE` and then :any:`MERGED_TRACE_FILE` to `prefix`.
+    
+    Args:
+        prefix (str): Path to the directory containing ``tautrace.*.*.*.trc`` and ``events.*.edf`` files.
+        workers (int): Number of worker processes, see :any:`profile_workers`.
+        
+    Returns:
+        tuple: (trc, edf) paths to the merged files.
+        
+    Raises:
+        TraceFormatError: No traces found or a trace could not be parsed.
+    """
+    paths, edfs = find_trace_files(prefix)
+    if not paths:
+        raise TraceFormatError("No TAU traces found in '%s'" % prefix)
+    definitions = EventDefinitions()
+    remaps = {}
+    for node in sorted(edfs):
+        remaps[node] = definitions.add_file(edfs[node])
+    traces = []
+    try:
+        orders = set()
+        inputs = []
+        for node, _, _, path in paths:
+            if node not in remaps:
+                raise TraceFormatError("No event definitions for node %d in '%s'" % (node, prefix))
+            trace = _Trace(path)
+            traces.append(trace)
+            if trace.num_records:
+                orders.add(_byte_order(path, trace.buffer))
+                inputs.append((trace, remaps[node]))
+        if len(orders) > 1:
+            raise TraceFormatError("TAU traces in '%s' have different byte orders" % prefix)
+        order = orders.pop() if orders else '='
+        timestamp_struct = struct.Struct(order + 'Q')
+        total = sum(trace.num_records for trace, _ in inputs)
+        workers = profile_workers(workers)
+        parts = max(1, min(workers * PARTS_PER_WORKER, total // MIN_PART_RECORDS))
+        splits = _split_times([trace for trace, _ in inputs], parts, timestamp_struct)
+        bounds = [[0] + [trace.bisect(timestamp, timestamp_struct) for timestamp in splits] + 
+                  [trace.num_records] for trace, _ in inputs]
+    finally:
+        for trace in traces:
+            trace.close()
+    trc = os.path.join(prefix, MERGED_TRACE_FILE)
+    edf = os.path.join(prefix, MERGED_EDF_FILE)
+    tmp_trc = '%s.%d' % (trc, os.getpid())
+    with open(tmp_trc, 'wb') as fout:
+        fout.truncate(total * RECORD_SIZE)
+    try:
+        tasks = []
+        offset = 0
+        for part in xrange(len(splits) + 1):
+            part_inputs = [(trace.path, bound[part], bound[part+1], remap) 
+                           for (trace, remap), bound in zip(inputs, bounds)]
+            tasks.append((tmp_trc, offset, order, part_inputs))
+            offset += sum(stop - start for _, start, stop, _ in part_inputs) * RECORD_SIZE
+        workers = min(workers, len(tasks))
+        LOGGER.debug("Merging %d records from %d traces in %d parts with %d workers", 
+                     total, len(inputs), len(tasks), workers)
+        written = sum(map_tasks(_merge_part, tasks, workers))
+        if written != total:
+            raise TraceFormatError("Merged %d of %d trace records in '%s'" % (written, total, prefix))
+        # Rename the merged trace last so its presence means the merge is complete
+        definitions.write(edf)
+        os.rename(tmp_trc, trc)
+    except:
+        os.remove(tmp_trc)
+        raise
+    return trc, edf
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Test functions.
+
+Functions used for unit tests of tau_trace.py.
+"""
+
+import os
+import struct
+import random
+from taucmdr import tests
+from taucmdr.cf.trace import TraceFormatError
+from taucmdr.cf.trace import tau_trace
+from taucmdr.cf.trace.tau_trace import EV_INIT, RECORD_SIZE, merge_traces
+
+
+RECORD = struct.Struct('<iHHqQ')
+
+EDF_HEADER = '%d dynamic_trace_events\n# FunctionId Group Tag "Name Type" Parameters\n'
+
+
+def write_edf(path, events):
+    """Write a TAU event definition file for testing.
+    
+    Args:
+        path (str): Path to the new file.
+        events (list): (identifier, definition) tuples.
+    """
+    with open(path, 'w') as fout:
+        fout.write(EDF_HEADER % len(events))
+        for eid, definition in events:
+            fout.write('%d %s\n' % (eid, definition))
+
+
+def write_trace(path, records):
+    """Write a little-endian TAU binary trace for testing.
+    
+    Args:
+        path (str): Path to the new file.
+        records (list): (event, node, thread, parameter, timestamp) tuples.
+    """
+    with open(path, 'wb') as fout:
+        for record in records:
+            fout.write(RECORD.pack(*record))
+
+
+def read_trace(path):
+    """Read a little-endian TAU binary trace.
+    
+    Args:
+        path (str): Path to the trace file.
+        
+    Returns:
+        list: (event, node, thread, parameter, timestamp) tuples.
+    """
+    with open(path, 'rb') as fin:
+        data = fin.read()
+    return [RECORD.unpack_from(data, pos) for pos in xrange(0, len(data), RECORD_SIZE)]
+
+
+class TauTraceTest(tests.TestCase):
+    """Unit tests for the TAU trace merger."""
+
+    def _write_traces(self, name, num_nodes, num_records):
+        path = os.path.join(tests.get_test_workdir(), name)
+        os.makedirs(path)
+        rand = random.Random(num_nodes)
+        expected = []
+        for node in xrange(num_nodes):
+            # Every node defines 'main' with a different identifier
+            write_edf(os.path.join(path, 'events.%d.edf' % node), 
+                      [(node, 'TAU_DEFAULT 0 "main()" EntryExit'), (EV_INIT, 'TRACER 0 "EV_INIT" none')])
+            for thread in 0, 1:
+                timestamp = rand.randint(0, 100)
+                records = [(EV_INIT, node, thread, 0, timestamp)]
+                for i in xrange(num_records):
+                    timestamp += rand.randint(0, 3)
+                    records.append((node, node, thread, i, timestamp))
+                write_trace(os.path.join(path, 'tautrace.%d.0.%d.trc' % (node, thread)), records)
+                expected.extend((rec[4], node, thread, i) + rec for i, rec in enumerate(records))
+        expected.sort()
+        return path, [rec[4:] for rec in expected]
+
+    def _check_merge(self, name, num_nodes, num_records, workers):
+        path, expected = self._write_traces(name, num_nodes, num_records)
+        trc, edf = merge_traces(path, workers)
+        with open(edf) as fin:
+            self.assertEqual(fin.read(), EDF_HEADER % 2 + 
+                             '0 TAU_DEFAULT 0 "main()" EntryExit\n60000 TRACER 0 "EV_INIT" none\n')
+        # All nodes' 'main' events now have identifier 0
+        expected = [(0 if rec[0] != EV_INIT else EV_INIT,) + rec[1:] for rec in expected]
+        self.assertEqual(read_trace(trc), expected)
+
+    def test_merge(self):
+        self._check_merge('merge', 3, 100, 1)
+
+    def test_parallel_merge(self):
+        min_part_records = tau_trace.MIN_PART_RECORDS
+        tau_trace.MIN_PART_RECORDS = 100
+        try:
+            self._check_merge('parallel_merge', 4, 1000, 2)
+        finally:
+            tau_trace.MIN_PART_RECORDS = min_part_records
+
+    def test_invalid(self):
+        path = os.path.join(tests.get_test_workdir(), 'invalid_trace')
+        os.makedirs(path)
+        self.assertRaises(TraceFormatError, merge_traces, path)
+        write_trace(os.path.join(path, 'tautrace.0.0.0.trc'), [(EV_INIT, 0, 0, 0, 0)])
+        self.assertRaises(TraceFormatError, merge_traces, path)
+        write_edf(os.path.join(path, 'events.0.edf'), [(EV_INIT, 'TRACER 0 "EV_INIT" none')])
+        with open(os.path.join(path, 'tautrace.0.0.0.trc'), 'ab') as fout:
+            fout.write('\0')
+        self.assertRaises(TraceFormatError, merge_traces, path)
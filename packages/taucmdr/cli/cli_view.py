@@ -272,7 +272,7 @@ class ListCommand(AbstractCliView):
         header_row = [col['header'] for col in self.dashboard_columns]
         rows = [header_row]
         for record in records:
-            populated = record.populate()
+            populated = self._visible_attributes(record.populate())
             row = []
             for col in self.dashboard_columns:
                 if 'value' in col:
@@ -284,6 +284,8 @@ class ListCommand(AbstractCliView):
                     cell = 'Yes' if populated.get(col['yesno'], False) else 'No'
                 elif 'function' in col:
                     cell = col['function'](populated)
+                elif 'record_function' in col:
+                    cell = col['record_function'](record)
                 else:
                     raise InternalError("Invalid column definition: %s" % col)
                 row.append(cell)
@@ -293,6 +295,11 @@ class ListCommand(AbstractCliView):
         table.add_rows(rows)
         return [title, table.draw(), '']
     
+    def _visible_attributes(self, populated):
+        """Omit internal bookkeeping attributes, e.g. an experiment's trial listing, from populated record data."""
+        return {key: val for key, val in populated.iteritems() 
+                if not self.model.attributes.get(key, {}).get('internal', False)}
+
     def _format_long_item(self, key, val):
         attrs = self.model.attributes[key]
         if 'collection' in attrs:
@@ -339,7 +346,7 @@ class ListCommand(AbstractCliView):
         retval = [title]
         for record in records:
             rows = [['Attribute', 'Value', 'Command Flag', 'Description']]
-            populated = record.populate()
+            populated = self._visible_attributes(record.populate())
             for key, val in sorted(populated.iteritems()):
                 if key != self.model.key_attribute:
                     rows.append(self._format_long_item(key, val))
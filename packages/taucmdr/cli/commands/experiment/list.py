@@ -32,11 +32,14 @@ from taucmdr.cli.cli_view import ListCommand
 from taucmdr.model.experiment import Experiment
 
 def data_size(expr):
-    return util.human_size(sum(int(trial.get('data_size', 0)) for trial in expr['trials']))
+    size, physical_size = expr.trial_data_sizes()
+    if physical_size != size:
+        return '%s (%s stored)' % (util.human_size(size), util.human_size(physical_size))
+    return util.human_size(size)
 
 DASHBOARD_COLUMNS = [{'header': 'Name', 'value': 'name', 'align': 'r'},
                      {'header': 'Trials', 'function': lambda x: len(x['trials'])},
-                     {'header': 'Data Size', 'function': data_size},
+                     {'header': 'Data Size', 'record_function': data_size},
                      {'header': 'Target', 'function': lambda x: x['target']['name']},
                      {'header': 'Application', 'function': lambda x: x['application']['name']},
                      {'header': 'Measurement', 'function': lambda x: x['measurement']['name']},
@@ -32,7 +32,15 @@ Functions used for unit tests of list.py.
 
 
 from taucmdr import tests
+from taucmdr.cli.commands.experiment.list import COMMAND as LIST_COMMAND
 
-@tests.not_implemented
 class ListTest(tests.TestCase):
     """Tests for :any:`experiment.list`."""
+
+    def test_long(self):
+        self.reset_project_storage()
+        stdout, stderr = self.assertCommandReturnValue(0, LIST_COMMAND, ['-l'])
+        self.assertIn('proj1', stdout)
+        for attr in 'trial_counter', 'free_trial_numbers', 'trial_index', 'trial_listing':
+            self.assertNotIn(attr, stdout)
+        self.assertFalse(stderr)
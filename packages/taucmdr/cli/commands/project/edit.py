@@ -187,6 +187,9 @@ class ProjectEditCommand(EditCommand):
         updates['targets'] = list(targets)
         updates['applications'] = list(applications)
         updates['measurements'] = list(measurements)
+        for attr in 'dedup_trial_data', 'compress_trial_data', 'trial_retention':
+            if hasattr(args, attr):
+                updates[attr] = getattr(args, attr)
         
         try:
             force_tau_options = args.force_tau_options
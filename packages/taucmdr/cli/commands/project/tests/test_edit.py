@@ -32,6 +32,7 @@ Functions used for unit tests of edit.py.
 
 
 from taucmdr import tests
+from taucmdr.error import ConfigurationError
 from taucmdr.cli.commands.project import edit
 from taucmdr.model.project import Project
 
@@ -69,6 +70,22 @@ class EditTest(tests.TestCase):
         print proj1
         self.assertListEqual(proj1['force_tau_options'], [tau_options])
         
+    def test_dedup_trial_data(self):
+        self.reset_project_storage()
+        proj_ctrl = Project.controller()
+        self.assertFalse(proj_ctrl.one({'name': 'proj1'}).get('dedup_trial_data'))
+        self.assertCommandReturnValue(0, edit.COMMAND, ['proj1', '--dedup-trial-data', 'T'])
+        self.assertTrue(proj_ctrl.one({'name': 'proj1'})['dedup_trial_data'])
+
+    def test_trial_retention(self):
+        self.reset_project_storage()
+        proj_ctrl = Project.controller()
+        self.assertCommandReturnValue(0, edit.COMMAND, ['proj1', '--trial-retention', 'size=10G,count=100'])
+        self.assertEqual(proj_ctrl.one({'name': 'proj1'})['trial_retention'], 'size=10G,count=100')
+        argv = ['proj1', '--trial-retention', 'count=many']
+        self.assertRaises(ConfigurationError, self.exec_command, edit.COMMAND, argv)
+        self.assertEqual(proj_ctrl.one({'name': 'proj1'})['trial_retention'], 'size=10G,count=100')
+
     def test_wrongname(self):
         self.reset_project_storage()
         argv = ['proj2', '--new-name', 'proj3']
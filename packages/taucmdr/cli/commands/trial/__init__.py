@@ -40,12 +40,64 @@ execution command - that is: `tau ./a.out` or `tau mpirun -np # ./a.out <args>`.
 The binary a.out will be executed and the TAU Commander specified data 
 will be collected.  This completes data collection to form a trial. 
  
+Repeat a trial: `tau trial create --repeat <count> [--jobs <count>] ./a.out <args>`
+performs several trials of the selected experiment.  Trial numbers are 
+reserved up front and, with `--jobs`, up to that many trials run at the 
+same time.  The output of each concurrent trial is written to a file in 
+that trial's data directory.
+
+Monitor a trial: `tau trial create --monitor ./a.out <args>` reports the
+number of files and bytes the trial has written, the data rate, and the 
+projected final data size while the trial runs.  `--max-data-size <size>`
+(e.g. 10G) stops a trial whose data grows larger than <size>.
+
+Summarize a trial: `tau trial summary [<trial_number>] [--metric <metric>]`
+shows the mean, minimum, maximum, standard deviation, and imbalance of 
+each function's exclusive time across all threads without starting a 
+graphical tool.  Profiles are read by `--workers <count>` processes, by 
+default the value of __TAUCMDR_PROFILE_WORKERS__ or the number of cores.
+
+Compare trials: `tau trial compare <trial> <trial> [<trial>...]` aligns 
+functions across trials and shows each function's change from the first 
+trial.  Trials in other experiments are given as <experiment>:<number>.
+Functions that appear or disappear between trials are flagged.
+
 Delete a trial: `tau trial delete <trial_number>` 
+
+Select trials: `tau trial list`, `tau trial export`, and `tau trial delete`
+accept `--where <expression>` to operate on every trial matching a filter
+expression, e.g. `--where "return_code != 0 and begin_time > 2026-01-01
+and command ~ 'lulesh'"`.  Comparisons (=, !=, <, <=, >, >=, and ~ or !~ 
+for regular expressions) are combined with and, or, not, and parentheses.  
+Sizes may have units, e.g. `data_size > 1G`, and times are in UTC.
+
+Limit trial data: `tau project edit <project_name> --trial-retention 
+size=10G,count=100,age=30d` bounds the total size, the number of trials with 
+data, and the age of the trial data of each experiment.  `tau experiment edit 
+<experiment_name> --trial-retention <limit>[,<limit>...]` sets the limits of 
+a single experiment.  After each trial, and when running 
+`tau trial gc [--dry-run]`, the data of the least recently used trials is 
+evicted until the limits are met.  Evicted trials are still listed.
  
 Edit a trial: `tau trial edit <trial_number> --description <free form text>` 
  
 Export a trial: `tau trial export <trial_number> [optional arg]` 
-Optional argument is:  `--destination <path>` 
+Optional arguments are:  `--destination <path>` and `--threads <count>`, 
+the number of threads that compress exported archives.  The default is 
+the value of __TAUCMDR_GZIP_THREADS__ or the number of cores.
+
+Post-process trials: `tau trial postprocess [<trial_number>...] [--jobs <count>]`
+merges and converts trace data ahead of time.  Trial numbers may be 
+ranges, e.g. `tau trial postprocess 1-200 --jobs 8` processes up to 8 
+trials at the same time.  `tau trial export` accepts the same ranges and 
+`--jobs` option.  Completed steps are not repeated, so an interrupted 
+post-processing or export command can simply be run again.
+
+Compress trial data: `tau project edit <project> --compress-trial-data gzip:6`
+compresses the profiles of each completed trial in the background with 
+the given codec (gzip or bz2) and level (1-9).  Summaries and exports 
+read compressed profiles directly.  `tau trial show` decompresses copies 
+of them into a temporary directory for the graphical tools.
  
 Viewing data for a trial: Enter `tau trial show` or `tau show` and 
 TAU Commander will open up the appropriate display window to 
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""``trial compare`` subcommand."""
+
+from taucmdr import EXIT_SUCCESS
+from taucmdr import util
+from taucmdr.cli import arguments
+from taucmdr.cli.command import AbstractCommand
+from taucmdr.cli.commands.trial.summary import draw_function_table
+from taucmdr.model.project import Project
+from taucmdr.model.experiment import Experiment
+from taucmdr.cf.profile.compare import compare
+
+
+STATISTICS = ('mean', 'total', 'maximum')
+
+
+class TrialCompareCommand(AbstractCommand):
+    """``trial compare`` subcommand."""
+
+    def _construct_parser(self):
+        usage = "%s <trial> <trial> [<trial>...] [arguments]" % self.command
+        parser = arguments.get_parser(prog=self.command, usage=usage, description=self.summary)
+        parser.add_argument('trials',
+                            help=("Trials to compare given as trial numbers in the selected experiment or "
+                                  "as <experiment>:<trial_number>.  The first trial is the baseline."),
+                            metavar='<trial>',
+                            nargs='+')
+        parser.add_argument('--metric',
+                            help="compare this metric instead of TIME",
+                            metavar='<metric>',
+                            default=arguments.SUPPRESS)
+        parser.add_argument('--inclusive',
+                            help="compare inclusive instead of exclusive values",
+                            const=True, action='store_const', default=False)
+        parser.add_argument('--statistic',
+                            help="compare this per-function statistic across threads",
+                            choices=STATISTICS,
+                            default='mean')
+        parser.add_argument('--limit',
+                            help="show only the first <count> functions, or all functions if <count> is 0",
+                            metavar='<count>',
+                            type=int,
+                            default=20)
+        parser.add_argument('--workers',
+                            help="read profiles with <count> worker processes",
+                            metavar='<count>',
+                            type=int,
+                            default=arguments.SUPPRESS)
+        return parser
+
+    def _parse_trial(self, spec):
+        expr_name, _, number = spec.rpartition(':')
+        try:
+            number = int(number)
+        except ValueError:
+            self.parser.error("Invalid trial: %s" % spec)
+        return expr_name, number
+
+    def _find_trial(self, expr_name, number):
+        proj = Project.selected()
+        if expr_name:
+            # Experiment names are only unique within a project
+            expr = Experiment.controller().one({'name': expr_name, 'project': proj.eid})
+            if not expr:
+                self.parser.error("No experiment named '%s' in project '%s'" % (expr_name, proj['name']))
+        else:
+            expr = proj.experiment()
+        return '%s:%d' % (expr['name'], number), expr.trials([number])[0]
+
+    @staticmethod
+    def _aggregates(trials, metrics, workers, inclusive):
+        for _, trial in trials:
+            aggregate, names = trial.aggregate_profiles(metrics[-1], workers, inclusive)
+            # Compare the same metric in every trial
+            metrics.append(aggregate.metric)
+            yield aggregate, names
+
+    def main(self, argv):
+        args = self._parse_args(argv)
+        if len(args.trials) < 2:
+            self.parser.error("At least two trials are required")
+        if args.limit < 0:
+            self.parser.error("Invalid function count: %s" % args.limit)
+        workers = getattr(args, 'workers', None)
+        if workers is not None and workers < 1:
+            self.parser.error("Invalid worker count: %s" % workers)
+        specs = [self._parse_trial(spec) for spec in args.trials]
+        trials = [self._find_trial(expr_name, number) for expr_name, number in specs]
+        metrics = [getattr(args, 'metric', None)]
+        aggregates = self._aggregates(trials, metrics, workers, args.inclusive)
+        comparisons = sorted(compare(aggregates, args.statistic),
+                             key=lambda cmp: max(abs(delta) for delta in cmp.deltas), reverse=True)
+        labels = [label for label, _ in trials]
+        header = ['Function', 'Status', labels[0]]
+        for label in labels[1:]:
+            header.extend([label, 'Delta', 'Delta %'])
+        rows = [header]
+        for cmp in comparisons[:args.limit] if args.limit else comparisons:
+            row = [cmp.name, cmp.status, '-' if cmp.values[0] is None else '%.4G' % cmp.values[0]]
+            for value, delta, relative in zip(cmp.values[1:], cmp.deltas, cmp.relative):
+                row.extend(['-' if value is None else '%.4G' % value,
+                            '%+.4G' % delta,
+                            '-' if relative is None else '%+.1f%%' % (relative * 100)])
+            rows.append(row)
+        title = "%s %s %s compared to %s" % (args.statistic.capitalize(),
+                                             'inclusive' if args.inclusive else 'exclusive',
+                                             metrics[-1], labels[0])
+        parts = [util.hline(title, 'cyan'), draw_function_table(rows), '']
+        if args.limit and len(comparisons) > args.limit:
+            parts.extend(["Showing %d of %d functions.  Use `--limit 0` to show all functions." %
+                          (args.limit, len(comparisons)), ''])
+        print '\n'.join(parts)
+        return EXIT_SUCCESS
+
+
+COMMAND = TrialCompareCommand(__name__, summary_fmt="Compare profile data from two or more trials.")
@@ -53,6 +53,24 @@ class TrialCreateCommand(CreateCommand):
         usage = "%s [arguments] [--] <command> [command_arguments]" % self.command
         parser = arguments.get_parser_from_model(Trial, prog=self.command, usage=usage, description=self.summary,
                                                  positional_primary_key=False)
+        parser.add_argument('--repeat',
+                            help="number of trials to perform",
+                            metavar='<count>',
+                            type=int,
+                            default=1)
+        parser.add_argument('--jobs',
+                            help="maximum number of trials to perform at the same time",
+                            metavar='<count>',
+                            type=int,
+                            default=1)
+        parser.add_argument('--monitor',
+                            help="report the rate at which each trial writes performance data while it runs",
+                            action='store_true',
+                            default=False)
+        parser.add_argument('--max-data-size',
+                            help="stop trials whose performance data exceeds <size>, e.g. 10G (implies --monitor)",
+                            metavar='<size>',
+                            default=arguments.SUPPRESS)
         parser.add_argument('cmd',
                             help="Executable command, e.g. './a.out'",
                             metavar='<command>')
@@ -65,11 +83,25 @@ class TrialCreateCommand(CreateCommand):
     def main(self, argv):
         args = self._parse_args(argv)
         description = getattr(args, 'description', None)
+        if args.repeat < 1:
+            self.parser.error("Invalid repeat count: %s" % args.repeat)
+        if args.jobs < 1:
+            self.parser.error("Invalid job count: %s" % args.jobs)
+        max_data_size = getattr(args, 'max_data_size', None)
+        if max_data_size is not None:
+            try:
+                max_data_size = util.parse_size(max_data_size)
+                if max_data_size < 1:
+                    raise ValueError
+            except ValueError:
+                self.parser.error("Invalid data size: %s" % max_data_size)
         cmd = [args.cmd] + args.cmd_args
         launcher_cmd, application_cmds = Trial.parse_launcher_cmd(cmd)
         self.logger.debug("Launcher command: %s", launcher_cmd)
         self.logger.debug("Application commands: %s", application_cmds)
-        return Project.selected().experiment().managed_run(launcher_cmd, application_cmds, description)
+        return Project.selected().experiment().managed_run(launcher_cmd, application_cmds, description,
+                                                           repeat=args.repeat, jobs=args.jobs, 
+                                                           monitor=args.monitor, max_data_size=max_data_size)
 
 
 COMMAND = TrialCreateCommand(Trial, __name__, summary_fmt="Create new trial of the selected experiment.")
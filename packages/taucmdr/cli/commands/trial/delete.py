@@ -30,6 +30,7 @@
 from taucmdr import EXIT_SUCCESS
 from taucmdr.cli import arguments
 from taucmdr.cli.cli_view import DeleteCommand
+from taucmdr.cf import query
 from taucmdr.model.trial import Trial
 from taucmdr.model.project import Project
 
@@ -38,11 +39,17 @@ class TrialDeleteCommand(DeleteCommand):
     """``trial delete`` subcommand."""
 
     def _construct_parser(self):
-        usage = "%s <trial_number> [arguments]" % self.command
+        usage = "%s [<trial_number>] [arguments]" % self.command
         parser = arguments.get_parser(prog=self.command, usage=usage, description=self.summary)
         parser.add_argument('number', 
                             help="Number of the trial to delete",
-                            metavar='<trial_number>')
+                            metavar='<trial_number>',
+                            nargs='?',
+                            default=None)
+        parser.add_argument('--where',
+                            help="delete all trials matching a filter expression, e.g. \"return_code != 0\"",
+                            metavar='<expression>',
+                            default=arguments.SUPPRESS)
         return parser
 
     def main(self, argv):
@@ -51,10 +58,18 @@ class TrialDeleteCommand(DeleteCommand):
         trial_ctrl = Trial.controller(proj_ctrl.storage)
         proj = proj_ctrl.selected()
         expr = proj.experiment()
+        where = getattr(args, 'where', None)
+        if args.number is None and not where:
+            self.parser.error("Give a trial number or a filter expression with --where")
         try:
-            number = int(args.number)
+            number = int(args.number) if args.number is not None else None
         except ValueError:
             self.parser.error("Invalid trial number: %s" % args.number)
+        if where:
+            trials = expr.trials([number] if number is not None else None, query.parse_query(where, Trial.attributes))
+            trial_ctrl.delete([trial.eid for trial in trials])
+            self.logger.info('Deleted %d trials: %s', len(trials), ', '.join(str(trial['number']) for trial in trials))
+            return EXIT_SUCCESS
         fields = {'experiment': expr.eid, 'number': number}
         if not trial_ctrl.exists(fields):
             self.parser.error("No trial number %s in the current experiment.  "
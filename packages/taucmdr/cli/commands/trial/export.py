@@ -28,10 +28,12 @@
 """``trial export`` subcommand."""
 
 import os
-from taucmdr import EXIT_SUCCESS
+from taucmdr import EXIT_SUCCESS, util
 from taucmdr.cli import arguments
 from taucmdr.cli.command import AbstractCommand
+from taucmdr.cf import query
 from taucmdr.model.project import Project
+from taucmdr.model.trial import Trial
 
 
 class TrialExportCommand(AbstractCommand):
@@ -45,23 +47,41 @@ class TrialExportCommand(AbstractCommand):
                             metavar='<path>',
                             default=os.getcwd())
         parser.add_argument('trial_numbers', 
-                            help="show details for specified trials",
+                            help="export specified trials or ranges of trials, e.g. 1-200",
                             metavar='trial_number',
                             nargs='*',
                             default=arguments.SUPPRESS)
+        parser.add_argument('--jobs',
+                            help="post-process and export up to <count> trials at the same time",
+                            metavar='<count>',
+                            type=int,
+                            default=1)
+        parser.add_argument('--threads',
+                            help="compress exported archives with <count> threads",
+                            metavar='<count>',
+                            type=int,
+                            default=arguments.SUPPRESS)
+        parser.add_argument('--where',
+                            help="export all trials matching a filter expression, e.g. \"return_code == 0\"",
+                            metavar='<expression>',
+                            default=arguments.SUPPRESS)
         return parser
 
     def main(self, argv):
         args = self._parse_args(argv)
-        trial_numbers = []
-        for num in getattr(args, 'trial_numbers', []):
-            try:
-                trial_numbers.append(int(num))
-            except ValueError:
-                self.parser.error("Invalid trial number: %s" % num)
+        try:
+            trial_numbers = util.parse_number_ranges(getattr(args, 'trial_numbers', []))
+        except ValueError as err:
+            self.parser.error("Invalid trial number: %s" % err)
+        if args.jobs < 1:
+            self.parser.error("Invalid job count: %s" % args.jobs)
+        threads = getattr(args, 'threads', None)
+        if threads is not None and threads < 1:
+            self.parser.error("Invalid thread count: %s" % threads)
+        where = getattr(args, 'where', None)
         expr = Project.selected().experiment()
-        for trial in expr.trials(trial_numbers):
-            trial.export(args.destination)
+        trials = expr.trials(trial_numbers, query.parse_query(where, Trial.attributes) if where else None)
+        Trial.controller(expr.storage).postprocess(trials, args.destination, args.jobs, threads)
         return EXIT_SUCCESS
 
 
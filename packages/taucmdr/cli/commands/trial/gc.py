@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""``trial gc`` subcommand."""
+
+from taucmdr import EXIT_SUCCESS, util
+from taucmdr.error import ConfigurationError
+from taucmdr.cli import arguments
+from taucmdr.cli.command import AbstractCommand
+from taucmdr.cf import retention
+from taucmdr.cf.storage.levels import PROJECT_STORAGE
+from taucmdr.model.project import Project
+from taucmdr.model.trial import Trial
+
+
+class TrialGcCommand(AbstractCommand):
+    """``trial gc`` subcommand."""
+    
+    def _construct_parser(self):
+        usage = "%s [arguments]" % self.command
+        parser = arguments.get_parser(prog=self.command, usage=usage, description=self.summary)
+        parser.add_argument('--trial-retention',
+                            help=("evict trial data to stay within these limits instead of the selected "
+                                  "experiment's retention policy, e.g. size=10G,count=100,age=30d"),
+                            metavar='<limit>[,<limit>...]',
+                            default=arguments.SUPPRESS)
+        parser.add_argument('--dry-run',
+                            help="show the trials whose data would be evicted but do not evict it",
+                            action='store_true',
+                            default=False)
+        return parser
+
+    def main(self, argv):
+        args = self._parse_args(argv)
+        try:
+            policy = retention.parse_policy(getattr(args, 'trial_retention', None))
+        except ConfigurationError as err:
+            self.parser.error(err.value)
+        expr = Project.selected().experiment()
+        if policy is None:
+            policy = expr.retention_policy()
+        if policy is None:
+            raise ConfigurationError("Experiment '%s' has no trial retention policy" % expr['name'],
+                                     "Use `tau experiment edit %s --trial-retention <limits>` or "
+                                     "`tau project edit %s --trial-retention <limits>` to set one." % 
+                                     (expr['name'], expr.populate('project')['name']),
+                                     "Use `tau trial gc --trial-retention <limits>` to evict data once.")
+        ctrl = Trial.controller(expr.storage)
+        with PROJECT_STORAGE.lock():
+            evicted = ctrl.collect_garbage(expr, policy, dry_run=args.dry_run)
+        size = sum(trial['data_size'] for trial in evicted)
+        if args.dry_run:
+            self.logger.info("Would evict %s of data from %d trials: %s", util.human_size(size), len(evicted),
+                             ', '.join(str(trial['number']) for trial in evicted) or 'none')
+        else:
+            self.logger.info("Evicted %s of data from %d trials", util.human_size(size), len(evicted))
+        return EXIT_SUCCESS
+
+
+COMMAND = TrialGcCommand(__name__, summary_fmt="Evict the data of least recently used trials.")
@@ -30,13 +30,35 @@
 from texttable import Texttable
 from taucmdr import util, logger
 from taucmdr.error import InternalError
+from taucmdr.cli import arguments
 from taucmdr.cli.cli_view import ListCommand
+from taucmdr.cf import query
 from taucmdr.model.project import Project
 from taucmdr.model.trial import Trial
 
 
+def data_size(trial):
+    size = util.human_size(trial.get('data_size', None))
+    physical_size = trial.get('physical_size', None)
+    if physical_size is not None and physical_size != trial.get('data_size', None):
+        size += ' (%s stored)' % util.human_size(physical_size)
+    return size
+
+def run_time(trial):
+    wall = trial.get('wall_time', None)
+    if wall is None:
+        return 'N/A'
+    cpu = trial.get('user_time', 0) + trial.get('system_time', 0)
+    return '%s (%s CPU)' % (util.human_duration(wall), util.human_duration(cpu))
+
+def max_rss(trial):
+    rss = trial.get('max_rss', None)
+    return util.human_size(rss) if rss is not None else 'N/A'
+
 DASHBOARD_COLUMNS = [{'header': 'Number', 'value': 'number'},
-                     {'header': 'Data Size', 'function': lambda x: util.human_size(x.get('data_size', None))},
+                     {'header': 'Data Size', 'function': data_size},
+                     {'header': 'Run Time', 'function': run_time},
+                     {'header': 'Peak RSS', 'function': max_rss},
                      {'header': 'Command', 'value': 'command'},
                      {'header': 'Description', 'value': 'description'},
                      {'header': 'Status', 'value': 'phase'}]
@@ -44,13 +66,67 @@ DASHBOARD_COLUMNS = [{'header': 'Number', 'value': 'number'},
 class TrialListCommand(ListCommand):
     """``trial list`` subcommand."""
     
+    def __init__(self, *args, **kwargs):
+        super(TrialListCommand, self).__init__(*args, **kwargs)
+        self._last = None
+        self._style = None
+        self._experiment = None
+        self._storage = None
+        self._query = None
+
+    def _construct_parser(self):
+        parser = super(TrialListCommand, self)._construct_parser()
+        parser.add_argument('--last',
+                            help="show only the most recent trials",
+                            metavar='<count>',
+                            type=int,
+                            default=arguments.SUPPRESS)
+        parser.add_argument('--where',
+                            help="show only trials matching a filter expression, e.g. \"return_code != 0\"",
+                            metavar='<expression>',
+                            default=arguments.SUPPRESS)
+        return parser
+
+    def _select(self, trials, keys):
+        """Select trials by number, or the most recent trials, from trials ordered by begin time."""
+        if keys:
+            by_number = dict((trial['number'], trial) for trial in trials)
+            if self._query is None:
+                for key in keys:
+                    if key not in by_number:
+                        self.parser.error("No trial with number='%s'" % key)
+            return [by_number[key] for key in keys if key in by_number]
+        if self._last:
+            return trials[-self._last:]
+        return sorted(trials, key=lambda trial: trial['number'])
+
+    def _retrieve_listing(self, expr, keys):
+        """Get the selected experiment's trials from its trial listing rather than the trial records.
+        
+        Returns:
+            list: :any:`Trial.listing_row` entries.
+        """
+        listing = expr.trial_listing()
+        if self._query is not None:
+            rows = [listing[eid] for eid in expr.find_trials(self._query)]
+        else:
+            rows = sorted(listing.itervalues(), key=lambda row: row.get('begin_time'))
+        return self._select(rows, keys)
+
     def _retrieve_records(self, ctrl, keys):
         if keys:
             try:
                 keys = [int(key) for key in keys]
             except ValueError:
                 self.parser.error("Invalid trial number '%s'.  Trial numbers are positive integers starting from 0.")
-        expr = Project.selected().experiment()
+        expr = self._experiment
+        self._storage = ctrl.storage
+        if ctrl.storage is expr.storage and self._style in ('dashboard', 'short'):
+            return self._retrieve_listing(expr, keys)
+        if self._query is not None and ctrl.storage is expr.storage:
+            return self._select(ctrl.search(expr.find_trials(self._query)), keys)
+        if self._last and not keys and ctrl.storage is expr.storage:
+            return list(reversed(expr.latest_trials(self._last)))
         records = super(TrialListCommand, self)._retrieve_records(ctrl, keys)
         return [rec for rec in records if rec['experiment'] == expr.eid]
 
@@ -64,25 +140,24 @@ class TrialListCommand(ListCommand):
             str: Record data in dashboard format.
         """
         self.logger.debug("Dashboard format")
-        title = util.hline(self.title_fmt % {'model_name': records[0].name.capitalize(),
-                                             'storage_path': records[0].storage}, 'cyan')
-        expr = Project.selected().experiment()
-        subtitle = util.color_text("Selected experiment: ", 'cyan') + expr['name']
+        title = util.hline(self.title_fmt % {'model_name': self.model.name.capitalize(),
+                                             'storage_path': self._storage}, 'cyan')
+        subtitle = util.color_text("Selected experiment: ", 'cyan') + self._experiment['name']
         header_row = [col['header'] for col in self.dashboard_columns]
         rows = [header_row]
+        # Records may be trial listing entries rather than modeled records, see _retrieve_listing
         for record in records:
-            populated = record.populate()
             row = []
             for col in self.dashboard_columns:
                 if 'value' in col:
                     try:
-                        cell = populated[col['value']]
+                        cell = record[col['value']]
                     except KeyError:
                         cell = 'N/A'
                 elif 'yesno' in col:
-                    cell = 'Yes' if populated.get(col['yesno'], False) else 'No'
+                    cell = 'Yes' if record.get(col['yesno'], False) else 'No'
                 elif 'function' in col:
-                    cell = col['function'](populated)
+                    cell = col['function'](record)
                 else:
                     raise InternalError("Invalid column definition: %s" % col)
                 row.append(cell)
@@ -92,5 +167,19 @@ class TrialListCommand(ListCommand):
         table.add_rows(rows)
         return [title, table.draw(), '', subtitle, '']
 
+    def main(self, argv):
+        args = self._parse_args(argv)
+        self._last = getattr(args, 'last', None)
+        if self._last is not None and self._last < 1:
+            self.parser.error("Invalid trial count: %s" % self._last)
+        keys = getattr(args, 'keys', None)
+        style = getattr(args, 'style', None) or self.default_style
+        self._style = style
+        self._experiment = Project.selected().experiment()
+        where = getattr(args, 'where', None)
+        self._query = query.parse_query(where, Trial.attributes) if where else None
+        storage_levels = arguments.parse_storage_flag(args)
+        return self._list_records(storage_levels, keys, style)
+
 COMMAND = TrialListCommand(Trial, __name__, dashboard_columns=DASHBOARD_COLUMNS,
                            summary_fmt="Show trial data.")
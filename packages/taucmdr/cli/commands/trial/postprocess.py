@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""``trial postprocess`` subcommand."""
+
+from taucmdr import EXIT_SUCCESS, util
+from taucmdr.cli import arguments
+from taucmdr.cli.command import AbstractCommand
+from taucmdr.cf.storage.levels import PROJECT_STORAGE
+from taucmdr.model.project import Project
+from taucmdr.model.trial import Trial
+
+
+class TrialPostprocessCommand(AbstractCommand):
+    """``trial postprocess`` subcommand."""
+    
+    def _construct_parser(self):
+        usage = "%s [trial_number...] [arguments]" % self.command
+        parser = arguments.get_parser(prog=self.command, usage=usage, description=self.summary)
+        parser.add_argument('trial_numbers', 
+                            help="post-process specified trials or ranges of trials, e.g. 1-200",
+                            metavar='trial_number',
+                            nargs='*',
+                            default=arguments.SUPPRESS)
+        parser.add_argument('--jobs',
+                            help="post-process up to <count> trials at the same time",
+                            metavar='<count>',
+                            type=int,
+                            default=1)
+        return parser
+
+    def main(self, argv):
+        args = self._parse_args(argv)
+        try:
+            trial_numbers = util.parse_number_ranges(getattr(args, 'trial_numbers', []))
+        except ValueError as err:
+            self.parser.error("Invalid trial number: %s" % err)
+        if args.jobs < 1:
+            self.parser.error("Invalid job count: %s" % args.jobs)
+        # Usually runs in the background while other processes are changing the project
+        with PROJECT_STORAGE.lock():
+            expr = Project.selected().experiment()
+            trials = expr.trials(trial_numbers)
+        Trial.controller(expr.storage).postprocess(trials, jobs=args.jobs)
+        return EXIT_SUCCESS
+
+
+COMMAND = TrialPostprocessCommand(__name__, summary_fmt="Post-process trial data, e.g. merge and convert traces.")
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""``trial summary`` subcommand."""
+
+from texttable import Texttable
+from taucmdr import EXIT_SUCCESS
+from taucmdr import logger, util
+from taucmdr.cli import arguments
+from taucmdr.cli.command import AbstractCommand
+from taucmdr.model.project import Project
+
+
+def draw_function_table(rows):
+    """Draw a table of per-function values.
+    
+    The first column holds function names and is given whatever width the other columns leave.
+    
+    Args:
+        rows (list): Rows of strings.  The first row is the header.
+        
+    Returns:
+        str: The table.
+    """
+    table = Texttable(logger.LINE_WIDTH)
+    table.set_cols_dtype(['t'] * len(rows[0]))
+    table.set_cols_align(['l'] + ['r'] * (len(rows[0]) - 1))
+    widths = [max(len(row[col]) for row in rows) for col in xrange(1, len(rows[0]))]
+    name_width = max(logger.LINE_WIDTH - sum(widths) - 3 * len(widths) - 1, 20)
+    table.set_cols_width([name_width] + widths)
+    table.set_deco(Texttable.HEADER | Texttable.VLINES)
+    table.add_rows(rows)
+    return table.draw()
+
+
+class TrialSummaryCommand(AbstractCommand):
+    """``trial summary`` subcommand."""
+
+    def _construct_parser(self):
+        usage = "%s [trial_number...] [arguments]" % self.command
+        parser = arguments.get_parser(prog=self.command, usage=usage, description=self.summary)
+        parser.add_argument('trial_numbers',
+                            help="Summarize data from trials",
+                            metavar='<trial_number>',
+                            nargs='*',
+                            default=arguments.SUPPRESS)
+        parser.add_argument('--metric',
+                            help="summarize this metric instead of TIME",
+                            metavar='<metric>',
+                            default=arguments.SUPPRESS)
+        parser.add_argument('--inclusive',
+                            help="summarize inclusive instead of exclusive values",
+                            const=True, action='store_const', default=False)
+        parser.add_argument('--limit',
+                            help="show only the first <count> functions, or all functions if <count> is 0",
+                            metavar='<count>',
+                            type=int,
+                            default=20)
+        parser.add_argument('--workers',
+                            help="read profiles with <count> worker processes",
+                            metavar='<count>',
+                            type=int,
+                            default=arguments.SUPPRESS)
+        return parser
+
+    def _format_summary(self, trial, limit, metric, workers, inclusive):
+        aggregate, names = trial.aggregate_profiles(metric, workers, inclusive)
+        summaries = aggregate.summarize(names)
+        title = ("Trial %s: %s %s across %d threads" % 
+                 (trial['number'], 'inclusive' if inclusive else 'exclusive', aggregate.metric, aggregate.num_threads))
+        rows = [['Function', 'Threads', 'Total', 'Mean', 'Min', 'Max', 'Std. Dev.', 'Imbalance']]
+        for summary in summaries[:limit] if limit else summaries:
+            rows.append([summary.name, str(summary.threads)] + 
+                        ['%.4G' % val for val in (summary.total, summary.mean, summary.minimum, 
+                                                  summary.maximum, summary.stddev)] +
+                        ['%.1f%%' % (summary.imbalance * 100)])
+        parts = [util.hline(title, 'cyan'), draw_function_table(rows), '']
+        if limit and len(summaries) > limit:
+            parts.extend(["Showing %d of %d functions.  Use `--limit 0` to show all functions." % 
+                          (limit, len(summaries)), ''])
+        return parts
+
+    def main(self, argv):
+        args = self._parse_args(argv)
+        if args.limit < 0:
+            self.parser.error("Invalid function count: %s" % args.limit)
+        workers = getattr(args, 'workers', None)
+        if workers is not None and workers < 1:
+            self.parser.error("Invalid worker count: %s" % workers)
+        trial_numbers = []
+        for num in getattr(args, 'trial_numbers', []):
+            try:
+                trial_numbers.append(int(num))
+            except ValueError:
+                self.parser.error("Invalid trial number: %s" % num)
+        expr = Project.selected().experiment()
+        parts = []
+        for trial in expr.trials(trial_numbers):
+            parts.extend(self._format_summary(trial, args.limit, getattr(args, 'metric', None), workers, 
+                                              args.inclusive))
+        print '\n'.join(parts)
+        return EXIT_SUCCESS
+
+
+COMMAND = TrialSummaryCommand(__name__, summary_fmt="Summarize trial profile data across threads.")
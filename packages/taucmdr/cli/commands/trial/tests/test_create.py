@@ -84,3 +84,31 @@ class CreateTest(tests.TestCase):
         self.assertManagedBuild(0, CC, [], 'hello.c')
         stdout, stderr = self.assertCommandReturnValue(0, create_cmd, ['./a.out'])
         self.assertIn("TAU_METRICS=TIME,", stdout)
+
+    @tests.skipIf(HOST_ARCH.is_bluegene(), "Test skipped on BlueGene")
+    def test_create_repeat_jobs(self):
+        self.reset_project_storage()
+        self.assertManagedBuild(0, CC, [], 'hello.c')
+        stdout, stderr = self.assertCommandReturnValue(0, create_cmd, ['--repeat', '3', '--jobs', '2', './a.out'])
+        self.assertIn('Performing 3 trials', stdout)
+        for number in 0, 1, 2:
+            self.assertIn('Trial %d finished with return code 0' % number, stdout)
+        self.assertFalse(stderr)
+
+    def test_create_invalid_jobs(self):
+        self.reset_project_storage()
+        _, stderr = self.assertNotCommandReturnValue(0, create_cmd, ['--jobs', '0', './a.out'])
+        self.assertIn('Invalid job count', stderr)
+
+    @tests.skipIf(HOST_ARCH.is_bluegene(), "Test skipped on BlueGene")
+    def test_create_monitor(self):
+        self.reset_project_storage()
+        self.assertManagedBuild(0, CC, [], 'hello.c')
+        stdout, stderr = self.assertCommandReturnValue(0, create_cmd, ['--monitor', './a.out'])
+        self.assertIn('Trial 0 wrote', stdout)
+        self.assertFalse(stderr)
+
+    def test_create_invalid_max_data_size(self):
+        self.reset_project_storage()
+        _, stderr = self.assertNotCommandReturnValue(0, create_cmd, ['--max-data-size', 'lots', './a.out'])
+        self.assertIn('Invalid data size', stderr)
@@ -49,6 +49,18 @@ class DeleteTest(tests.TestCase):
         stdout, stderr = self.assertCommandReturnValue(0, delete_command, ['0'])
         self.assertIn('Deleted trial 0', stdout)
         self.assertFalse(stderr)
+
+    @tests.skipIf(HOST_ARCH.is_bluegene(), "Test skipped on BlueGene")
+    def test_delete_reuse_number(self):
+        self.reset_project_storage()
+        self.assertManagedBuild(0, CC, [], 'hello.c')
+        self.assertCommandReturnValue(0, create_command, ['./a.out'])
+        self.assertCommandReturnValue(0, create_command, ['./a.out'])
+        self.assertCommandReturnValue(0, delete_command, ['0'])
+        stdout, _ = self.assertCommandReturnValue(0, create_command, ['./a.out'])
+        self.assertIn('Trial 0 produced', stdout)
+        stdout, _ = self.assertCommandReturnValue(0, create_command, ['./a.out'])
+        self.assertIn('Trial 2 produced', stdout)
         
     def test_wrongnumber(self):
         self.reset_project_storage()
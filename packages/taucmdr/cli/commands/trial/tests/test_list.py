@@ -111,4 +111,12 @@ class ListTest(tests.TestCase):
         stdout, stderr = self.assertNotCommandReturnValue(0, LIST_COMMAND, ['100'])
         self.assertIn("No trial with number='100'", stderr)
         self.assertFalse(stdout)
-    
+
+    @tests.skipIf(HOST_ARCH.is_bluegene(), "Test skipped on BlueGene")
+    def test_list_last(self):
+        self.reset_project_storage()
+        self.assertManagedBuild(0, CC, [], 'hello.c')
+        self.assertCommandReturnValue(0, CREATE_COMMAND, ['--repeat', '3', './a.out'])
+        stdout, stderr = self.assertCommandReturnValue(0, LIST_COMMAND, ['--last', '2', '-s'])
+        self.assertEqual(['1', '2'], stdout.split())
+        self.assertFalse(stderr)
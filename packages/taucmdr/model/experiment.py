@@ -33,15 +33,18 @@ The selected experiment will be used for application compilation and trial visua
 """
 
 import os
+import bisect
 import fasteners
 from taucmdr import logger, util
 from taucmdr.error import ConfigurationError, InternalError, IncompatibleRecordError
 from taucmdr.error import ExperimentSelectionError, UniqueAttributeError
 from taucmdr.mvc.model import Model
+from taucmdr.mvc import events
 from taucmdr.mvc.controller import Controller
-from taucmdr.model.trial import Trial
+from taucmdr.model.trial import Trial, LISTING_ATTRIBUTES
 from taucmdr.model.project import Project
 from taucmdr.cf.storage.levels import PROJECT_STORAGE, highest_writable_storage
+from taucmdr.cf import retention
 
 
 LOGGER = logger.get_logger(__name__)
@@ -93,6 +96,44 @@ def attributes():
         'tau_makefile': {
             'type': 'string',
             'description': 'TAU Makefile used during this experiment, if any.'
+        },
+        'trial_counter': {
+            'type': 'integer',
+            'default': 0,
+            'description': "one more than the largest trial number ever allocated in this experiment",
+            'internal': True
+        },
+        'free_trial_numbers': {
+            'type': 'array',
+            'description': "trial numbers below the trial counter that are not in use, in ascending order",
+            'internal': True
+        },
+        'trial_index': {
+            'type': 'array',
+            'description': "[begin_time, trial eid] pairs for this experiment's trials, in ascending order",
+            'internal': True
+        },
+        'trial_listing': {
+            'type': 'dict',
+            'description': "number, times, return code, data size, and description of this experiment's trials",
+            'internal': True
+        },
+        'trial_data_size': {
+            'type': 'integer',
+            'description': "total size in bytes of this experiment's trial data",
+            'internal': True
+        },
+        'trial_physical_size': {
+            'type': 'integer',
+            'description': "total size in bytes of this experiment's trial data not shared with other trials",
+            'internal': True
+        },
+        'trial_retention': {
+            'type': 'string',
+            'description': ("evict the data of least recently used trials to stay within limits, "
+                            "e.g. size=10G,count=100,age=30d, overriding the project's limits"),
+            'argparse': {'flags': ('--trial-retention',),
+                         'metavar': '<limit>[,<limit>...]'}
         }
     }
 
@@ -168,6 +209,7 @@ class ExperimentController(Controller):
             raise UniqueAttributeError(self.model, unique)
         with self.storage as database:
             record = database.insert(data, table_name=self.model.name)
+            self._emit(events.CREATE, record.eid, {attr: (None, value) for attr, value in data.iteritems()})
             for attr, foreign in self.model.associations.iteritems():
                 if 'model' or 'collection' in self.model.attributes[attr]:
                     affected = record.get(attr, None)
@@ -229,6 +271,7 @@ class ExperimentController(Controller):
                                      self.model.name, model.eid, via, foreign_model.name, affected_keys)
                         self._disassociate(model, foreign_model, affected_keys, via)
                 removed_data.append(dict(model))
+                self._emit(events.DELETE, model.eid, {attr: (value, None) for attr, value in model.iteritems()})
             database.remove(keys, table_name=self.model.name)
             for model in changing:
                 model.on_delete()
@@ -312,7 +355,7 @@ class Experiment(Model):
 
     @property
     def prefix(self):
-        with fasteners.InterProcessLock(os.path.join(PROJECT_STORAGE.prefix, '.lock')):
+        with PROJECT_STORAGE.lock():
             return os.path.join(self.populate('project').prefix, self['name'])
 
     def verify(self):
@@ -332,28 +375,161 @@ class Experiment(Model):
 
     def on_create(self):
         self.verify()
+        retention.parse_policy(self.get('trial_retention'))
         try:
             util.mkdirp(self.prefix)
         except:
             raise ConfigurationError('Cannot create directory %r' % self.prefix,
                                      'Check that you have `write` access')
 
+    def on_update(self, changes):
+        if 'trial_retention' in changes:
+            retention.parse_policy(self.get('trial_retention'))
+
     def on_delete(self):
         try:
             util.rmtree(self.prefix)
         except Exception as err:  # pylint: disable=broad-except
             if os.path.exists(self.prefix):
                 LOGGER.error("Could not remove experiment data at '%s': %s", self.prefix, err)
+        else:
+            self.populate('project').blob_store().prune()
+
+    def trial_listing(self):
+        """Get a summary of each of this experiment's trials without reading the trial records.
+        
+        The listing is maintained by :any:`TrialController` as trials are created, changed, and deleted.
+        Experiments created before the listing existed have it rebuilt from their trial records.
+        
+        Returns:
+            dict: :any:`Trial.listing_row` entries indexed by trial eid.
+        """
+        if 'trial_listing' in self:
+            return dict((int(eid), row) for eid, row in self['trial_listing'].iteritems())
+        LOGGER.debug("Rebuilding trial listing for experiment '%s'", self['name'])
+        trials = self.populate(attribute='trials', defaults=True)
+        return dict((trial.eid, trial.listing_row()) for trial in trials)
+
+    def trial_data_sizes(self):
+        """Get the total size of this experiment's trial data.
+        
+        The totals are maintained by :any:`TrialController` as trial data sizes change.  Experiments 
+        created before the totals existed have them rebuilt from their trial records.
+        
+        Returns:
+            tuple: (data_size, physical_size) in bytes, see :any:`Trial.sizes`.
+        """
+        if 'trial_data_size' in self:
+            return self['trial_data_size'], self.get('trial_physical_size', self['trial_data_size'])
+        LOGGER.debug("Rebuilding trial data size totals for experiment '%s'", self['name'])
+        sizes = [trial.sizes() for trial in self.populate(attribute='trials', defaults=True)]
+        return sum(size for size, _ in sizes), sum(physical for _, physical in sizes)
 
     def data_size(self):
-        return sum([int(trial.get('data_size', 0)) for trial in self.populate('trials')])
+        return self.trial_data_sizes()[0]
 
-    def next_trial_number(self):
+    def physical_data_size(self):
+        """Gets the size of this experiment's trial data not shared with other trials.
+        
+        Returns:
+            int: Size in bytes, the same as :any:`data_size` unless trial data is deduplicated.
+        """
+        return self.trial_data_sizes()[1]
+
+    def retention_policy(self):
+        """Gets the limits on this experiment's trial data.
+        
+        The experiment's own policy takes precedence over its project's policy.
+        
+        Returns:
+            RetentionPolicy: The policy, or None if all trial data is kept, see :any:`retention.parse_policy`.
+        """
+        value = self.get('trial_retention') or self.populate('project').get('trial_retention')
+        return retention.parse_policy(value)
+
+    def trial_numbers(self):
+        """Get the state of this experiment's trial number allocator.
+        
+        Trial numbers are allocated from the persisted `trial_counter` and `free_trial_numbers`
+        attributes so no trial records need to be read.  Experiments created before these attributes
+        existed have their allocator state rebuilt from their trial records.
+        
+        Returns:
+            tuple: (counter, free) where `counter` is one more than the largest allocated trial number
+                   and `free` is the ascending list of unused trial numbers less than `counter`.
+        """
+        if 'trial_counter' in self:
+            return self['trial_counter'], list(self.get('free_trial_numbers', []))
+        LOGGER.debug("Rebuilding trial number allocator for experiment '%s'", self['name'])
         trials = self.populate(attribute='trials', defaults=True)
-        for i, j in enumerate(sorted([trial['number'] for trial in trials])):
-            if i != j:
-                return i
-        return len(trials)
+        numbers = set(trial['number'] for trial in trials)
+        counter = max(numbers) + 1 if numbers else 0
+        return counter, [i for i in xrange(counter) if i not in numbers]
+
+    def trial_index(self):
+        """Get this experiment's trials ordered by the time they began.
+        
+        The index is maintained by :any:`TrialController` as trials are created and deleted.
+        Experiments created before the index existed have it rebuilt from their trial records.
+        
+        Returns:
+            list: [begin_time, trial eid] pairs in ascending order.
+        """
+        if 'trial_index' in self:
+            return [list(entry) for entry in self['trial_index']]
+        LOGGER.debug("Rebuilding trial index for experiment '%s'", self['name'])
+        trials = self.populate(attribute='trials', defaults=True)
+        return sorted([trial.get('begin_time'), trial.eid] for trial in trials)
+
+    def latest_trials(self, count=1):
+        """Get the most recently begun trials of this experiment.
+        
+        Args:
+            count (int): Maximum number of trials to retrieve.
+            
+        Returns:
+            list: Modeled trial records, most recent first.
+        """
+        ctrl = Trial.controller(self.storage)
+        return [ctrl.one(eid) for _, eid in reversed(self.trial_index()[-count:])]
+
+    def find_trials(self, query):
+        """Find this experiment's trials that match a filter expression.
+        
+        Candidate trials are selected from the trial index by the range of begin times the query allows.
+        If the query only compares fields in the trial listing then the candidates are matched against 
+        their listing entries without reading the trial records, otherwise the storage matches the query
+        as it searches the trial records.
+        
+        Args:
+            query (Query): Compiled filter expression, see :any:`taucmdr.cf.query`.
+            
+        Returns:
+            list: Element identifiers of the matching trials, earliest begun first.
+        """
+        index = self.trial_index()
+        times = [begin_time for begin_time, _ in index]
+        low, high = query.bounds('begin_time')
+        start, stop = 0, len(index)
+        if low is not None:
+            start = (bisect.bisect_left if low[1] else bisect.bisect_right)(times, low[0])
+        if high is not None:
+            stop = (bisect.bisect_right if high[1] else bisect.bisect_left)(times, high[0])
+        candidates = [eid for _, eid in index[start:stop]]
+        if query.fields.issubset(LISTING_ATTRIBUTES):
+            listing = self.trial_listing()
+            return [eid for eid in candidates if eid in listing and query(listing[eid])]
+        matching = set(trial.eid for trial in Trial.controller(self.storage).search(query))
+        return [eid for eid in candidates if eid in matching]
+
+    def next_trial_number(self):
+        """Get the number the next new trial of this experiment will receive.
+        
+        Returns:
+            int: The smallest unused trial number.
+        """
+        counter, free = self.trial_numbers()
+        return free[0] if free else counter
 
     @fasteners.interprocess_locked(os.path.join(highest_writable_storage().prefix, '.lock'))
     def configure(self):
@@ -367,7 +543,7 @@ class Experiment(Model):
         """
         from taucmdr.cf.software.tau_installation import TauInstallation
         LOGGER.debug("Configuring experiment %s", self['name'])
-        with fasteners.InterProcessLock(os.path.join(PROJECT_STORAGE.prefix, '.lock')):
+        with PROJECT_STORAGE.lock():
             populated = self.populate(defaults=True)
         target = populated['target']
         application = populated['application']
@@ -463,7 +639,8 @@ class Experiment(Model):
                         proj['name'], ' '.join(tau.force_tau_options))
         return tau.compile(installed_compiler, compiler_args)
 
-    def managed_run(self, launcher_cmd, application_cmds, description):
+    def managed_run(self, launcher_cmd, application_cmds, description, repeat=1, jobs=1, 
+                    monitor=False, max_data_size=None):
         """Uses this experiment to run an application command.
 
         Performs all relevent system preparation tasks to run the user's application
@@ -473,6 +650,10 @@ class Experiment(Model):
             launcher_cmd (list): Application launcher with command line arguments.
             application_cmds (list): List of application executables with command line arguments (list of lists).
             description (str): If not None, a description of the run.
+            repeat (int): Number of trials to perform.
+            jobs (int): Maximum number of trials to perform at the same time.
+            monitor (bool): If True, report the rate at which each trial writes data while it runs.
+            max_data_size (int): If not None, stop trials whose data exceeds this many bytes.
 
         Raises:
             ConfigurationError: The experiment is not configured to perform the desired run.
@@ -483,16 +664,19 @@ class Experiment(Model):
         tau = self.configure()
         cmd, env = tau.get_application_command(launcher_cmd, application_cmds)
         proj = self.populate('project')
-        return Trial.controller(self.storage).perform(proj, cmd, os.getcwd(), env, description)
+        return Trial.controller(self.storage).perform(proj, cmd, os.getcwd(), env, description, repeat, jobs,
+                                                      monitor, max_data_size)
 
-    def trials(self, trial_numbers=None):
+    def trials(self, trial_numbers=None, query=None):
         """Get a list of modeled trial records.
 
         If `bool(trial_numbers)` is False, return the most recent trial.
         Otherwise return a list of Trial objects for the given trial numbers.
+        If `query` is given, return the trials matching it instead, limited to `trial_numbers` if given.
 
         Args:
             trial_numbers (list): List of numbers of trials to retrieve.
+            query (Query): Compiled filter expression, see :any:`find_trials`.
 
         Returns:
             list: Modeled trial records.
@@ -500,21 +684,23 @@ class Experiment(Model):
         Raises:
             ConfigurationError: Invalid trial number or no trials in selected experiment.
         """
+        if query is not None:
+            trials = Trial.controller(self.storage).search(self.find_trials(query))
+            if trial_numbers:
+                trials = [trial for trial in trials if trial['number'] in trial_numbers]
+            if not trials:
+                raise ConfigurationError("No trials in experiment %s match '%s'" % (self['name'], query))
+            return trials
         if trial_numbers:
+            trials = []
             for num in trial_numbers:
-                trials = []
                 found = Trial.controller(self.storage).one({'experiment': self.eid, 'number': num})
                 if not found:
                     raise ConfigurationError("Experiment '%s' has no trial with number %s" % (self.name, num))
                 trials.append(found)
             return trials
         else:
-            trials = self.populate('trials')
+            trials = self.latest_trials()
             if not trials:
                 raise ConfigurationError("No trials in experiment %s" % self['name'])
-            found = trials[0]
-            for trial in trials[1:]:
-                if trial['begin_time'] > found['begin_time']:
-                    found = trial
-            return [found]
-
+            return trials
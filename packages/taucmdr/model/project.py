@@ -39,6 +39,9 @@ from taucmdr.error import InternalError, ProjectSelectionError, ExperimentSelect
 from taucmdr.mvc.model import Model
 from taucmdr.mvc.controller import Controller
 from taucmdr.cf.storage.levels import PROJECT_STORAGE
+from taucmdr.cf.storage.blob_store import BLOB_STORE_DIR, BlobStore
+from taucmdr.cf.compression import parse_policy
+from taucmdr.cf import retention
 
 
 LOGGER = logger.get_logger(__name__)
@@ -87,6 +90,25 @@ def attributes():
             'argparse': {'flags': ('--force-tau-options',),
                          'metavar': '<option>'},
             'compat': {True: Project.discourage('force_tau_options')}
+        },
+        'dedup_trial_data': {
+            'type': 'boolean',
+            'default': False,
+            'description': "store identical trial data files only once",
+            'argparse': {'flags': ('--dedup-trial-data',)}
+        },
+        'compress_trial_data': {
+            'type': 'string',
+            'description': "compress completed trial data with <codec>[:<level>], e.g. gzip:6 or bz2:9",
+            'argparse': {'flags': ('--compress-trial-data',),
+                         'metavar': '<codec>[:<level>]'}
+        },
+        'trial_retention': {
+            'type': 'string',
+            'description': ("evict the data of each experiment's least recently used trials to stay within "
+                            "limits, e.g. size=10G,count=100,age=30d"),
+            'argparse': {'flags': ('--trial-retention',),
+                         'metavar': '<limit>[,<limit>...]'}
         }
     }
 
@@ -138,10 +160,18 @@ class Project(Model):
     __attributes__ = attributes
 
     __controller__ = ProjectController
+
+    def on_create(self):
+        parse_policy(self.get('compress_trial_data'))
+        retention.parse_policy(self.get('trial_retention'))
     
     def on_update(self, changes):
         from taucmdr.model.experiment import Experiment
         from taucmdr.model.compiler import Compiler
+        if 'compress_trial_data' in changes:
+            parse_policy(self.get('compress_trial_data'))
+        if 'trial_retention' in changes:
+            retention.parse_policy(self.get('trial_retention'))
         try:
             old_value, new_value = changes['experiment']
         except KeyError:
@@ -187,6 +217,22 @@ class Project(Model):
     @property
     def prefix(self):
         return os.path.join(self.storage.prefix, self['name'])
+
+    def blob_store(self):
+        """Gets the store that holds this project's deduplicated trial data files.
+        
+        Returns:
+            BlobStore: The project's blob store.
+        """
+        return BlobStore(os.path.join(self.prefix, BLOB_STORE_DIR))
+
+    def compression_policy(self):
+        """Gets how this project's completed trial data is compressed.
+        
+        Returns:
+            tuple: (codec, level) or None if trial data is not compressed, see :any:`parse_policy`.
+        """
+        return parse_policy(self.get('compress_trial_data'))
         
     def experiment(self):
         """Gets the currently selected experiment configuration.
@@ -37,7 +37,6 @@ compilers are installed then there will target configurations for each compiler
 
 import os
 import glob
-import fasteners
 from taucmdr import logger, util
 from taucmdr.error import ConfigurationError, IncompatibleRecordError 
 from taucmdr.error import ProjectSelectionError, ExperimentSelectionError
@@ -546,7 +545,7 @@ class Target(Model):
             compilers = {}
             for role in Knowledgebase.all_roles():
                 try:
-                    with fasteners.InterProcessLock(os.path.join(PROJECT_STORAGE.prefix, '.lock')):
+                    with PROJECT_STORAGE.lock():
                         compiler_record = self.populate(role.keyword)
                 except KeyError:
                     continue
@@ -34,20 +34,41 @@ the performance data.
 
 import os
 import glob
+import shutil
+import bisect
+import time
 import errno
 from datetime import datetime
-import fasteners
-from taucmdr import logger, util
+from taucmdr import logger, util, TAUCMDR_SCRIPT
 from taucmdr.error import ConfigurationError, InternalError
-from taucmdr.progress import ProgressIndicator
+from taucmdr.mvc import events
 from taucmdr.mvc.controller import Controller
 from taucmdr.mvc.model import Model
+from taucmdr.cf import compression, retention
+from taucmdr.cf.monitor import DataMonitor
+from taucmdr.cf.pipeline import Stage, run_pipeline
+from taucmdr.cf.profile.tau_profile import ProfileData, find_profile_files
+from taucmdr.cf.profile.cache import CACHE_DIR, ProfileCache
+from taucmdr.cf.profile.ingest import aggregate_profiles
+from taucmdr.cf.profile.ppk import write_ppk
+from taucmdr.cf.profile.merged_profile import MERGED_PROFILE_FILE, aggregate_merged_profile, load_merged_profile
+from taucmdr.cf.trace.tau_trace import MERGED_EDF_FILE, MERGED_TRACE_FILE, merge_traces
 from taucmdr.cf.software.tau_installation import TauInstallation, PROGRAM_LAUNCHERS
 from taucmdr.cf.storage.levels import PROJECT_STORAGE
 
 
 LOGGER = logger.get_logger(__name__)
 
+OUTPUT_FILE = 'output.log'
+"""str: Name of the file in the trial prefix that receives program output when trials run concurrently."""
+
+USAGE_ATTRIBUTES = ('wall_time', 'user_time', 'system_time', 'max_rss', 'voluntary_switches', 'involuntary_switches')
+"""tuple: Trial attributes recording the resource usage of the trial's command."""
+
+LISTING_ATTRIBUTES = ('number', 'command', 'description', 'phase', 'begin_time', 'end_time', 'return_code', 
+                      'data_size', 'physical_size', 'wall_time', 'user_time', 'system_time', 'max_rss')
+"""tuple: Trial attributes copied to each experiment's trial listing, see :any:`Experiment.trial_listing`."""
+
 
 def attributes():
     from taucmdr.model.experiment import Experiment
@@ -94,6 +115,34 @@ def attributes():
             'type': 'integer',
             'description': "the size in bytes of the trial data"
         },
+        'physical_size': {
+            'type': 'integer',
+            'description': "the size in bytes of the trial data not shared with earlier trials"
+        },
+        'wall_time': {
+            'type': 'float',
+            'description': "elapsed wall clock time in seconds of the command executed when performing the trial"
+        },
+        'user_time': {
+            'type': 'float',
+            'description': "CPU time in seconds the command spent in user mode"
+        },
+        'system_time': {
+            'type': 'float',
+            'description': "CPU time in seconds the command spent in system mode"
+        },
+        'max_rss': {
+            'type': 'integer',
+            'description': "peak resident set size in bytes of the command"
+        },
+        'voluntary_switches': {
+            'type': 'integer',
+            'description': "number of voluntary context switches made by the command"
+        },
+        'involuntary_switches': {
+            'type': 'integer',
+            'description': "number of involuntary context switches made by the command"
+        },
         'description': {
             'type': 'string',
             'argparse': {'flags': ('--description',),
@@ -104,6 +153,10 @@ def attributes():
             'type': 'string',
             'description': "phase of trial"
         },
+        'access_time': {
+            'type': 'datetime',
+            'description': "date and time the trial data was last used"
+        },
     }
 
 
@@ -149,15 +202,15 @@ class TrialController(Controller):
             LOGGER.info("The job has been added to the queue.")
         return retval
 
-    def _perform_interactive(self, expr, trial, cmd, cwd, env):
-        def banner(mark, name, time):
-            headline = '\n{:=<{}}\n'.format('== %s %s at %s ==' % (mark, name, time), logger.LINE_WIDTH)
+    def _perform_interactive(self, expr, trial, cmd, cwd, env, monitor=None):
+        def banner(mark, name, timestamp):
+            headline = '\n{:=<{}}\n'.format('== %s %s at %s ==' % (mark, name, timestamp), logger.LINE_WIDTH)
             LOGGER.info(headline)
 
         banner('BEGIN', expr.name, trial['begin_time'])
         try:
             self.update({'phase': 'running'}, trial.eid)
-            retval = trial.execute_command(expr, cmd, cwd, env)
+            retval = trial.execute_command(expr, cmd, cwd, env, monitor)
         except:
             self.delete(trial.eid)
             raise
@@ -167,66 +220,454 @@ class TrialController(Controller):
         finally:
             end_time = str(datetime.utcnow())
             banner('END', expr.name, end_time)
+        return self._postprocess(expr, trial, cmd, cwd, retval)
+
+    def _perform_concurrent(self, expr, trials, cmd, cwd, env, jobs, monitor=None):
+        """Perform several trials at once.
+        
+        At most `jobs` trials run at any time.  Each trial writes its output to :any:`OUTPUT_FILE` 
+        in its own prefix and is post-processed as soon as it completes.  Trials that fail
+        post-processing are marked as failed but do not stop the remaining trials.
+        
+        Returns:
+            int: The first non-zero trial return code, or zero if all trials returned zero.
+        """
+        pending = list(trials)
+        running = []
+        monitors = {}
+        failed = []
+        retval = 0
+        LOGGER.info("Performing %d trials of experiment '%s', %d at a time", len(trials), expr['name'], jobs)
+        try:
+            while pending or running:
+                while pending and len(running) < jobs:
+                    trial = pending.pop(0)
+                    self.update({'phase': 'running'}, trial.eid)
+                    trial_env = self._trial_env(expr, trial, env)
+                    proc = trial.launch_command(expr, cmd, cwd, trial_env)
+                    LOGGER.info("Trial %s started, output in '%s'", trial['number'], 
+                                os.path.join(trial.prefix, OUTPUT_FILE))
+                    running.append((trial, proc, time.time()))
+                    if monitor is not None:
+                        monitors[trial.eid] = trial.start_monitor(trial_env, proc, monitor)
+                time.sleep(0.1)
+                for item in list(running):
+                    trial, proc, start_time = item
+                    usage = util.wait_subprocess(proc, block=False)
+                    if usage is None:
+                        continue
+                    running.remove(item)
+                    if trial.eid in monitors:
+                        trial.stop_monitor(monitors.pop(trial.eid))
+                    usage['wall_time'] = time.time() - start_time
+                    trial.record_usage(usage)
+                    trial_retval = proc.returncode
+                    self.update({'end_time': str(datetime.utcnow()), 'return_code': trial_retval}, trial.eid)
+                    LOGGER.info("Trial %s finished with return code %d", trial['number'], trial_retval)
+                    try:
+                        trial.verify_data(expr, trial_retval)
+                        self._postprocess(expr, trial, cmd, cwd, trial_retval)
+                    except ConfigurationError as err:
+                        LOGGER.error("Trial %s failed: %s", trial['number'], err.value)
+                        self.update({'phase': 'failed'}, trial.eid)
+                        failed.append(trial)
+                    retval = retval or trial_retval
+        except:
+            for trial, proc, _ in running:
+                proc.kill()
+                proc.wait()
+            for data_monitor in monitors.itervalues():
+                data_monitor.stop()
+            for trial, _, _ in running:
+                self.delete(trial.eid)
+            for trial in pending:
+                self.delete(trial.eid)
+            raise
+        if failed:
+            raise TrialError("%d of %d trials failed: %s" % 
+                             (len(failed), len(trials), ', '.join(str(trial['number']) for trial in failed)),
+                             "Check the trial output files for error messages.")
+        return retval
 
+    def _postprocess(self, expr, trial, cmd, cwd, retval):
+        """Record the trial's data size and check that performance data was produced."""
         self.update({'phase': 'post-processing'}, trial.eid)
-        data_size = 0
-        for dir_path, _, file_names in os.walk(trial.prefix):
-            for name in file_names:
-                data_size += os.path.getsize(os.path.join(dir_path, name))
+        data_size = trial.measure_data_size()
         self.update({'data_size': data_size}, trial.eid)
+        proj = expr.populate('project')
+        compress = data_size and proj.compression_policy()
+        # Compressed data is deduplicated after it is compressed
+        if data_size and not compress and proj.get('dedup_trial_data', False):
+            physical_size = trial.dedup()
+            self.update({'physical_size': physical_size}, trial.eid)
+            LOGGER.info('Deduplicated data size: %s bytes', util.human_size(physical_size))
         if retval != 0:
-            if data_size != 0:
-                LOGGER.warning("Program exited with nonzero status code: %s", retval)
-            else:
-                raise TrialError("Program died without producing performance data.",
-                                 "Verify that the right input parameters were specified.",
-                                 "Check the program output for error messages.",
-                                 "Does the selected application configuration correctly describe this program?",
-                                 "Does the selected measurement configuration specifiy the right measurement methods?",
-                                 "Does the selected target configuration match the runtime environment?")
+            # verify_data has already rejected trials that died without producing data
+            LOGGER.warning("Program exited with nonzero status code: %s", retval)
         LOGGER.info('Experiment: %s', expr['name'])
         LOGGER.info('Command: %s', ' '.join(cmd))
         LOGGER.info('Current working directory: %s', cwd)
         LOGGER.info('Data size: %s bytes', util.human_size(data_size))
         self.update({'phase': 'completed'}, trial.eid)
+        if compress:
+            self._compress_in_background(trial)
         return retval
 
-    def perform(self, proj, cmd, cwd, env, description):
-        """Performs a trial of an experiment.
+    def _compress_in_background(self, trial):
+        """Compress a completed trial's data in a background ``trial postprocess`` process."""
+        cmd = [TAUCMDR_SCRIPT, 'trial', 'postprocess', str(trial['number'])]
+        LOGGER.info("Compressing trial %s data in the background", trial['number'])
+        # Set the phase before the process starts so the trial's data isn't evicted in the meantime
+        self.update({'phase': 'post-processing: %s' % CompressDataStage.phase}, trial.eid)
+        try:
+            util.create_background_subprocess(cmd, os.devnull, cwd=os.path.dirname(self.storage.prefix))
+        except OSError as err:
+            LOGGER.warning("Could not compress trial %s data: %s", trial['number'], err)
+            self.update({'phase': 'completed'}, trial.eid)
+
+    @staticmethod
+    def _trial_env(expr, trial, env):
+        """Return a copy of `env` that tells TAU to send profiles and traces to the trial prefix."""
+        env = dict(env)
+        env['PROFILEDIR'] = trial.prefix
+        env['TRACEDIR'] = trial.prefix
+        measurement = expr.populate('measurement')
+        if measurement['trace'] == 'otf2' or measurement['profile'] == 'cubex':
+            env['SCOREP_EXPERIMENT_DIRECTORY'] = trial.prefix
+        return env
 
+    def reserve(self, expr, cmd, cwd, description, count=1):
+        """Allocate trial numbers and create records for new trials of an experiment.
+        
+        All trials are created in a single transaction.  The caller should hold the project lock
+        so that concurrent TAU Commander processes do not allocate the same trial numbers.
+        
         Args:
             expr (Experiment): Experiment data.
+            cmd (list): Command to profile, with command line arguments.
+            cwd (str): Working directory to perform trial in.
+            description (str): Description of the new trials.
+            count (int): Number of trials to create.
+            
+        Returns:
+            list: Newly created Trial records.
+        """
+        trials = []
+        with self.storage as database:
+            expr = expr.controller(database).one(expr.eid)
+            counter, free = expr.trial_numbers()
+            index = expr.trial_index()
+            created = {}
+            for _ in xrange(count):
+                if free:
+                    trial_number = free.pop(0)
+                else:
+                    trial_number = counter
+                    counter += 1
+                LOGGER.debug("New trial number is %d", trial_number)
+                data = {'number': trial_number,
+                        'experiment': expr.eid,
+                        'command': ' '.join(cmd),
+                        'cwd': cwd,
+                        'environment': 'FIXME',
+                        'phase': 'initializing',
+                        'begin_time': str(datetime.utcnow())}
+                if description is not None:
+                    data['description'] = str(description)
+                trial = self.create(data)
+                bisect.insort(index, [trial['begin_time'], trial.eid])
+                created[trial.eid] = (None, trial)
+                trials.append(trial)
+            self._update_experiment(expr, counter, free, index)
+            self._update_listings(database, {expr.eid: created})
+        return trials
+
+    def _update_experiment(self, expr, counter, free, index):
+        """Persist an experiment's trial number allocator state and trial index.
+        
+        Trailing free numbers are folded back into the counter so the free list only holds gaps.
+
+        Args:
+            expr (Experiment): Experiment data.
+            counter (int): One more than the largest allocated trial number.
+            free (list): Ascending list of unused trial numbers less than `counter`.
+            index (list): [begin_time, trial eid] pairs in ascending order.
+        """
+        while free and free[-1] == counter - 1:
+            free.pop()
+            counter -= 1
+        data = {'trial_counter': counter, 'free_trial_numbers': free, 'trial_index': index}
+        changes = {attr: (expr.get(attr), value) for attr, value in data.iteritems() if expr.get(attr) != value}
+        if changes:
+            with self.storage as database:
+                database.update(data, expr.eid, table_name=expr.name)
+                self._emit(events.UPDATE, expr.eid, changes, expr.__class__)
+
+    def _update_listings(self, database, changes):
+        """Persist changes to experiments' trial listings and trial data size totals.
+        
+        Experiments created before the listing or totals existed have them rebuilt from their trial 
+        records, which must already hold the changes.
+        
+        Args:
+            database: Open storage transaction.
+            changes (dict): (old, new) trial fields indexed by trial eid, indexed by experiment eid.
+                            `old` is None for new trials and `new` is None for deleted trials.
+        """
+        from taucmdr.model.experiment import Experiment
+        for expr_eid, trials in changes.iteritems():
+            record = database.get(expr_eid, table_name=Experiment.name)
+            if record is None:
+                continue
+            expr = Experiment(record)
+            listing = expr.trial_listing()
+            data_size, physical_size = expr.trial_data_sizes()
+            if 'trial_listing' in expr:
+                for trial_eid, (_, new) in trials.iteritems():
+                    if new is None:
+                        listing.pop(trial_eid, None)
+                    else:
+                        listing[trial_eid] = _listing_row(new)
+            if 'trial_data_size' in expr:
+                for old, new in trials.itervalues():
+                    old_sizes, new_sizes = _data_sizes(old or {}), _data_sizes(new or {})
+                    data_size += new_sizes[0] - old_sizes[0]
+                    physical_size += new_sizes[1] - old_sizes[1]
+            data = {'trial_listing': dict((str(eid), row) for eid, row in listing.iteritems()),
+                    'trial_data_size': data_size, 
+                    'trial_physical_size': physical_size}
+            changed = {attr: (expr.get(attr), value) for attr, value in data.iteritems() if expr.get(attr) != value}
+            if changed:
+                database.update(data, expr.eid, table_name=expr.name)
+                self._emit(events.UPDATE, expr.eid, changed, expr.__class__)
+
+    def update(self, data, keys):
+        """Change trial records, their experiments' trial listings, and their trial data size totals.
+        
+        The project is locked while records change since trials are updated by concurrent processes, 
+        e.g. ``trial create`` and background ``trial postprocess`` processes.
+        
+        Args:
+            data (dict): New data for existing records.
+            keys: Fields or element identifiers to match.
+        """
+        with PROJECT_STORAGE.lock():
+            if not any(attr in LISTING_ATTRIBUTES for attr in data):
+                return super(TrialController, self).update(data, keys)
+            with self.storage as database:
+                changes = {}
+                for trial in self.search(keys):
+                    changes.setdefault(trial['experiment'], {})[trial.eid] = (trial, dict(trial, **data))
+                retval = super(TrialController, self).update(data, keys)
+                self._update_listings(database, changes)
+            return retval
+
+    def delete(self, keys):
+        """Delete trial records and remove them from their experiments' trial number allocator, index, and listing.
+        
+        Deduplicated data files that are no longer used by any trial are removed from the project's blob store.
+        
+        Args:
+            keys: Fields or element identifiers to match.
+        """
+        from taucmdr.model.experiment import Experiment
+        with PROJECT_STORAGE.lock(), self.storage as database:
+            removed = {}
+            dedup = set()
+            changes = {}
+            for trial in self.search(keys):
+                removed.setdefault(trial['experiment'], []).append(trial)
+                if trial.get('physical_size') is not None:
+                    dedup.add(trial['experiment'])
+                changes.setdefault(trial['experiment'], {})[trial.eid] = (trial, None)
+            super(TrialController, self).delete(keys)
+            self._update_listings(database, changes)
+            for expr_eid, trials in removed.iteritems():
+                record = database.get(expr_eid, table_name=Experiment.name)
+                if record is None:
+                    continue
+                expr = Experiment(record)
+                if expr_eid in dedup:
+                    expr.populate('project').blob_store().prune()
+                counter, free = expr.trial_numbers()
+                index = expr.trial_index()
+                for trial in trials:
+                    if trial['number'] < counter:
+                        bisect.insort(free, trial['number'])
+                    entry = [trial.get('begin_time'), trial.eid]
+                    pos = bisect.bisect_left(index, entry)
+                    if pos < len(index) and index[pos] == entry:
+                        del index[pos]
+                self._update_experiment(expr, counter, sorted(set(free)), index)
+
+    def postprocess(self, trials, dest=None, jobs=1, threads=None):
+        """Post-process and optionally export the data of several trials at once.
+        
+        Each trial's stages run in order but up to `jobs` stages of different trials run at the same 
+        time.  A trial's phase names its current stage and is restored when its stages are done.  
+        Stages whose work is already done are skipped, so an interrupted run resumes where it stopped 
+        when it is run again.  If not exporting, trial data is also compressed according to the 
+        project's compression policy.
+        
+        Args:
+            trials (list): Trials to post-process.  Trials without data are skipped.
+            dest (str): Path to directory to contain exported data, or None to skip exporting.
+            jobs (int): Maximum number of stages to run at the same time.
+            threads (int): Number of compression threads per export, see :any:`util.gzip_threads`.
+                           If None, the cores are divided between the `jobs` stages.
+            
+        Raises:
+            ConfigurationError: A trial to export has no data.
+            TrialError: Post-processing failed for some trials.
+        """
+        # Worker processes can't start their own worker processes
+        workers = 1 if jobs > 1 else None
+        if not threads and jobs > 1:
+            threads = max(1, util.gzip_threads() // jobs)
+        pipeline = []
+        phases = {}
+        for trial in trials:
+            if dest:
+                stages = trial.export_stages(dest, show_progress=jobs <= 1, threads=threads)
+            elif trial.get('data_size', 0) > 0:
+                stages = []
+            else:
+                LOGGER.warning("Skipping trial %s: no data", trial['number'])
+                continue
+            pipeline.append((trial.eid, trial.postprocess_stages(workers, compress=not dest) + stages))
+            phase = trial.get('phase')
+            # A trial left in a post-processing phase by an interrupted run had completed before
+            phases[trial.eid] = (trial, 'completed' if phase and phase.startswith('post-processing') else phase)
+
+        compressed = set()
+
+        def on_stage(eid, stage):
+            trial = phases[eid][0]
+            LOGGER.info("Trial %s: %s", trial['number'], stage.phase)
+            self.update({'phase': 'post-processing: %s' % stage.phase}, eid)
+            if isinstance(stage, CompressDataStage):
+                compressed.add(eid)
+
+        def on_done(eid, error):
+            trial, phase = phases[eid]
+            if error:
+                LOGGER.error("Trial %s failed: %s", trial['number'], error)
+            with PROJECT_STORAGE.lock():
+                if not error and eid in compressed:
+                    trial.update_physical_size()
+                if self.one(eid).get('phase') != phase:
+                    self.update({'phase': phase}, eid)
+
+        failed = run_pipeline(pipeline, jobs, on_stage, on_done)
+        if failed:
+            raise TrialError("Post-processing failed for %d of %d trials: %s" % 
+                             (len(failed), len(pipeline), 
+                              ', '.join(str(phases[eid][0]['number']) for eid, _ in failed)),
+                             "Check the log for error messages.")
+
+    def collect_garbage(self, expr, policy=None, keep=(), dry_run=False):
+        """Evict the data of an experiment's least recently used trials to satisfy a retention policy.
+        
+        Evicted trials' data files are deleted but their records are kept with phase 'evicted'.
+        Only completed or failed trials are evicted.  The caller should hold the project lock.
+        
+        Args:
+            expr (Experiment): Experiment data.
+            policy (RetentionPolicy): Limits on the experiment's trial data, or None to use 
+                                      the experiment's retention policy.
+            keep (list): Element identifiers of trials whose data must not be evicted.
+            dry_run (bool): If True, choose the trials to evict but do not evict them.
+            
+        Returns:
+            list: Trials whose data was evicted, least recently used first.
+        """
+        if policy is None:
+            policy = expr.retention_policy()
+        if policy is None:
+            return []
+        keep = set(keep)
+        trials = {}
+        candidates = []
+        for trial in self.search({'experiment': expr.eid}):
+            data_size = trial.get('data_size', 0)
+            if not data_size:
+                continue
+            trials[trial.eid] = trial
+            # Trials in a 'post-processing: ...' phase are being changed by another process
+            if trial.get('phase') not in ('completed', 'failed'):
+                keep.add(trial.eid)
+            candidates.append((trial.eid, _timestamp(trial.last_used()), _timestamp(trial['begin_time']), data_size))
+        evicted = [trials[eid] for eid in retention.select_evictions(candidates, policy, _timestamp(), keep)]
+        if dry_run:
+            return evicted
+        for trial in evicted:
+            LOGGER.info("Evicting data of trial %s (%s)", trial['number'], util.human_size(trial['data_size']))
+            trial.evict()
+        if any(trial.get('physical_size') is not None for trial in evicted):
+            expr.populate('project').blob_store().prune()
+        return evicted
+
+    @staticmethod
+    def _expected_duration(expr):
+        """Estimate a trial's duration from the shortest of the experiment's recently completed trials.
+        
+        Returns:
+            float: Duration in seconds or None if no trial has completed.
+        """
+        durations = [trial.duration() for trial in expr.latest_trials(5) if trial.get('phase') == 'completed']
+        durations = [duration for duration in durations if duration]
+        return min(durations) if durations else None
+
+    def perform(self, proj, cmd, cwd, env, description, repeat=1, jobs=1, monitor=False, max_data_size=None):
+        """Performs one or more trials of an experiment.
+        
+        Trial numbers for all `repeat` trials are reserved up front.  If `jobs` is greater than one 
+        then up to `jobs` trials run at the same time, otherwise trials run one after another.
+        Afterwards, the data of earlier trials may be evicted according to the experiment's 
+        retention policy, see :any:`collect_garbage`.
+
+        Args:
             proj (Project): Project data.
             cmd (str): Command to profile, with command line arguments.
             cwd (str): Working directory to perform trial in.
             env (dict): Environment variables to set before performing the trial.
             description (str): Description of this trial.
+            repeat (int): Number of trials to perform.
+            jobs (int): Maximum number of trials to perform at the same time.
+            monitor (bool): If True, report the rate at which each trial writes data while it runs.
+            max_data_size (int): If not None, monitor each trial and stop it if its data exceeds 
+                                 this many bytes.
+            
+        Returns:
+            int: The first non-zero trial return code, or zero if all trials returned zero.
         """
-        with fasteners.InterProcessLock(os.path.join(PROJECT_STORAGE.prefix, '.lock')):
+        with PROJECT_STORAGE.lock():
             expr = proj.populate('experiment')
-            trial_number = expr.next_trial_number()
-            LOGGER.debug("New trial number is %d", trial_number)
-            data = {'number': trial_number,
-                    'experiment': expr.eid,
-                    'command': ' '.join(cmd),
-                    'cwd': cwd,
-                    'environment': 'FIXME',
-                    'phase': 'initializing',
-                    'begin_time': str(datetime.utcnow())}
-            if description is not None:
-                data['description'] = str(description)
-            trial = self.create(data)
-        # Tell TAU to send profiles and traces to the trial prefix
-        env['PROFILEDIR'] = trial.prefix
-        env['TRACEDIR'] = trial.prefix
-        measurement = expr.populate('measurement')
-        if measurement['trace'] == 'otf2' or measurement['profile'] == 'cubex':
-            env['SCOREP_EXPERIMENT_DIRECTORY'] = trial.prefix
+            trials = self.reserve(expr, cmd, cwd, description, repeat)
+        if monitor or max_data_size:
+            monitor = {'budget': max_data_size, 'expected_duration': self._expected_duration(expr)}
+        else:
+            monitor = None
         targ = expr.populate('target')
-        if targ.architecture().is_bluegene():
-            return self._perform_bluegene(expr, trial, cmd, cwd, env)
+        if jobs > 1 and len(trials) > 1 and not targ.architecture().is_bluegene():
+            retval = self._perform_concurrent(expr, trials, cmd, cwd, env, jobs, monitor)
         else:
-            return self._perform_interactive(expr, trial, cmd, cwd, env)
+            retval = 0
+            for i, trial in enumerate(trials):
+                trial_env = self._trial_env(expr, trial, env)
+                try:
+                    if targ.architecture().is_bluegene():
+                        trial_retval = self._perform_bluegene(expr, trial, cmd, cwd, trial_env)
+                    else:
+                        trial_retval = self._perform_interactive(expr, trial, cmd, cwd, trial_env, monitor)
+                except:
+                    for unperformed in trials[i+1:]:
+                        self.delete(unperformed.eid)
+                    raise
+                retval = retval or trial_retval
+        with PROJECT_STORAGE.lock():
+            self.collect_garbage(expr.controller(self.storage).one(expr.eid), keep=[trial.eid for trial in trials])
+        return retval
 
 
 class Trial(Model):
@@ -348,28 +789,37 @@ class Trial(Model):
             if os.path.exists(self.prefix):
                 LOGGER.error("Could not remove trial data at '%s': %s", self.prefix, err)
                 
-    def _postprocess_slog2(self):
-        slog2 = os.path.join(self.prefix, 'tau.slog2')
-        if os.path.exists(slog2):
-            return
-        tau = TauInstallation.minimal()
-        merged_trc = os.path.join(self.prefix, 'tau.trc')
-        merged_edf = os.path.join(self.prefix, 'tau.edf')
-        if not os.path.exists(merged_trc) or not os.path.exists(merged_edf):
-            tau.merge_tau_trace_files(self.prefix)
-        tau.tau_trace_to_slog2(merged_trc, merged_edf, slog2)
-        trc_files = glob.glob(os.path.join(self.prefix, '*.trc'))
-        edf_files = glob.glob(os.path.join(self.prefix, '*.edf'))
-        count_trc_edf = len(trc_files) + len(edf_files)
-        LOGGER.info('Cleaning up TAU trace files...')
-        with ProgressIndicator(count_trc_edf) as progress_bar:
-            count = 0
-            for path in trc_files + edf_files:
-                os.remove(path)
-                count += 1
-                progress_bar.update(count)
-
-    def get_data_files(self):
+    def postprocess_stages(self, workers=None, compress=False):
+        """Get the stages that post-process this trial's data after the trial completes.
+        
+        Args:
+            workers (int): Number of worker processes each stage may use, or None for the default.
+            compress (bool): If True, include a stage that compresses the trial data according to 
+                             the project's compression policy.
+            
+        Returns:
+            list: :any:`Stage` objects to run in order.  Stages whose work is already done are
+                  included but do not need to run, see :any:`Stage.required`.
+        """
+        expr = self.populate('experiment')
+        meas = expr.populate('measurement')
+        stages = []
+        if meas.get('trace', 'none') == 'slog2':
+            stages.extend([MergeTracesStage(self.prefix, workers), ConvertSlog2Stage(self.prefix), 
+                           CleanupTracesStage(self.prefix)])
+        policy = compress and expr.populate('project').compression_policy()
+        if policy:
+            stages.append(CompressDataStage(self.prefix, meas.get('profile', 'none'), *policy))
+        return stages
+
+    def postprocess(self):
+        """Post-process this trial's data in this process if it has not been post-processed already."""
+        for stage in self.postprocess_stages():
+            if stage.required():
+                stage.prepare()
+                stage.run()
+
+    def get_data_files(self, postprocess=True):
         """Return paths to the trial's data files or directories maped by data type. 
         
         Post-process trial data if necessary and return a dictionary mapping the types of data produced 
@@ -377,6 +827,13 @@ class Trial(Model):
         passing on a command line to one of the known data analysis tools. For example, a trial producing 
         SLOG2 traces and TAU profiles would return ``{"slog2": "/path/to/tau.slog2", "tau": "/path/to/directory/"}``.
         
+        Args:
+            postprocess (bool): If False, return the paths the data will have after post-processing 
+                                without post-processing the data.  Compressed data files are not 
+                                decompressed and their paths are returned.  If True, compressed 
+                                profiles are decompressed into a temporary directory, see 
+                                :any:`_decompressed_prefix`.
+
         Returns:
             dict: Keys are strings indicating the data type; values are filesystem paths.
         """
@@ -385,27 +842,105 @@ class Trial(Model):
             raise ConfigurationError("Trial %s of experiment '%s' has no data" % (self['number'], expr['name']))
         meas = self.populate('experiment').populate('measurement')
         profile_fmt = meas.get('profile', 'none')
-        trace_fmt = meas.get('trace', 'none')
-        if trace_fmt == 'slog2':
-            self._postprocess_slog2()
+        self.touch()
+        profile_prefix = self.prefix
+        if postprocess:
+            self.postprocess()
+            # Analysis tools read the files themselves so they can't be compressed
+            profile_prefix = self._decompressed_prefix(profile_fmt)
         data = {}
         if profile_fmt == 'tau':
-            data[profile_fmt] = self.prefix
+            data[profile_fmt] = profile_prefix
         elif profile_fmt == 'merged':
-            data[profile_fmt] = os.path.join(self.prefix, 'tauprofile.xml')
+            data[profile_fmt] = compression.find_file(os.path.join(profile_prefix, MERGED_PROFILE_FILE))
         elif profile_fmt == 'cubex':
             data[profile_fmt] = os.path.join(self.prefix, 'profile.cubex')
         elif profile_fmt != 'none':
             raise InternalError("Unhandled profile format '%s'" % profile_fmt)
         trace_fmt = meas.get('trace', 'none')
         if trace_fmt == 'slog2':
-            data[trace_fmt] = os.path.join(self.prefix, 'tau.slog2')
+            data[trace_fmt] = os.path.join(self.prefix, SLOG2_FILE)
         elif trace_fmt == 'otf2':
             data[trace_fmt] = os.path.join(self.prefix, 'traces.otf2')
         elif trace_fmt != 'none':
             raise InternalError("Unhandled trace format '%s'" % trace_fmt)
         return data
 
+    def _profile_source(self):
+        expr = self.populate('experiment')
+        profile_fmt = expr.populate('measurement').get('profile', 'none')
+        self.touch()
+        if profile_fmt == 'tau':
+            return profile_fmt, self.prefix
+        elif profile_fmt == 'merged':
+            return profile_fmt, compression.find_file(os.path.join(self.prefix, MERGED_PROFILE_FILE))
+        raise ConfigurationError("Trial %s of experiment '%s' has no TAU profiles" % (self['number'], expr['name']),
+                                 "Profile format is '%s', not 'tau' or 'merged'." % profile_fmt)
+
+    def _profile_cache(self, prefix, workers=None):
+        """Get the trial's profile cache, writing it first if it is missing or out of date.
+        
+        Args:
+            prefix (str): Path to the directory containing the trial's TAU text profiles.
+            workers (int): Number of worker processes to use if the cache must be written.
+        
+        Returns:
+            ProfileCache: The valid cache, or None if the cache could not be written.
+        """
+        cache = ProfileCache(prefix)
+        files = find_profile_files(prefix)
+        data_size = self.get('data_size')
+        if not cache.is_valid(data_size, files):
+            try:
+                cache.build(data_size, files, workers)
+            except (IOError, OSError) as err:
+                LOGGER.debug("Could not write profile cache: %s", err)
+                return None
+        return cache
+
+    def get_profile_data(self):
+        """Get the trial's parsed TAU profiles.
+        
+        TAU text profiles are read from the profile cache in the trial prefix, writing it first if necessary.
+        
+        Returns:
+            ProfileData: Per-thread, per-function profile data.
+            
+        Raises:
+            ConfigurationError: The trial has no TAU profiles.
+        """
+        profile_fmt, prefix = self._profile_source()
+        if profile_fmt == 'merged':
+            return load_merged_profile(prefix)
+        cache = self._profile_cache(prefix)
+        return cache.load() if cache else ProfileData.load(prefix)
+
+    def aggregate_profiles(self, metric=None, workers=None, inclusive=False):
+        """Aggregate a metric's values across all of the trial's TAU profiles.
+        
+        TAU text profiles are read from the profile cache in the trial prefix, writing it first if 
+        necessary.  Profiles are read in parallel by worker processes without keeping per-thread data 
+        in memory.  Merged XML profiles are streamed one thread at a time by a single process.
+        
+        Args:
+            metric (str): Metric to aggregate, or None for the default metric.
+            workers (int): Number of worker processes, or None for the default.
+            inclusive (bool): If True aggregate inclusive values, otherwise aggregate exclusive values.
+            
+        Returns:
+            tuple: (aggregate, names) as returned by :any:`aggregate_profiles`.
+            
+        Raises:
+            ConfigurationError: The trial has no TAU profiles.
+        """
+        profile_fmt, prefix = self._profile_source()
+        if profile_fmt == 'merged':
+            return aggregate_merged_profile(prefix, metric, inclusive=inclusive)
+        cache = self._profile_cache(prefix, workers)
+        if cache:
+            return cache.aggregate(metric, inclusive=inclusive)
+        return aggregate_profiles(prefix, metric, workers, inclusive=inclusive)
+
     def queue_command(self, expr, cmd, cwd, env):
         """Execute a command as part of an experiment trial.
 
@@ -440,37 +975,25 @@ class Trial(Model):
             LOGGER.warning("Return code %d from '%s'", retval, cmd_str)
         return retval
 
-    def execute_command(self, expr, cmd, cwd, env):
-        """Execute a command as part of an experiment trial.
-
-        Creates a new subprocess for the command and checks for TAU data files
-        when the subprocess exits.
-
+    def verify_data(self, expr, retval=0):
+        """Check that the trial produced the performance data its measurement calls for.
+        
+        Profiles with a negative node number are renamed to node zero.
+        
         Args:
             expr (Experiment): Experiment data.
-            cmd (str): Command to profile, with command line arguments.
-            cwd (str): Working directory to perform trial in.
-            env (dict): Environment variables to set before performing the trial.
-
-        Returns:
-            int: Subprocess return code.
+            retval (int): The trial command's return code.
+            
+        Raises:
+            TrialError: The program died without producing data or expected profiles or traces were not produced.
         """
-        cmd_str = ' '.join(cmd)
-        tau_env_opts = sorted('%s=%s' % (key, val) for key, val in env.iteritems() 
-                              if (key.startswith('TAU_') or 
-                                  key.startswith('SCOREP_') or 
-                                  key in ('PROFILEDIR', 'TRACEDIR')))
-        LOGGER.info('\n'.join(tau_env_opts))
-        LOGGER.info(cmd_str)
-        try:
-            retval = util.create_subprocess(cmd, cwd=cwd, env=env, log=False)
-        except OSError as err:
-            target = expr.populate('target')
-            errno_hint = {errno.EPERM: "Check filesystem permissions",
-                          errno.ENOENT: "Check paths and command line arguments",
-                          errno.ENOEXEC: "Check that this host supports '%s'" % target['host_arch']}
-            raise TrialError("Couldn't execute %s: %s" % (cmd_str, err), errno_hint.get(err.errno, None))
-
+        if retval != 0 and not self.measure_data_size():
+            raise TrialError("Program died without producing performance data.",
+                             "Verify that the right input parameters were specified.",
+                             "Check the program output for error messages.",
+                             "Does the selected application configuration correctly describe this program?",
+                             "Does the selected measurement configuration specifiy the right measurement methods?",
+                             "Does the selected target configuration match the runtime environment?")
         measurement = expr.populate('measurement')
         profiles = []
         for pat in 'profile.*.*.*', 'MULTI__*/profile.*.*.*', 'tauprofile.xml', '*.cubex':
@@ -505,17 +1028,255 @@ class Trial(Model):
         if traces:
             LOGGER.info("Trial %s produced %s trace files.", self['number'], len(traces))
         elif measurement['trace'] != 'none':
-            raise TrialError("Application completed successfuly but did not produce any traces.")            
+            raise TrialError("Application completed successfuly but did not produce any traces.")
+
+    def _data_file_paths(self):
+        """Iterate over paths to all files in the trial prefix, excluding :any:`OUTPUT_FILE` and caches."""
+        for dir_path, dir_names, file_names in os.walk(self.prefix):
+            if dir_path == self.prefix:
+                # Also skips partial caches left by interrupted writes, e.g. '.profile_cache.<pid>'
+                dir_names[:] = [name for name in dir_names if not name.startswith(CACHE_DIR)]
+            for name in file_names:
+                if dir_path == self.prefix and name == OUTPUT_FILE:
+                    continue
+                yield os.path.join(dir_path, name)
+
+    def measure_data_size(self):
+        """Return the size in bytes of all files in the trial prefix, excluding :any:`OUTPUT_FILE` and caches."""
+        return sum(os.path.getsize(path) for path in self._data_file_paths())
+
+    def dedup(self):
+        """Replace this trial's data files with links to identical files in the project's blob store.
+        
+        Paths to the data files do not change, see :any:`BlobStore`.
+        
+        Returns:
+            int: Size in bytes of the trial's data files that were not already in the store.
+        """
+        store = self.populate('experiment').populate('project').blob_store()
+        return store.dedup(path for path in self._data_file_paths() if os.path.getsize(path))
+
+    def update_physical_size(self):
+        """Record the size of this trial's data on disk after its data files have changed.
+        
+        Data is deduplicated again if the project deduplicates trial data.
+        """
+        proj = self.populate('experiment').populate('project')
+        if proj.get('dedup_trial_data', False):
+            physical_size = self.dedup()
+            proj.blob_store().prune()
+        else:
+            physical_size = self.measure_data_size()
+        self.controller(self.storage).update({'physical_size': physical_size}, self.eid)
+
+    def _decompressed_prefix(self, profile_fmt):
+        """Get a directory holding decompressed copies of this trial's profiles.
+        
+        The trial's own files are not changed.  Copies are written to a temporary directory that is 
+        removed when the program exits.
+        
+        Args:
+            profile_fmt (str): The trial's profile format.
+        
+        Returns:
+            str: The temporary directory, or the trial prefix if none of its profiles are compressed.
+        """
+        paths = _profile_files(self.prefix, profile_fmt)
+        if not any(compression.compressed_suffix(path) for path in paths):
+            return self.prefix
+        dest = util.mkdtemp(prefix='trial%d.' % self['number'])
+        LOGGER.info("Decompressing %d data files of trial %s...", len(paths), self['number'])
+        for path in paths:
+            copy = os.path.join(dest, compression.strip_suffix(os.path.relpath(path, self.prefix)))
+            util.mkdirp(os.path.dirname(copy))
+            compression.decompress_copy(path, copy)
+        return dest
+
+    def launch_command(self, expr, cmd, cwd, env):
+        """Start a command as part of an experiment trial but do not wait for it to complete.
+
+        The command's stdout and stderr are written to :any:`OUTPUT_FILE` in the trial prefix.
+        Use :any:`verify_data` to check for TAU data files after the subprocess exits.
+
+        Args:
+            expr (Experiment): Experiment data.
+            cmd (str): Command to profile, with command line arguments.
+            cwd (str): Working directory to perform trial in.
+            env (dict): Environment variables to set before performing the trial.
+
+        Returns:
+            subprocess.Popen: The running subprocess.
+        """
+        cmd_str = ' '.join(cmd)
+        LOGGER.debug("Trial %s: %s", self['number'], cmd_str)
+        try:
+            return util.create_background_subprocess(cmd, os.path.join(self.prefix, OUTPUT_FILE), cwd=cwd, env=env)
+        except OSError as err:
+            target = expr.populate('target')
+            errno_hint = {errno.EPERM: "Check filesystem permissions",
+                          errno.ENOENT: "Check paths and command line arguments",
+                          errno.ENOEXEC: "Check that this host supports '%s'" % target['host_arch']}
+            raise TrialError("Couldn't execute %s: %s" % (cmd_str, err), errno_hint.get(err.errno, None))
+
+    def listing_row(self):
+        """Get this trial's entry in its experiment's trial listing.
+        
+        Returns:
+            dict: The trial's fields named by :any:`LISTING_ATTRIBUTES` that have values.
+        """
+        return _listing_row(self)
+
+    def sizes(self):
+        """Get the size of this trial's data.
+        
+        Returns:
+            tuple: (data_size, physical_size) in bytes.  `physical_size` is the size of the data 
+                   not shared with other trials and is the same as `data_size` unless trial data 
+                   is deduplicated.
+        """
+        return _data_sizes(self)
+
+    def last_used(self):
+        """Get the date and time this trial's data was last used.
+        
+        Returns:
+            str: The recorded date and time the data was last used, or when the trial ended or began
+                 if the data has not been used.
+        """
+        return self.get('access_time') or self.get('end_time') or self['begin_time']
+
+    def touch(self):
+        """Record that this trial's data has been used so it is evicted after less recently used data."""
+        self.controller(self.storage).update({'access_time': str(datetime.utcnow())}, self.eid)
+
+    def evict(self):
+        """Delete this trial's data files but keep its record.
+        
+        The trial's phase becomes 'evicted' and its data sizes become zero.  The program output
+        of concurrently performed trials is kept.
+        """
+        if os.path.isdir(self.prefix):
+            for name in os.listdir(self.prefix):
+                if name == OUTPUT_FILE:
+                    continue
+                path = os.path.join(self.prefix, name)
+                if os.path.isdir(path) and not os.path.islink(path):
+                    util.rmtree(path)
+                else:
+                    os.remove(path)
+        self.controller(self.storage).update({'phase': 'evicted', 'data_size': 0, 'physical_size': 0}, self.eid)
+
+    def duration(self):
+        """Get the time from when this trial began to when it ended.
+        
+        The wall clock time of the trial's command is preferred when it was recorded.
+        
+        Returns:
+            float: Duration in seconds, or None if the trial has not ended.
+        """
+        if self.get('wall_time') is not None:
+            return self['wall_time']
+        try:
+            begin, end = [_parse_time(self[attr]) for attr in 'begin_time', 'end_time']
+        except (KeyError, ValueError):
+            return None
+        return (end - begin).total_seconds()
+
+    def record_usage(self, usage):
+        """Record the resource usage of this trial's command.
+        
+        Args:
+            usage (dict): Wall clock time and resource usage, see :any:`util.wait_subprocess`.
+                          Usage that was not collected is not recorded.
+        """
+        fields = dict((key, val) for key, val in usage.iteritems() if key in USAGE_ATTRIBUTES)
+        if fields:
+            self.controller(self.storage).update(fields, self.eid)
+            LOGGER.debug("Trial %s resource usage: %s", self['number'], fields)
+
+    def start_monitor(self, env, proc, monitor):
+        """Start monitoring the data written by this trial's running command.
+        
+        Args:
+            env (dict): The command's environment variables, which name the data directories.
+            proc (subprocess.Popen): The running command.  It is terminated if its data exceeds the budget.
+            monitor (dict): Keyword arguments for :any:`DataMonitor`, e.g. `budget`.
+            
+        Returns:
+            DataMonitor: The running monitor.
+        """
+        paths = sorted(set(env.get(var, self.prefix) for var in ('PROFILEDIR', 'TRACEDIR')))
+        data_monitor = DataMonitor("Trial %s" % self['number'], paths, on_exceeded=proc.terminate, 
+                                   ignore=set([os.path.join(self.prefix, OUTPUT_FILE)]), **monitor)
+        data_monitor.start()
+        return data_monitor
+
+    def stop_monitor(self, data_monitor):
+        """Stop a monitor started by :any:`start_monitor` and report the trial's data rate."""
+        data_monitor.stop()
+        elapsed = max(time.time() - data_monitor.start_time, 1e-6)
+        LOGGER.info("Trial %s wrote %d files, %s in %.1f seconds (%s/s)", self['number'], data_monitor.files,
+                    util.human_size(data_monitor.size), elapsed, util.human_size(data_monitor.size / elapsed))
+        if data_monitor.exceeded:
+            LOGGER.warning("Trial %s was stopped because its data exceeded the size budget", self['number'])
+
+    def execute_command(self, expr, cmd, cwd, env, monitor=None):
+        """Execute a command as part of an experiment trial.
+
+        Creates a new subprocess for the command and checks for TAU data files
+        when the subprocess exits.
+
+        Args:
+            expr (Experiment): Experiment data.
+            cmd (str): Command to profile, with command line arguments.
+            cwd (str): Working directory to perform trial in.
+            env (dict): Environment variables to set before performing the trial.
+            monitor (dict): If not None, monitor the data written by the command, see :any:`start_monitor`.
 
+        Returns:
+            int: Subprocess return code.
+        """
+        cmd_str = ' '.join(cmd)
+        tau_env_opts = sorted('%s=%s' % (key, val) for key, val in env.iteritems() 
+                              if (key.startswith('TAU_') or 
+                                  key.startswith('SCOREP_') or 
+                                  key in ('PROFILEDIR', 'TRACEDIR')))
+        LOGGER.info('\n'.join(tau_env_opts))
+        LOGGER.info(cmd_str)
+        monitors = []
+        if monitor is not None:
+            started = lambda proc: monitors.append(self.start_monitor(env, proc, monitor))
+        else:
+            started = None
+        usage = {}
+        try:
+            retval = util.create_subprocess(cmd, cwd=cwd, env=env, log=False, started=started, rusage=usage)
+        except OSError as err:
+            target = expr.populate('target')
+            errno_hint = {errno.EPERM: "Check filesystem permissions",
+                          errno.ENOENT: "Check paths and command line arguments",
+                          errno.ENOEXEC: "Check that this host supports '%s'" % target['host_arch']}
+            raise TrialError("Couldn't execute %s: %s" % (cmd_str, err), errno_hint.get(err.errno, None))
+        finally:
+            for data_monitor in monitors:
+                self.stop_monitor(data_monitor)
+
+        self.record_usage(usage)
+        self.verify_data(expr, retval)
         if retval:
             LOGGER.warning("Return code %d from '%s'", retval, cmd_str)
         return retval
     
-    def export(self, dest):
-        """Export experiment trial data.
- 
+    def export_stages(self, dest, show_progress=True, threads=None):
+        """Get the stages that export this trial's data.
+        
         Args:
             dest (str): Path to directory to contain exported data.
+            show_progress (bool): Show progress indicators while exporting.
+            threads (int): Number of compression threads, see :any:`util.gzip_threads`.
+            
+        Returns:
+            list: :any:`ExportStage` objects, one per data file.
  
         Raises:
             ConfigurationError: This trial has no data.
@@ -523,28 +1284,215 @@ class Trial(Model):
         expr = self.populate('experiment')
         if self.get('data_size', 0) <= 0:
             raise ConfigurationError("Trial %s of experiment '%s' has no data" % (self['number'], expr['name']))
-        data = self.get_data_files()
         stem = '%s.trial%d' % (expr['name'], self['number'])
-        for fmt, path in data.iteritems(): 
-            if fmt == 'tau':
-                export_file = os.path.join(dest, stem+'.ppk')
-                tau = TauInstallation.minimal()
-                tau.create_ppk_file(export_file, path)
-            elif fmt == 'merged':
-                export_file = os.path.join(dest, stem+'.xml.gz')
-                util.create_archive('gz', export_file, [path])
-            elif fmt == 'cubex':
-                export_file = os.path.join(dest, stem+'.cubex')
-                LOGGER.info("Writing '%s'...", export_file)
-                util.copy_file(path, export_file)
-            elif fmt == 'slog2':
-                export_file = os.path.join(dest, stem+'.slog2')
-                LOGGER.info("Writing '%s'...", export_file)
-                util.copy_file(path, export_file)
-            elif fmt == 'otf2':
-                export_file = os.path.join(dest, stem+'.tgz')
-                expr_dir, trial_dir = os.path.split(os.path.dirname(path))
-                items = [os.path.join(trial_dir, item) for item in 'traces', 'traces.def', 'traces.otf2']
-                util.create_archive('tgz', export_file, items, expr_dir)
-            elif fmt != 'none':
-                raise InternalError("Unhandled data file format '%s'" % fmt)
+        return [ExportStage(fmt, path, os.path.join(dest, stem + EXPORT_SUFFIXES[fmt]), show_progress, threads)
+                for fmt, path in self.get_data_files(postprocess=False).iteritems() if fmt != 'none']
+
+    def export(self, dest, threads=None):
+        """Export experiment trial data.
+ 
+        Args:
+            dest (str): Path to directory to contain exported data.
+            threads (int): Number of compression threads, see :any:`util.gzip_threads`.
+ 
+        Raises:
+            ConfigurationError: This trial has no data.
+        """
+        stages = self.export_stages(dest, threads=threads)
+        self.postprocess()
+        for stage in stages:
+            stage.run()
+
+
+def _listing_row(fields):
+    """Get a trial's entry in its experiment's trial listing from its record."""
+    return dict((attr, fields[attr]) for attr in LISTING_ATTRIBUTES if fields.get(attr) is not None)
+
+
+def _data_sizes(fields):
+    """Get the sizes of a trial's data from its record, see :any:`Trial.sizes`."""
+    data_size = fields.get('data_size') or 0
+    physical_size = fields.get('physical_size')
+    return data_size, data_size if physical_size is None else physical_size
+
+
+def _timestamp(value=None):
+    """Convert a date and time recorded as ``str(datetime.utcnow())`` to seconds since the epoch.
+    
+    Args:
+        value (str): The recorded date and time, or None for the current time.
+    """
+    when = _parse_time(value) if value else datetime.utcnow()
+    return (when - datetime(1970, 1, 1)).total_seconds()
+
+
+def _parse_time(value):
+    """Parse a date and time recorded as ``str(datetime)``."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S.%f')
+    except ValueError:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+
+
+EXPORT_SUFFIXES = {'tau': '.ppk', 'merged': '.xml.gz', 'cubex': '.cubex', 'slog2': '.slog2', 'otf2': '.tgz'}
+"""dict: Exported file name suffix for each data format."""
+
+SLOG2_FILE = 'tau.slog2'
+"""str: Name of the SLOG2 trace file in the trial prefix."""
+
+
+def export_data_file(fmt, path, export_file, show_progress=True, threads=None):
+    """Export one trial data file or directory.
+    
+    The export is written to a temporary file that is renamed when it is complete, so an 
+    interrupted export does not leave a partial file at `export_file`.
+    
+    Args:
+        fmt (str): Data format, see :any:`Trial.get_data_files`.
+        path (str): Path to the data file or directory.
+        export_file (str): Path to the exported file.
+        show_progress (bool): Show progress indicators while exporting.
+        threads (int): Number of compression threads, see :any:`util.gzip_threads`.
+    """
+    tmp_file = export_file + '.part'
+    if show_progress and fmt not in ('merged', 'otf2'):
+        LOGGER.info("Writing '%s'...", export_file)
+    try:
+        if fmt == 'tau':
+            write_ppk(tmp_file, path)
+        elif fmt == 'merged' and compression.compressed_suffix(path) == '.gz':
+            util.copy_file(path, tmp_file, show_progress)
+        elif fmt == 'merged' and compression.compressed_suffix(path):
+            with compression.open_file(path) as fin, util.ParallelGzipFile(tmp_file, threads=threads) as fout:
+                shutil.copyfileobj(fin, fout, util.GZIP_BLOCK_SIZE)
+        elif fmt == 'merged':
+            util.create_archive('gz', tmp_file, [path], show_progress=show_progress, threads=threads)
+        elif fmt in ('cubex', 'slog2'):
+            util.copy_file(path, tmp_file, show_progress)
+        elif fmt == 'otf2':
+            expr_dir, trial_dir = os.path.split(os.path.dirname(path))
+            items = [os.path.join(trial_dir, item) for item in 'traces', 'traces.def', 'traces.otf2']
+            util.create_archive('tgz', tmp_file, items, expr_dir, show_progress, threads)
+        else:
+            raise InternalError("Unhandled data file format '%s'" % fmt)
+        os.rename(tmp_file, export_file)
+    except:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+class MergeTracesStage(Stage):
+    """Merges a trial's per-thread TAU traces into one trace."""
+
+    phase = 'merging traces'
+
+    def __init__(self, prefix, workers=None):
+        self.prefix = prefix
+        self.workers = workers
+
+    def required(self):
+        # The merged trace is renamed into place after the merged event definitions are written
+        return not any(os.path.exists(os.path.join(self.prefix, name)) for name in (SLOG2_FILE, MERGED_TRACE_FILE))
+
+    def run(self):
+        LOGGER.info("Merging TAU trace files in '%s'...", self.prefix)
+        merge_traces(self.prefix, self.workers)
+
+
+class ConvertSlog2Stage(Stage):
+    """Converts a trial's merged TAU trace to SLOG2 format."""
+
+    phase = 'converting traces to SLOG2'
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    @classmethod
+    def prepare(cls):
+        # Install tau2slog2 once instead of in every worker
+        TauInstallation.minimal().install()
+
+    def required(self):
+        return not os.path.exists(os.path.join(self.prefix, SLOG2_FILE))
+
+    def run(self):
+        slog2 = os.path.join(self.prefix, SLOG2_FILE)
+        # Convert to a temporary file so an interrupted conversion is repeated
+        tmp_slog2 = os.path.join(self.prefix, 'partial.' + SLOG2_FILE)
+        TauInstallation.minimal().tau_trace_to_slog2(os.path.join(self.prefix, MERGED_TRACE_FILE), 
+                                                     os.path.join(self.prefix, MERGED_EDF_FILE), tmp_slog2)
+        os.rename(tmp_slog2, slog2)
+
+
+def _profile_files(prefix, profile_fmt):
+    """Get paths to the profile files in a trial prefix that may be compressed."""
+    if profile_fmt == 'tau':
+        return [path for _, _, _, _, path in find_profile_files(prefix)]
+    elif profile_fmt == 'merged':
+        path = compression.find_file(os.path.join(prefix, MERGED_PROFILE_FILE))
+        return [path] if os.path.exists(path) else []
+    return []
+
+
+class CompressDataStage(Stage):
+    """Compresses a trial's profile files in place, see :any:`taucmdr.cf.compression`.
+    
+    Trace files are not compressed since TAU traces are memory-mapped when they are merged and 
+    other trace formats are read directly by external tools.
+    """
+
+    phase = 'compressing data'
+
+    def __init__(self, prefix, profile_fmt, codec, level):
+        self.prefix = prefix
+        self.profile_fmt = profile_fmt
+        self.codec = codec
+        self.level = level
+
+    def _uncompressed_files(self):
+        return [path for path in _profile_files(self.prefix, self.profile_fmt) 
+                if not compression.compressed_suffix(path)]
+
+    def required(self):
+        return bool(self._uncompressed_files())
+
+    def run(self):
+        for path in self._uncompressed_files():
+            compression.compress_file(path, self.codec, self.level, threads=1)
+
+
+class CleanupTracesStage(Stage):
+    """Removes a trial's TAU trace files after they have been converted to SLOG2 format."""
+
+    phase = 'cleaning up traces'
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def _trace_files(self):
+        return glob.glob(os.path.join(self.prefix, '*.trc')) + glob.glob(os.path.join(self.prefix, '*.edf'))
+
+    def required(self):
+        return os.path.exists(os.path.join(self.prefix, SLOG2_FILE)) and bool(self._trace_files())
+
+    def run(self):
+        LOGGER.info("Cleaning up TAU trace files in '%s'...", self.prefix)
+        for path in self._trace_files():
+            os.remove(path)
+
+
+class ExportStage(Stage):
+    """Exports one of a trial's data files, see :any:`export_data_file`."""
+
+    phase = 'exporting'
+
+    def __init__(self, fmt, path, export_file, show_progress=True, threads=None):
+        self.fmt = fmt
+        self.path = path
+        self.export_file = export_file
+        self.show_progress = show_progress
+        self.threads = threads
+
+    def run(self):
+        export_data_file(self.fmt, self.path, self.export_file, self.show_progress, self.threads)
@@ -29,6 +29,7 @@
 
 from taucmdr import logger
 from taucmdr.error import InternalError, UniqueAttributeError, ModelError
+from taucmdr.mvc import events
 
 LOGGER = logger.get_logger(__name__)
 
@@ -57,6 +58,18 @@ class Controller(object):
     def pop_topic(cls, topic):
         return cls.messages.pop(topic, [])
 
+    def _emit(self, action, eid, changes, model=None):
+        """Publish a :any:`ChangeEvent` when the current transaction is committed.
+        
+        Args:
+            action (str): Type of change, see :any:`taucmdr.mvc.events`.
+            eid: Element identifier of the changed record.
+            changes (dict): (old_value, new_value) tuples indexed by attribute name.
+            model (Model): Model of the changed record if not this controller's model.
+        """
+        model_name = (model or self.model).name
+        events.emit(events.ChangeEvent(action, model_name, eid, changes, self.storage.name), self.storage)
+
     def one(self, key):
         """Get a record.
         
@@ -194,6 +207,7 @@ class Controller(object):
             raise UniqueAttributeError(self.model, unique)
         with self.storage as database:
             record = database.insert(data, table_name=self.model.name)
+            self._emit(events.CREATE, record.eid, {attr: (None, value) for attr, value in data.iteritems()})
             for attr, foreign in self.model.associations.iteritems():
                 if 'model' or 'collection' in self.model.attributes[attr]:
                     affected = record.get(attr, None)
@@ -232,6 +246,8 @@ class Controller(object):
             for model in old_records:
                 changes[model.eid] = {attr: (model.get(attr), new_value) for attr, new_value in data.iteritems()
                                       if not (attr in model and model.get(attr) == new_value)}
+                if changes[model.eid]:
+                    self._emit(events.UPDATE, model.eid, changes[model.eid])
                 for attr, foreign in self.model.associations.iteritems():
                     try:
                         # 'collection' attribute is iterable
@@ -287,6 +303,8 @@ class Controller(object):
             changes = {}
             for model in old_records:
                 changes[model.eid] = {attr: (model.get(attr), None) for attr in fields if attr in model}
+                if changes[model.eid]:
+                    self._emit(events.UNSET, model.eid, changes[model.eid])
                 for attr, foreign in self.model.associations.iteritems():
                     if attr in fields:
                         foreign_cls, via = foreign
@@ -338,6 +356,7 @@ class Controller(object):
                                      self.model.name, model.eid, via, foreign_model.name, affected_keys)
                         self._disassociate(model, foreign_model, affected_keys, via)
                 removed_data.append(dict(model))
+                self._emit(events.DELETE, model.eid, {attr: (value, None) for attr, value in model.iteritems()})
             database.remove(keys, table_name=self.model.name)
             for model in changing:
                 model.on_delete()
@@ -443,6 +462,8 @@ class Controller(object):
             else:
                 with self.storage as database:
                     database.unset([via], affected, table_name=foreign_model.name)
+                    for key in affected:
+                        self._emit(events.UNSET, key, {via: (record.eid, None)}, foreign_model)
         elif 'collection' in foreign_props:
             with self.storage as database:
                 for key in affected:
@@ -453,3 +474,4 @@ class Controller(object):
                         foreign_model.controller(database).delete(key)
                     else:
                         database.update({via: updated}, key, table_name=foreign_model.name)
+                        self._emit(events.UPDATE, key, {via: (foreign_record[via], updated)}, foreign_model)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Change events for controlled data.
+
+Every record created, updated, or deleted through a :any:`Controller` produces a :any:`ChangeEvent`.
+Events are published on :any:`EVENT_BUS` after the transaction that produced them is committed so
+subscribers never see changes that were rolled back.  Dashboards, caches, and other observers can
+subscribe to the bus to update incrementally rather than re-reading every record after each change.
+
+If the ``__TAUCMDR_EVENTS_FILE__`` environment variable is set to a true value then events are also
+appended, one JSON object per line, to :any:`EVENTS_FILE` in the prefix of the storage container 
+that was modified, e.g. the project directory for project-level records.
+"""
+
+import os
+import json
+from datetime import datetime
+from taucmdr import logger, util
+
+
+LOGGER = logger.get_logger(__name__)
+
+EVENTS_FILE = 'events.jsonl'
+"""str: Name of the append-only events file in a storage container's filesystem prefix."""
+
+CREATE = 'create'
+UPDATE = 'update'
+UNSET = 'unset'
+DELETE = 'delete'
+
+
+class ChangeEvent(object):
+    """A change to a single data record.
+    
+    Attributes:
+        action (str): One of :any:`CREATE`, :any:`UPDATE`, :any:`UNSET`, or :any:`DELETE`.
+        model_name (str): Name of the modified record's data model, e.g. "Trial".
+        eid: Element identifier of the modified record.
+        changes (dict): (old_value, new_value) tuples indexed by name of changed attribute.
+        storage_name (str): Name of the storage container holding the record, e.g. "project".
+        time (str): Date and time the change was made.
+    """
+    
+    def __init__(self, action, model_name, eid, changes, storage_name):
+        self.action = action
+        self.model_name = model_name
+        self.eid = eid
+        self.changes = changes
+        self.storage_name = storage_name
+        self.time = str(datetime.utcnow())
+
+    def __repr__(self):
+        return "ChangeEvent(%s, %s(%s), %s)" % (self.action, self.model_name, self.eid, sorted(self.changes))
+
+    def as_dict(self):
+        return {'action': self.action,
+                'model': self.model_name,
+                'eid': self.eid,
+                'changes': self.changes,
+                'storage': self.storage_name,
+                'time': self.time}
+
+
+class EventBus(object):
+    """In-process publish/subscribe channel for :any:`ChangeEvent` objects."""
+    
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, callback, model_name=None):
+        """Invoke `callback` for every published event.
+        
+        Args:
+            callback: Callable accepting one :any:`ChangeEvent` argument.
+            model_name (str): If given, only events for records of this model are delivered.
+        """
+        self._subscribers.append((callback, model_name))
+
+    def unsubscribe(self, callback):
+        """Stop delivering events to `callback`.
+        
+        Args:
+            callback: A callable previously passed to :any:`subscribe`.
+        """
+        # Bound methods are created anew on each attribute access so compare by equality, not identity
+        self._subscribers = [sub for sub in self._subscribers if sub[0] != callback]
+
+    def publish(self, event):
+        """Deliver `event` to all interested subscribers.
+        
+        Args:
+            event (ChangeEvent): The event to deliver.
+        """
+        for callback, model_name in list(self._subscribers):
+            if model_name is None or model_name == event.model_name:
+                callback(event)
+
+
+EVENT_BUS = EventBus()
+"""EventBus: Process-wide channel for record change events."""
+
+
+def events_file_enabled():
+    """Check if change events should be appended to the events file.
+    
+    Returns:
+        bool: True if ``__TAUCMDR_EVENTS_FILE__`` is set to a true value.
+    """
+    try:
+        return util.parse_bool(os.environ.get('__TAUCMDR_EVENTS_FILE__', False))
+    except TypeError:
+        return False
+
+
+def append_to_events_file(event, prefix):
+    """Append an event to the events file in `prefix`.
+    
+    Failures are logged but otherwise ignored since the events file is advisory.
+    
+    Args:
+        event (ChangeEvent): The event to record.
+        prefix (str): Directory containing the events file.
+    """
+    path = os.path.join(prefix, EVENTS_FILE)
+    try:
+        with open(path, 'a') as fout:
+            fout.write(json.dumps(event.as_dict(), default=str) + '\n')
+    except IOError as err:
+        LOGGER.debug("Could not append to events file '%s': %s", path, err)
+
+
+def emit(event, storage):
+    """Publish `event` once the current transaction on `storage` is committed.
+    
+    Args:
+        event (ChangeEvent): The event to publish.
+        storage (AbstractStorage): Storage container holding the changed record.
+    """
+    def commit_hook():
+        if events_file_enabled():
+            append_to_events_file(event, storage.prefix)
+        EVENT_BUS.publish(event)
+    storage.on_commit(commit_hook)
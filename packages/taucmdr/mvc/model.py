@@ -187,6 +187,10 @@ class Model(StorageRecord):
                 raise ModelError(cls, "%s: defines 'via' property but not 'model' or 'collection'" % model_attr_name)
             if not isinstance(props.get('unique', False), bool):
                 raise ModelError(cls, "%s: invalid value for 'unique'" % model_attr_name)
+            if not isinstance(props.get('internal', False), bool):
+                raise ModelError(cls, "%s: invalid value for 'internal'" % model_attr_name)
+            if props.get('internal', False) and 'argparse' in props:
+                raise ModelError(cls, "%s: internal attributes cannot be command line arguments" % model_attr_name)
             if not isinstance(props.get('description', ''), basestring):
                 raise ModelError(cls, "%s: invalid value for 'description'" % model_attr_name)
             if props.get('primary_key', False):
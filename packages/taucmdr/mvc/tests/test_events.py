@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2015, ParaTools, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# (1) Redistributions of source code must retain the above copyright notice,
+#     this list of conditions and the following disclaimer.
+# (2) Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+# (3) Neither the name of ParaTools, Inc. nor the names of its contributors may
+#     be used to endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+"""Test functions.
+
+Functions used for unit tests of events.py.
+"""
+
+import os
+import json
+from taucmdr import tests
+from taucmdr.mvc import events
+from taucmdr.cf.storage.local_file import LocalFileStorage
+
+
+class EventsTest(tests.TestCase):
+    """Unit tests for change events."""
+
+    def setUp(self):
+        self.received = []
+        self.storage = LocalFileStorage('events_test', os.path.join(tests.get_test_workdir(), 'events_test'))
+        events.EVENT_BUS.subscribe(self.received.append)
+
+    def tearDown(self):
+        events.EVENT_BUS.unsubscribe(self.received.append)
+        os.environ.pop('__TAUCMDR_EVENTS_FILE__', None)
+
+    def test_filter_by_model(self):
+        trials = []
+        events.EVENT_BUS.subscribe(trials.append, 'Trial')
+        try:
+            events.EVENT_BUS.publish(events.ChangeEvent(events.CREATE, 'Trial', 1, {}, 'test'))
+            events.EVENT_BUS.publish(events.ChangeEvent(events.CREATE, 'Target', 1, {}, 'test'))
+        finally:
+            events.EVENT_BUS.unsubscribe(trials.append)
+        self.assertEqual(len(trials), 1)
+        self.assertEqual(len(self.received), 2)
+
+    def test_unsubscribe_method(self):
+        subscribers = len(events.EVENT_BUS._subscribers)
+        events.EVENT_BUS.unsubscribe(self.received.append)
+        self.assertEqual(len(events.EVENT_BUS._subscribers), subscribers - 1)
+        events.EVENT_BUS.publish(events.ChangeEvent(events.CREATE, 'Trial', 1, {}, 'test'))
+        self.assertFalse(self.received)
+
+    def test_deferred_until_commit(self):
+        with self.storage:
+            events.emit(events.ChangeEvent(events.UPDATE, 'Trial', 3, {'phase': ('a', 'b')}, 'test'), self.storage)
+            self.assertFalse(self.received)
+        self.assertEqual(len(self.received), 1)
+        self.assertEqual(self.received[0].changes, {'phase': ('a', 'b')})
+
+    def test_dropped_on_rollback(self):
+        with self.storage:
+            events.emit(events.ChangeEvent(events.CREATE, 'Trial', 1, {}, 'test'), self.storage)
+            try:
+                with self.storage:
+                    events.emit(events.ChangeEvent(events.CREATE, 'Trial', 2, {}, 'test'), self.storage)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual([event.eid for event in self.received], [1])
+
+    def test_events_file(self):
+        os.environ['__TAUCMDR_EVENTS_FILE__'] = '1'
+        self.storage.connect_filesystem()
+        events.emit(events.ChangeEvent(events.DELETE, 'Trial', 5, {'number': (5, None)}, 'test'), self.storage)
+        with open(os.path.join(self.storage.prefix, events.EVENTS_FILE)) as fin:
+            lines = fin.readlines()
+        self.assertEqual(len(lines), 1)
+        record = json.loads(lines[0])
+        self.assertEqual(record['action'], events.DELETE)
+        self.assertEqual(record['eid'], 5)
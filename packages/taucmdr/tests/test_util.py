@@ -30,8 +30,15 @@
 Functions used for unit tests of util.py.
 """
 
-
+import os
+import gzip
+import random
+import sys
+import signal
+import tarfile
+import subprocess
 from taucmdr import util, tests
+from taucmdr.error import ConfigurationError
 
 
 class HumanSizeTest(tests.TestCase):
@@ -43,6 +50,16 @@ class HumanSizeTest(tests.TestCase):
             util.human_size('abc')
 
 
+class HumanDurationTest(tests.TestCase):
+    """Class to test the human_duration function in utils."""
+
+    def test_human_duration(self):
+        self.assertEqual(util.human_duration(12.34), '12.3s')
+        self.assertEqual(util.human_duration(123), '2m03s')
+        self.assertEqual(util.human_duration(3723), '1h02m03s')
+        self.assertEqual(util.human_duration(None), '0.0s')
+
+
 class ParseBoolTest(tests.TestCase):
     """Class to test the parse_bool function in utils."""
     
@@ -67,6 +84,80 @@ class ParseBoolTest(tests.TestCase):
             util.parse_bool('incorect')
 
 
+class ParseNumberRangesTest(tests.TestCase):
+    """Class to test the parse_number_ranges function in utils."""
+    
+    def test_ranges(self):
+        self.assertEqual(util.parse_number_ranges(['4', '1-3', '2']), [4, 1, 2, 3])
+        self.assertEqual(util.parse_number_ranges([]), [])
+    
+    def test_invalid(self):
+        for value in 'x', '3-1', '1-', '-1':
+            with self.assertRaises(ValueError):
+                util.parse_number_ranges([value])
+
+
+class ParallelGzipFileTest(tests.TestCase):
+    """Class to test the ParallelGzipFile class in utils."""
+
+    def _read(self, path):
+        with gzip.open(path, 'rb') as fin:
+            return fin.read()
+
+    def test_write(self):
+        rand = random.Random(7)
+        data = ''.join(rand.choice('abcdef\n') for _ in xrange(100000))
+        path = os.path.join(tests.get_test_workdir(), 'parallel.gz')
+        for threads in 1, 3:
+            with util.ParallelGzipFile(path, threads=threads, block_size=4096) as fout:
+                for i in xrange(0, len(data), 1000):
+                    fout.write(data[i:i+1000])
+            self.assertEqual(self._read(path), data)
+
+    def test_empty(self):
+        path = os.path.join(tests.get_test_workdir(), 'empty.gz')
+        with util.ParallelGzipFile(path, threads=2):
+            pass
+        self.assertEqual(self._read(path), '')
+
+    def test_create_archive(self):
+        workdir = tests.get_test_workdir()
+        src = os.path.join(workdir, 'archive_src')
+        util.mkdirp(src)
+        for i in xrange(3):
+            with open(os.path.join(src, 'file%d' % i), 'w') as fout:
+                fout.write(str(i) * 10000)
+        dest = os.path.join(workdir, 'archive.tgz')
+        util.create_archive('tgz', dest, ['archive_src'], workdir, show_progress=False, threads=2)
+        with tarfile.open(dest) as archive:
+            self.assertEqual(archive.extractfile('archive_src/file2').read(), '2' * 10000)
+
+    def test_invalid_threads(self):
+        with self.assertRaises(ConfigurationError):
+            util.gzip_threads(-1)
+
+
+class WaitSubprocessTest(tests.TestCase):
+    """Class to test the wait_subprocess function in utils."""
+
+    def test_create_subprocess(self):
+        usage = {}
+        retval = util.create_subprocess([sys.executable, '-c', 'x = " " * 10000000'], stdout=False, rusage=usage)
+        self.assertEqual(retval, 0)
+        for key in 'wall_time', 'user_time', 'system_time', 'max_rss', 'voluntary_switches', 'involuntary_switches':
+            self.assertIn(key, usage)
+        self.assertGreater(usage['max_rss'], 10000000)
+        self.assertGreaterEqual(usage['wall_time'], usage['user_time'] + usage['system_time'] - 0.1)
+
+    def test_nonblocking(self):
+        proc = subprocess.Popen(['sleep', '60'])
+        self.assertIsNone(util.wait_subprocess(proc, block=False))
+        proc.terminate()
+        self.assertIn('max_rss', util.wait_subprocess(proc))
+        self.assertEqual(proc.returncode, -signal.SIGTERM)
+        self.assertEqual(util.wait_subprocess(proc), {})
+
+
 class IsUrlTest(tests.TestCase):
     """Class to test the is_url function in utils."""
     
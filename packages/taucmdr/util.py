@@ -41,18 +41,21 @@ import shutil
 import urllib
 import pkgutil
 import tarfile
-import gzip
+import zlib
+import struct
 import tempfile
 import urlparse
 import hashlib
+import multiprocessing
 from collections import deque
 from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
 from zipimport import zipimporter
 from zipfile import ZipFile
 from termcolor import termcolor
 from unidecode import unidecode
 from taucmdr import logger
-from taucmdr.error import InternalError
+from taucmdr.error import InternalError, ConfigurationError
 from taucmdr.progress import ProgressIndicator, progress_spinner
 
 
@@ -373,14 +376,150 @@ def extract_archive(archive, dest, show_progress=True):
     return full_dest
 
 
-def create_archive(fmt, dest, items, cwd=None, show_progress=True):
+GZIP_BLOCK_SIZE = 1 << 22
+"""int: Size in bytes of the uncompressed blocks compressed by each :any:`ParallelGzipFile` thread."""
+
+
+def gzip_threads(threads=None):
+    """Get the number of threads to use for gzip compression.
+    
+    Args:
+        threads (int): Number of threads.  If None, use the value of the __TAUCMDR_GZIP_THREADS__ 
+                       environment variable or the number of CPU cores.
+        
+    Returns:
+        int: Number of threads.
+        
+    Raises:
+        ConfigurationError: Invalid thread count.
+    """
+    if not threads:
+        try:
+            threads = os.environ['__TAUCMDR_GZIP_THREADS__']
+        except KeyError:
+            threads = multiprocessing.cpu_count()
+    try:
+        threads = int(threads)
+        if threads < 1:
+            raise ValueError
+    except ValueError:
+        raise ConfigurationError("Invalid gzip thread count: %s" % threads)
+    return threads
+
+
+def _gzip_member(data, compresslevel, mtime):
+    """Compress `data` as one complete gzip member (RFC 1952)."""
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+    # ID1 ID2 CM FLG MTIME XFL OS, OS 255 is "unknown"
+    header = struct.pack('<BBBBIBB', 0x1f, 0x8b, zlib.DEFLATED, 0, mtime, 0, 255)
+    trailer = struct.pack('<II', zlib.crc32(data) & 0xffffffff, len(data) & 0xffffffff)
+    return header + compressor.compress(data) + compressor.flush() + trailer
+
+
+class ParallelGzipFile(object):
+    """Write-only gzip file that compresses blocks of data in several threads at once.
+    
+    Each block is written as a separate gzip member.  A file of concatenated members is standard 
+    gzip and can be read by gzip, :any:`gzip.GzipFile`, :any:`tarfile`, etc.  zlib releases the 
+    global interpreter lock while compressing, so threads compress blocks concurrently.
+    
+    Attributes:
+        name (str): Path to the gzip file.
+    """
+
+    def __init__(self, name, compresslevel=6, threads=None, block_size=GZIP_BLOCK_SIZE, mtime=None):
+        """Open the gzip file for writing.
+        
+        Args:
+            name (str): Path to the gzip file.
+            compresslevel (int): zlib compression level, 1 (fastest) to 9 (smallest).
+            threads (int): Number of compression threads, see :any:`gzip_threads`.
+            block_size (int): Size in bytes of uncompressed blocks.
+            mtime (int): Modification time recorded in the gzip headers.  If None, use the current time.
+        """
+        self.name = name
+        self._compresslevel = compresslevel
+        self._block_size = block_size
+        self._threads = gzip_threads(threads)
+        self._pool = ThreadPool(self._threads) if self._threads > 1 else None
+        self._mtime = int(time.time()) if mtime is None else mtime
+        self._buffer = []
+        self._buffered = 0
+        self._pending = deque()
+        self._members = 0
+        self._fileobj = open(name, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    @property
+    def closed(self):
+        return self._fileobj.closed
+
+    def write(self, data):
+        """Write uncompressed data."""
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self._block_size:
+            data = ''.join(self._buffer)
+            end = len(data) - len(data) % self._block_size
+            for start in xrange(0, end, self._block_size):
+                self._compress(data[start:start+self._block_size])
+            self._buffer = [data[end:]] if end < len(data) else []
+            self._buffered = len(data) - end
+
+    def _compress(self, block):
+        self._members += 1
+        if not self._pool:
+            self._fileobj.write(_gzip_member(block, self._compresslevel, self._mtime))
+            return
+        self._pending.append(self._pool.apply_async(_gzip_member, (block, self._compresslevel, self._mtime)))
+        # Bound memory use: write finished members in order once every thread has a block queued
+        while len(self._pending) > 2*self._threads:
+            self._fileobj.write(self._pending.popleft().get())
+
+    def close(self):
+        """Compress any remaining data and close the file."""
+        if self._fileobj.closed:
+            return
+        if self._buffered or not self._members:
+            self._compress(''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+        while self._pending:
+            self._fileobj.write(self._pending.popleft().get())
+        if self._pool:
+            self._pool.close()
+            self._pool.join()
+        self._fileobj.close()
+
+    def abort(self):
+        """Stop compressing and close the file without writing remaining data."""
+        if self._pool:
+            self._pool.terminate()
+            self._pool.join()
+        self._pending.clear()
+        self._fileobj.close()
+
+
+def create_archive(fmt, dest, items, cwd=None, show_progress=True, threads=None):
     """Creates a new archive file in the specified format.
     
+    'tgz' and 'gz' archives are compressed by a :any:`ParallelGzipFile`.
+    
     Args:
         fmt (str): Archive fmt, e.g. 'zip' or 'tgz'.
         dest (str): Path to the archive file that will be created.
         items (list): Items (i.e. files or folders) to add to the archive.
         cwd (str): Current working directory while creating the archive. 
+        threads (int): Number of gzip compression threads, see :any:`gzip_threads`.
     """
     if cwd:
         oldcwd = os.getcwd()
@@ -397,14 +536,20 @@ def create_archive(fmt, dest, items, cwd=None, show_progress=True):
                     archive.comment = "Created by TAU Commander"
                     for item in items:
                         archive.write(item)
-            elif fmt in ('tar', 'tgz', 'tar.bz2'):
-                mode_map = {'tar': 'w', 'tgz': 'w:gz', 'tar.bz2': 'w:bz2'}
+            elif fmt in ('tar', 'tar.bz2'):
+                mode_map = {'tar': 'w', 'tar.bz2': 'w:bz2'}
                 with tarfile.open(dest, mode_map[fmt]) as archive:
                     for item in items:
                         archive.add(item)
+            elif fmt == 'tgz':
+                with ParallelGzipFile(dest, threads=threads) as fout:
+                    archive = tarfile.open(fileobj=fout, mode='w|')
+                    for item in items:
+                        archive.add(item)
+                    archive.close()
             elif fmt == 'gz':
-                with open(items[0], 'rb') as fin, gzip.open(dest, 'wb') as fout:
-                    shutil.copyfileobj(fin, fout)
+                with open(items[0], 'rb') as fin, ParallelGzipFile(dest, threads=threads) as fout:
+                    shutil.copyfileobj(fin, fout, GZIP_BLOCK_SIZE)
             else:
                 raise InternalError("Invalid archive format: %s" % fmt)
         finally:
@@ -458,7 +603,81 @@ def _null_context():
     yield
 
 
-def create_subprocess(cmd, cwd=None, env=None, stdout=True, log=True, show_progress=False, error_buf=50):
+def _subprocess_env(env):
+    """Merge `env` with :any:`os.environ`.  Variables set to None in `env` are unset."""
+    subproc_env = dict(os.environ)
+    if env: 
+        for key, val in env.iteritems():
+            if val is None:
+                subproc_env.pop(key, None)
+                LOGGER.debug("unset %s", key)
+            else:
+                subproc_env[key] = val
+                LOGGER.debug("%s=%s", key, val)
+    return subproc_env
+
+
+def resource_usage(rusage):
+    """Converts a :any:`resource.struct_rusage` to a dictionary.
+
+    Args:
+        rusage: Resource usage as returned by :any:`os.wait4` or :any:`resource.getrusage`.
+
+    Returns:
+        dict: CPU time in seconds spent in user mode (`user_time`) and system mode (`system_time`),
+              peak resident set size in bytes (`max_rss`), and the number of voluntary and
+              involuntary context switches (`voluntary_switches`, `involuntary_switches`).
+    """
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    rss_scale = 1 if sys.platform == 'darwin' else 1024
+    return {'user_time': rusage.ru_utime,
+            'system_time': rusage.ru_stime,
+            'max_rss': rusage.ru_maxrss * rss_scale,
+            'voluntary_switches': rusage.ru_nvcsw,
+            'involuntary_switches': rusage.ru_nivcsw}
+
+
+def wait_subprocess(proc, block=True):
+    """Wait for a subprocess to exit and collect its resource usage.
+
+    Unlike :any:`resource.getrusage` with RUSAGE_CHILDREN, the usage is that of `proc` and the
+    descendants it waited for, so it is accurate even when several subprocesses run at once.
+    `proc.returncode` is set when the subprocess has exited.
+
+    Args:
+        proc (subprocess.Popen): The subprocess.
+        block (bool): If False, return immediately if the subprocess is still running.
+
+    Returns:
+        dict: Resource usage as returned by :any:`resource_usage`, an empty dictionary if the
+              subprocess was already waited for, or None if `block` is False and the subprocess
+              is still running.
+    """
+    if proc.returncode is not None:
+        return {}
+    while True:
+        try:
+            pid, status, rusage = os.wait4(proc.pid, 0 if block else os.WNOHANG)
+        except OSError as err:
+            if err.errno == errno.EINTR:
+                continue
+            if err.errno == errno.ECHILD:
+                # Reaped elsewhere, e.g. by subprocess' own cleanup
+                proc.wait()
+                return {}
+            raise
+        break
+    if pid == 0:
+        return None
+    if os.WIFSIGNALED(status):
+        proc.returncode = -os.WTERMSIG(status)
+    else:
+        proc.returncode = os.WEXITSTATUS(status)
+    return resource_usage(rusage)
+
+
+def create_subprocess(cmd, cwd=None, env=None, stdout=True, log=True, show_progress=False, error_buf=50, 
+                      started=None, rusage=None):
     """Create a subprocess.
     
     See :any:`subprocess.Popen`.
@@ -472,26 +691,24 @@ def create_subprocess(cmd, cwd=None, env=None, stdout=True, log=True, show_progr
         error_buf (int): If non-zero, stdout is not already being sent, and return value is
                           non-zero then send last `error_buf` lines of subprocess stdout and stderr
                           to this processes' stdout.
-        
+        started: If not None, called with the :any:`subprocess.Popen` object when the subprocess starts.
+        rusage (dict): If not None, updated with the subprocess' elapsed wall clock time in seconds
+                       (`wall_time`) and resource usage, see :any:`wait_subprocess`.
+
     Returns:
         int: Subprocess return code.
     """
-    subproc_env = dict(os.environ)
-    if env: 
-        for key, val in env.iteritems():
-            if val is None:
-                subproc_env.pop(key, None)
-                LOGGER.debug("unset %s", key)
-            else:
-                subproc_env[key] = val
-                LOGGER.debug("%s=%s", key, val)
+    subproc_env = _subprocess_env(env)
     LOGGER.debug("Creating subprocess: cmd=%s, cwd='%s'\n", cmd, cwd)
     context = progress_spinner if show_progress else _null_context
     with context():
         if error_buf:
             buf = deque(maxlen=error_buf)
+        start_time = time.time()
         proc = subprocess.Popen(cmd, cwd=cwd, env=subproc_env, 
                                 stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=1)
+        if started:
+            started(proc)
         with proc.stdout:
             # Use iter to avoid hidden read-ahead buffer bug in named pipes:
             # http://bugs.python.org/issue3907
@@ -502,7 +719,10 @@ def create_subprocess(cmd, cwd=None, env=None, stdout=True, log=True, show_progr
                     print line,
                 if error_buf:
                     buf.append(line)
-        proc.wait()
+        usage = wait_subprocess(proc)
+        if rusage is not None:
+            rusage['wall_time'] = time.time() - start_time
+            rusage.update(usage)
     retval = proc.returncode
     LOGGER.debug("%s returned %d", cmd, retval)
     if retval and error_buf and not stdout:
@@ -511,6 +731,26 @@ def create_subprocess(cmd, cwd=None, env=None, stdout=True, log=True, show_progr
     return retval
 
 
+def create_background_subprocess(cmd, output, cwd=None, env=None):
+    """Create a subprocess but do not wait for it to complete.
+    
+    Subprocess stdout and stderr are written to the file at `output`.
+    
+    Args:
+        cmd (list): Command and its command line arguments.
+        output (str): Path to a file that will receive the subprocess stdout and stderr.
+        cwd (str): If not None, change directory to `cwd` before creating the subprocess.
+        env (dict): Environment variables to set or unset before launching cmd.
+        
+    Returns:
+        subprocess.Popen: The running subprocess.
+    """
+    subproc_env = _subprocess_env(env)
+    LOGGER.debug("Creating background subprocess: cmd=%s, cwd='%s', output='%s'\n", cmd, cwd, output)
+    with open(output, 'w') as fout:
+        return subprocess.Popen(cmd, cwd=cwd, env=subproc_env, stdout=fout, stderr=subprocess.STDOUT)
+
+
 def get_command_output(cmd, cwd=None, env=None):
     """Return the possibly cached output of a command.
     
@@ -583,6 +823,49 @@ def human_size(num, suffix='B'):
     return "%.1f%s%s" % (num, 'Yi', suffix)
 
 
+def human_duration(seconds):
+    """Converts a time in seconds to human readable units.
+
+    Args:
+        seconds (float): Number of seconds.
+
+    Returns:
+        str: `seconds` as a human readable string, e.g. '12.3s' or '1h02m03s'.
+    """
+    if not seconds:
+        seconds = 0
+    if seconds < 60:
+        return "%.1fs" % seconds
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return "%dh%02dm%02ds" % (hours, minutes, seconds)
+    return "%dm%02ds" % (minutes, seconds)
+
+
+_SIZE_RE = re.compile(r'^\s*(\d+(?:\.\d*)?)\s*(?:([kmgtp])i?)?b?\s*$', re.IGNORECASE)
+
+def parse_size(value):
+    """Parses a data size, e.g. '512M' or '1.5GiB'.
+    
+    Units are powers of 1024, the same as :any:`human_size`.  A number without units is bytes.
+    
+    Args:
+        value (str): Size to parse.
+        
+    Returns:
+        int: Size in bytes.
+        
+    Raises:
+        ValueError: `value` is not a valid size.
+    """
+    match = _SIZE_RE.match(str(value))
+    if not match:
+        raise ValueError(value)
+    number, unit = match.group(1), (match.group(2) or '').lower()
+    return int(float(number) * 1024**(' kmgtp'.index(unit) if unit else 0))
+
+
 def parse_bool(value, additional_true=None, additional_false=None):
     """Parses a value to a boolean value.
     
@@ -619,6 +902,38 @@ def parse_bool(value, additional_true=None, additional_false=None):
     return bool(value)
 
 
+def parse_number_ranges(values):
+    """Parses a list of numbers and inclusive number ranges.
+    
+    For example, ``['1', '3-5']`` parses to ``[1, 3, 4, 5]``.
+    
+    Args:
+        values (list): Strings, each a non-negative integer or two non-negative integers separated by '-'.
+        
+    Returns:
+        list: The numbers in the order given, without duplicates.
+        
+    Raises:
+        ValueError: A value does not parse.
+    """
+    numbers = []
+    seen = set()
+    for value in values:
+        first, sep, last = value.partition('-')
+        try:
+            first = int(first)
+            last = int(last) if sep else first
+        except ValueError:
+            raise ValueError(value)
+        if first < 0 or last < first:
+            raise ValueError(value)
+        for num in xrange(first, last + 1):
+            if num not in seen:
+                seen.add(num)
+                numbers.append(num)
+    return numbers
+
+
 def is_url(url):
     """Check if `url` is a URL.
     